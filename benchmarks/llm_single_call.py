@@ -0,0 +1,79 @@
+"""
+Compare metadata and summary extraction of LLMPostprocessor with two sequential calls and with a single call.
+Documents are extracted once, then postprocessed in both modes without the LLM cache.
+Reports latency per document and similarity of the fields between the modes.
+
+Usage: python benchmarks/llm_single_call.py tests/data/*.pdf --model Mistral_Mistral_Small --lang en
+Requires llmonkey and an API key of the model provider, extraction servers (e.g. Tika) depending on file types.
+"""
+
+import argparse
+import copy
+import difflib
+import os
+import sys
+import time
+
+from llmonkey.llms import BaseLLMModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret import PDFerret  # noqa: E402
+from pdferret.pipeline import Pipeline  # noqa: E402
+from pdferret.postprocessing.llm_postprocessor import LLMPostprocessor  # noqa: E402
+
+fields = ["title", "document_type", "authors", "mentioned_date", "detected_language", "search_description", "abstract"]
+
+
+def similarity(a, b) -> float:
+    a, b = str(a or ""), str(b or "")
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+
+def run(postprocessor, docs):
+    results, latencies = [], []
+    for doc in docs:
+        doc = copy.deepcopy(doc)
+        start = time.perf_counter()
+        results.append(postprocessor.process_single(doc))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--model", required=True, help="llmonkey model class name")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--vision-model", help="llmonkey model class name for visual extraction, defaults to --model")
+    args = parser.parse_args()
+
+    model = BaseLLMModel.load(args.model)
+    # extraction without LLM postprocessing, so both modes get the same input
+    extractor = PDFerret(text_model=model, vision_model=args.vision_model or model)
+    extractor.pipelines = {
+        ext: Pipeline([step for step in pipeline.steps if not isinstance(step, LLMPostprocessor)])
+        for ext, pipeline in extractor.pipelines.items()
+    }
+    docs, errors = extractor.extract_batch(args.files, lang=args.lang)
+    for err in errors:
+        print(f"skipped {err.file}: {err.exc}")
+    docs = [doc for doc in docs if doc.chunks]
+
+    modes = {}
+    for name, single_call in [("two calls", False), ("single call", True)]:
+        postprocessor = LLMPostprocessor(llm_model=model, llm_single_call=single_call, llm_cache=False)
+        modes[name] = run(postprocessor, docs)
+        latencies = modes[name][1]
+        print(f"{name:>12}: {sum(latencies) / len(latencies):.2f} s/doc, max {max(latencies):.2f} s")
+
+    (two, _), (single, _) = modes.values()
+    print("field similarity between modes (0..1):")
+    for field in fields:
+        scores = [similarity(getattr(a.metainfo, field), getattr(b.metainfo, field)) for a, b in zip(two, single)]
+        print(f"{field:>20}: {sum(scores) / len(scores):.2f}")
+
+
+if __name__ == "__main__":
+    main()
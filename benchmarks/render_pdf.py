@@ -0,0 +1,62 @@
+"""
+Compare page rasterization of pdf2image (pdftoppm subprocess) with in-process pdfium rendering.
+Renders first pages of every pdf to JPEG, like VisualPDFExtractor and PDF2ImageThumbnailer do.
+
+Usage: python benchmarks/render_pdf.py tests/data/test.pdf [more.pdf ...] --pages 3 --repeat 5
+Requires pdf2image and poppler-utils in addition to PDFerret requirements.
+"""
+
+import argparse
+import concurrent.futures
+import io
+import os
+import sys
+import time
+
+from pdf2image import convert_from_path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils.pdf_render import render_pages  # noqa: E402
+
+
+def pdf2image_jpgs(file: str, max_pages: int) -> list[bytes]:
+    # previous implementation of convert_pdf_to_jpg
+    images = []
+    for pil_page in convert_from_path(file, first_page=0, last_page=max_pages, dpi=100):
+        buff = io.BytesIO()
+        pil_page.save(buff, "JPEG")
+        images.append(buff.getvalue())
+    return images
+
+
+def pdfium_jpgs(file: str, max_pages: int) -> list[bytes]:
+    return render_pages(file, max_pages=max_pages, dpi=100)
+
+
+def bench(func, files, max_pages, repeat, threads):
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        jobs = [f for _ in range(repeat) for f in files]
+        results = list(executor.map(lambda f: func(f, max_pages), jobs))
+    elapsed = time.perf_counter() - start
+    n_pages = sum(len(r) for r in results)
+    return elapsed, n_pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    for name, func in [("pdf2image", pdf2image_jpgs), ("pdfium", pdfium_jpgs)]:
+        # warm up
+        func(args.files[0], args.pages)
+        elapsed, n_pages = bench(func, args.files, args.pages, args.repeat, args.threads)
+        print(f"{name:>10}: {n_pages} pages in {elapsed:.2f} s, {1000 * elapsed / n_pages:.1f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
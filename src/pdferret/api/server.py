@@ -22,8 +22,11 @@ class PerFileSettings(BaseModel):
 
 
 class PDFerretParams(BaseModel):
-    vision_model: str = "Mistral_Pixtral"
-    text_model: str = "Nebius_Llama_3_1_70B_fast"
+    # a list of models is a fallback chain, the first one preferred
+    vision_model: str | List[str] = "Mistral_Pixtral"
+    text_model: str | List[str] = "Nebius_Llama_3_1_70B_fast"
+    # used for short documents instead of text_model, if set
+    small_text_model: str | List[str] | None = None
     lang: Literal["en", "de"] = "en"
     return_images: bool = True
     perfile_settings: dict[str, PerFileSettings] = {}
@@ -44,6 +47,7 @@ class PDFerretResults(BaseModel):
 
 def _prepare_metainfo(metainfo: MetaInfo, return_images: bool = False) -> MetaInfo:
     metainfo.file_features.file = None
+    metainfo.file_features.pdf_rendition = None
     # clean up extra metainfo which was only used
     # to generate AI metainfo
     metainfo.extra_metainfo = None
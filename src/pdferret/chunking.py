@@ -111,7 +111,9 @@ class SimpleChunker(BaseProcessor):
                 full_text += chunk_obj.text + "\n"
             elif chunk_obj.chunk_type == ChunkType.TABLE:
                 full_text += chunk_obj.non_embeddable_content + "\n"
-                full_text += (chunk_obj.text + "\n") if chunk_obj.text else ""
+                # text is either a description of the table or the same compact table
+                if chunk_obj.text and chunk_obj.text != chunk_obj.non_embeddable_content:
+                    full_text += chunk_obj.text + "\n"
 
         output_chunks = []
         buffer = ""
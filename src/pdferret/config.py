@@ -1,5 +1,6 @@
 import multiprocessing
 import os
+import tempfile
 
 from .logging import logger
 
@@ -21,3 +22,84 @@ if url_env := os.environ.get("PDFERRET_GROBID_URL"):
 MAX_PAGES = 30
 if maxpages_env := os.environ.get("PDFERRET_MAX_PAGES"):
     MAX_PAGES = maxpages_env
+
+# "service" keeps a headless LibreOffice running (requires unoserver), "cli" starts libreoffice for every batch
+OFFICE_BACKEND = "service"
+if office_backend_env := os.environ.get("PDFERRET_OFFICE_BACKEND"):
+    OFFICE_BACKEND = office_backend_env.strip().lower()
+
+UNOSERVER_CMD = os.environ.get("PDFERRET_UNOSERVER_CMD", "unoserver")
+
+OFFICE_JOB_TIMEOUT = 120
+if office_timeout_env := os.environ.get("PDFERRET_OFFICE_JOB_TIMEOUT"):
+    OFFICE_JOB_TIMEOUT = int(office_timeout_env.strip())
+
+# number of LibreOffice instances (each with own user profile) converting files in parallel
+OFFICE_WORKERS = NPROC
+if office_workers_env := os.environ.get("PDFERRET_OFFICE_WORKERS"):
+    OFFICE_WORKERS = int(office_workers_env.strip())
+
+# processes rendering pdf pages with pdfium, each has its own pdfium, which is not thread-safe
+RENDER_WORKERS = NPROC
+if render_workers_env := os.environ.get("PDFERRET_RENDER_WORKERS"):
+    RENDER_WORKERS = int(render_workers_env.strip())
+
+# limits of external tools (pandoc, libreoffice command line), so a pathological file fails fast
+SUBPROCESS_TIMEOUT = 60
+if subprocess_timeout_env := os.environ.get("PDFERRET_SUBPROCESS_TIMEOUT"):
+    SUBPROCESS_TIMEOUT = int(subprocess_timeout_env.strip())
+
+# address space limit in MB for pandoc and libreoffice command line, 0 for no limit
+SUBPROCESS_MEMORY_LIMIT = 0
+if subprocess_memory_env := os.environ.get("PDFERRET_SUBPROCESS_MEMORY_LIMIT"):
+    SUBPROCESS_MEMORY_LIMIT = int(subprocess_memory_env.strip())
+
+# limits of requests to a single LLM model, shared by all processors of the process
+LLM_MAX_CONCURRENCY = 8
+if llm_concurrency_env := os.environ.get("PDFERRET_LLM_MAX_CONCURRENCY"):
+    LLM_MAX_CONCURRENCY = int(llm_concurrency_env.strip())
+
+# requests per minute to a single LLM model, 0 for no limit
+LLM_REQUESTS_PER_MINUTE = 0
+if llm_rpm_env := os.environ.get("PDFERRET_LLM_RPM"):
+    LLM_REQUESTS_PER_MINUTE = int(llm_rpm_env.strip())
+
+# input and output tokens per minute to a single LLM model, 0 for no limit
+LLM_TOKENS_PER_MINUTE = 0
+if llm_tpm_env := os.environ.get("PDFERRET_LLM_TPM"):
+    LLM_TOKENS_PER_MINUTE = int(llm_tpm_env.strip())
+
+# retries of a request rejected by the provider because of rate limits, with jittered exponential backoff
+LLM_MAX_RETRIES = 5
+if llm_retries_env := os.environ.get("PDFERRET_LLM_MAX_RETRIES"):
+    LLM_MAX_RETRIES = int(llm_retries_env.strip())
+
+# sqlite file where rate limits are shared by all processes on the host (e.g. API workers), empty for per process
+LLM_RATE_LIMIT_STATE = os.environ.get(
+    "PDFERRET_LLM_RATE_LIMIT_STATE", os.path.join(tempfile.gettempdir(), "pdferret_llm_rate_limits.sqlite")
+)
+
+# sqlite file caching vision descriptions of pages by perceptual hash across documents, empty to disable
+VISION_PAGE_CACHE = os.environ.get("PDFERRET_VISION_PAGE_CACHE", "")
+
+# size limit of each persistent cache, least recently used entries are evicted
+CACHE_MAX_SIZE_MB = 1024
+if cache_size_env := os.environ.get("PDFERRET_CACHE_MAX_SIZE_MB"):
+    CACHE_MAX_SIZE_MB = float(cache_size_env.strip())
+
+# budget of input tokens of the vision model per page image, pages are trimmed and scaled to fit it
+VISION_MAX_TOKENS_PER_PAGE = 1500
+if vision_tokens_env := os.environ.get("PDFERRET_VISION_MAX_TOKENS_PER_PAGE"):
+    VISION_MAX_TOKENS_PER_PAGE = int(vision_tokens_env.strip())
+
+# sqlite file caching LLM and vision responses by model, prompts and parameters, empty to disable
+LLM_CACHE = os.environ.get("PDFERRET_LLM_CACHE", "")
+
+# offline batch jobs of LLM enrichment (LLMBatchPostprocessor): directory of pending jobs, polling and waiting
+LLM_BATCH_DIR = os.environ.get("PDFERRET_LLM_BATCH_DIR", os.path.join(tempfile.gettempdir(), "pdferret_llm_batches"))
+LLM_BATCH_POLL_INTERVAL = 60
+if batch_poll_env := os.environ.get("PDFERRET_LLM_BATCH_POLL_INTERVAL"):
+    LLM_BATCH_POLL_INTERVAL = float(batch_poll_env.strip())
+LLM_BATCH_TIMEOUT = 24 * 3600
+if batch_timeout_env := os.environ.get("PDFERRET_LLM_BATCH_TIMEOUT"):
+    LLM_BATCH_TIMEOUT = float(batch_timeout_env.strip())
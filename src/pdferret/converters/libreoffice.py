@@ -1,32 +1,142 @@
+import concurrent.futures
 import os
+import pathlib
 import shutil
+import subprocess
 import tempfile
-from typing import Dict
+from typing import Dict, Iterable
 
 from ..base import BaseProcessor
+from ..config import OFFICE_BACKEND, OFFICE_JOB_TIMEOUT, OFFICE_WORKERS, SUBPROCESS_MEMORY_LIMIT
 from ..datamodels import PDFDoc, PDFError
+from ..logging import logger
 from ..utils.shell_run import run_command
+from .office_service import (
+    OfficeServiceStartError,
+    get_office_pool,
+    mark_office_service_failed,
+    office_service_available,
+)
 
 
 def convert_libreoffice(files: list[str], output_dir: str, output_format: str = "odt"):
     """
-    Convert a list of files to thumbnails using LibreOffice.
+    Convert a list of files to another format using LibreOffice.
+    Uses the pool of persistent office services if it is configured and available (files it fails to start for
+    are converted by the command line), otherwise starts
+    up to OFFICE_WORKERS libreoffice processes, each with own user profile, and splits the files between them.
 
     :param files: List of file paths to be converted.
-    :param output_dir: Directory where the thumbnails will be saved.
+    :param output_dir: Directory where the converted files will be saved as <name>.<output_format>.
+    :param output_format: Target format, e.g. "pdf", "docx" or "png" (thumbnail of the first page).
+    :return: A tuple (stdout, stderr, failed), failed maps files which were not converted to the reason.
     """
-    command = ["libreoffice", "--convert-to", output_format, "--outdir", output_dir, *files]
-    stdout, stderr, return_code = run_command(command)
-    return stdout, stderr
+    if OFFICE_BACKEND == "service":
+        if office_service_available():
+            return _convert_with_service(files, output_dir, output_format)
+        logger.warning("Office service (unoserver) is not available, falling back to libreoffice command line")
+    return _convert_with_cli(files, output_dir, output_format)
+
+
+def _output_path(file: str, output_dir: str, output_format: str) -> str:
+    name, _ = os.path.splitext(os.path.basename(file))
+    return os.path.join(output_dir, f"{name}.{output_format}")
+
+
+def _convert_with_service(files: list[str], output_dir: str, output_format: str):
+    jobs = [(file, _output_path(file, output_dir, output_format), output_format) for file in files]
+    errors = get_office_pool().convert_many(jobs)
+    not_started = [file for file, exc in errors.items() if isinstance(exc, OfficeServiceStartError)]
+    for file, exc in errors.items():
+        if file not in not_started:
+            logger.error(f"Failed to convert {file} to {output_format}: {repr(exc)}")
+    failed = {file: repr(exc) for file, exc in errors.items() if file not in not_started}
+    stdout = ""
+    if not_started:
+        logger.warning(f"{errors[not_started[0]]}, falling back to libreoffice command line")
+        mark_office_service_failed()
+        stdout, _, cli_failed = _convert_with_cli(not_started, output_dir, output_format)
+        failed.update(cli_failed)
+    return stdout, "\n".join(f"{file}: {reason}" for file, reason in failed.items()), failed
+
+
+def _run_libreoffice(files: list[str], output_dir: str, output_format: str, profile_dir: str):
+    """
+    Convert files in one libreoffice invocation, which is killed if no file is finished within OFFICE_JOB_TIMEOUT.
+    Returns (stdout, stderr, unfinished), where unfinished are the files without output.
+    """
+    command = [
+        "libreoffice",
+        f"-env:UserInstallation={pathlib.Path(profile_dir).as_uri()}",
+        "--convert-to",
+        output_format,
+        "--outdir",
+        output_dir,
+        *files,
+    ]
+    try:
+        stdout, stderr, return_code = run_command(
+            command,
+            # files are converted one after another, so a hung file stops the output from growing
+            timeout=OFFICE_JOB_TIMEOUT,
+            progress=lambda: sum(os.path.exists(_output_path(file, output_dir, output_format)) for file in files),
+            memory_limit=SUBPROCESS_MEMORY_LIMIT * 2**20 or None,
+        )
+    except subprocess.TimeoutExpired as e:
+        stdout, stderr = e.output or "", (e.stderr or "") + f"\nlibreoffice made no progress for {e.timeout} s"
+        logger.warning(f"libreoffice made no progress for {e.timeout} s converting {len(files)} files")
+    unfinished = [file for file in files if not os.path.exists(_output_path(file, output_dir, output_format))]
+    return stdout, stderr, unfinished
+
+
+def _convert_group(files: list[str], output_dir: str, output_format: str, profile_dir: str):
+    stdout, stderr, unfinished = _run_libreoffice(files, output_dir, output_format, profile_dir)
+    failed = {}
+    if len(files) == 1:
+        failed = {file: f"libreoffice failed to convert {file} to {output_format}" for file in unfinished}
+        return stdout, stderr, failed
+    # one broken file makes the whole invocation fail, so only the files without output are retried one by one
+    # with a fresh profile, because the killed libreoffice may leave the old one locked
+    for idx, file in enumerate(unfinished):
+        out, err, not_converted = _run_libreoffice([file], output_dir, output_format, f"{profile_dir}_retry{idx}")
+        stdout, stderr = stdout + out, stderr + err
+        if not_converted:
+            failed[file] = f"libreoffice failed to convert {file} to {output_format}"
+    return stdout, stderr, failed
+
+
+def _convert_with_cli(files: list[str], output_dir: str, output_format: str):
+    # libreoffice processes sharing a user profile are serialized, so every worker gets its own profile
+    n_workers = max(1, min(OFFICE_WORKERS, len(files)))
+    groups = [files[i::n_workers] for i in range(n_workers)]
+    with tempfile.TemporaryDirectory() as profiles_dir:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(_convert_group, group, output_dir, output_format, f"{profiles_dir}/{idx}")
+                for idx, group in enumerate(groups)
+            ]
+            results = [future.result() for future in futures]
+    failed = {file: reason for r in results for file, reason in r[2].items()}
+    for file, reason in failed.items():
+        logger.error(reason)
+    return "\n".join(r[0] for r in results), "\n".join(r[1] for r in results), failed
 
 
 class LibreOfficeConverter(BaseProcessor):
     operates_on = PDFDoc
+    # parallelized inside convert_libreoffice over LibreOffice workers
     parallel = False
 
-    def __init__(self, target_format="odt", n_proc=None, batch_size=None):
+    def __init__(self, target_format="odt", as_pdf_rendition=False, n_proc=None, batch_size=None):
+        """
+        target_format - format to convert to, the converted file replaces the original file of the document
+        as_pdf_rendition - convert to pdf and keep it as file_features.pdf_rendition in a temporary directory,
+            so that thumbnails, page renders and text extraction can share one layout pass of LibreOffice.
+            Renditions are removed by remove_pdf_renditions when the documents are processed
+        """
         super().__init__(n_proc, batch_size)
-        self.target_format = target_format
+        self.target_format = "pdf" if as_pdf_rendition else target_format
+        self.as_pdf_rendition = as_pdf_rendition
 
     def process_single(self, doc: PDFDoc) -> PDFDoc:
         # just dummy, actual processing is in _process_batch
@@ -34,24 +144,42 @@ class LibreOfficeConverter(BaseProcessor):
 
     def _process_batch(self, X: Dict[str, PDFDoc]) -> tuple[Dict[str, PDFDoc], Dict[str, PDFError]]:
         with tempfile.TemporaryDirectory() as output_dir:
-            stdout, stderr = convert_libreoffice(
+            stdout, stderr, failed = convert_libreoffice(
                 [doc.metainfo.file_features.file for doc in X.values()], output_dir, self.target_format
             )
             errors = {}
             results = {}
             for key, doc in X.items():
+                if reason := failed.get(doc.metainfo.file_features.file):
+                    errors[key] = PDFError(reason, file=key, traceback=stderr)
+                    continue
                 try:
                     base_name = os.path.basename(doc.metainfo.file_features.file)
                     name, _ = os.path.splitext(base_name)
-                    converted_path = os.path.join(output_dir, f"{name}.{self.target_format}")
-                    # copy converted file to the original file path
-                    new_path = os.path.join(
-                        os.path.dirname(doc.metainfo.file_features.file), f"{name}.{self.target_format}"
-                    )
+                    converted_path = _output_path(base_name, output_dir, self.target_format)
+                    if self.as_pdf_rendition:
+                        # own directory per rendition, so it can't overwrite an input or another rendition
+                        new_path = os.path.join(tempfile.mkdtemp(prefix="pdferret_rendition_"), f"{base_name}.pdf")
+                    else:
+                        # copy converted file to the original file path
+                        new_path = os.path.join(
+                            os.path.dirname(doc.metainfo.file_features.file), f"{name}.{self.target_format}"
+                        )
                     shutil.copy(converted_path, new_path)
                 except Exception as e:
                     errors[key] = PDFError(repr(e), file=key, traceback=stderr)
                     continue
-                doc.metainfo.file_features.file = new_path
+                if self.as_pdf_rendition:
+                    doc.metainfo.file_features.pdf_rendition = new_path
+                else:
+                    doc.metainfo.file_features.file = new_path
                 results[key] = doc
         return results, errors
+
+
+def remove_pdf_renditions(docs: Iterable[PDFDoc]):
+    """Delete pdf renditions made by LibreOfficeConverter(as_pdf_rendition=True) together with their directory"""
+    for doc in docs:
+        if rendition := doc.metainfo.file_features.pdf_rendition:
+            shutil.rmtree(os.path.dirname(rendition), ignore_errors=True)
+            doc.metainfo.file_features.pdf_rendition = None
@@ -0,0 +1,220 @@
+import atexit
+import concurrent.futures
+import os
+import queue
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+from unoserver.client import UnoClient
+
+from ..config import OFFICE_JOB_TIMEOUT, OFFICE_WORKERS, UNOSERVER_CMD
+from ..logging import logger
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class OfficeServiceStartError(RuntimeError):
+    pass
+
+
+_start_failed = False
+
+
+def _interpreter(command: list[str], executable: str) -> list[str] | None:
+    """Python running unoserver: the command itself or the shebang of the console script, None if unknown"""
+    if os.path.basename(executable).startswith("python"):
+        return [executable]
+    try:
+        with open(executable, "rb") as f:
+            first_line = f.readline(1024)
+    except OSError:
+        return None
+    if not first_line.startswith(b"#!"):
+        return None
+    interpreter = first_line[2:].decode(errors="replace").split()
+    return interpreter if interpreter and "python" in os.path.basename(interpreter[-1]) else None
+
+
+@lru_cache(maxsize=None)
+def _probe_unoserver() -> bool:
+    command = shlex.split(UNOSERVER_CMD)
+    executable = shutil.which(command[0])
+    if executable is None:
+        return False
+    interpreter = _interpreter(command, executable)
+    if interpreter is None:
+        # e.g. a wrapper script, a failure to start falls back to the command line
+        return True
+    # the unoserver package installs fine in any venv, but it needs the uno module of LibreOffice
+    try:
+        subprocess.run([*interpreter, "-c", "import uno"], check=True, capture_output=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        logger.warning(f"Python of {executable} can't import uno, office service is not available")
+        return False
+    return True
+
+
+def office_service_available() -> bool:
+    """Whether unoserver is installed with a working uno module and hasn't failed to start in this process"""
+    return not _start_failed and _probe_unoserver()
+
+
+def mark_office_service_failed():
+    """Later conversions of the process use the libreoffice command line"""
+    global _start_failed
+    _start_failed = True
+
+
+class OfficeService:
+    """
+    Long-running headless LibreOffice, controlled by unoserver, which accepts conversion jobs over XML-RPC.
+    LibreOffice is started once and then reused, so jobs only pay for the actual conversion.
+    The service is stopped if a job timed out or broke it, and started again by the next job.
+    One LibreOffice instance processes one job at a time.
+    """
+
+    def __init__(self, user_installation: str = None, start_timeout=60, job_timeout=OFFICE_JOB_TIMEOUT):
+        self._own_profile = user_installation is None
+        self.user_installation = user_installation or tempfile.mkdtemp(prefix="pdferret_office_")
+        self.start_timeout = start_timeout
+        self.job_timeout = job_timeout
+        self.port = None
+        self._process = None
+        self._lock = threading.Lock()
+        # the client call blocks without timeout, so it is run in a separate thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        atexit.register(self.shutdown)
+
+    def start(self):
+        self.port = _free_port()
+        command = [
+            *shlex.split(UNOSERVER_CMD),
+            "--interface",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+            "--uno-port",
+            str(_free_port()),
+            "--user-installation",
+            self.user_installation,
+            "--conversion-timeout",
+            str(self.job_timeout),
+        ]
+        # own process group, so LibreOffice started by unoserver is killed together with it
+        self._process = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+        deadline = time.monotonic() + self.start_timeout
+        while not self.is_healthy():
+            if self._process.poll() is not None or time.monotonic() > deadline:
+                self.stop()
+                raise OfficeServiceStartError(f"Failed to start office service: {' '.join(command)}")
+            time.sleep(0.2)
+        logger.info(f"Office service started on port {self.port}, pid {self._process.pid}")
+
+    def is_healthy(self) -> bool:
+        if self._process is None or self._process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def stop(self):
+        if self._process is None:
+            return
+        try:
+            os.killpg(self._process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self._process.wait()
+        self._process = None
+
+    def convert(self, infile: str, outfile: str, convert_to: str):
+        """
+        Convert infile to the format convert_to (e.g. "pdf", "docx", "png") and save as outfile.
+        Raises TimeoutError if the conversion takes longer than job_timeout.
+        """
+        with self._lock:
+            if not self.is_healthy():
+                if self._process is not None:
+                    logger.warning(f"Office service on port {self.port} is not responding, restarting it")
+                    self.stop()
+                self.start()
+            client = UnoClient(server="127.0.0.1", port=str(self.port))
+            future = self._executor.submit(client.convert, inpath=infile, outpath=outfile, convert_to=convert_to)
+            try:
+                future.result(timeout=self.job_timeout)
+            except concurrent.futures.TimeoutError as e:
+                # killing LibreOffice also unblocks the client thread
+                self.stop()
+                raise TimeoutError(f"Conversion of {infile} timed out after {self.job_timeout} s") from e
+            except Exception:
+                # the service is started again by the next job, so a failed restart doesn't hide this error
+                if not self.is_healthy():
+                    self.stop()
+                raise
+
+    def shutdown(self):
+        self.stop()
+        if self._own_profile:
+            shutil.rmtree(self.user_installation, ignore_errors=True)
+
+
+class OfficeServicePool:
+    """
+    Pool of n_workers office services, each with its own LibreOffice user profile,
+    so conversions of a batch run in parallel instead of being serialized by a single profile.
+    Services are started lazily, the most recently used (warm) service is preferred.
+    """
+
+    def __init__(self, n_workers=OFFICE_WORKERS):
+        self.n_workers = n_workers
+        self._services = queue.LifoQueue()
+        for _ in range(n_workers):
+            self._services.put(OfficeService())
+
+    def convert(self, infile: str, outfile: str, convert_to: str):
+        service = self._services.get()
+        try:
+            service.convert(infile, outfile, convert_to)
+        finally:
+            self._services.put(service)
+
+    def convert_many(self, jobs: list[tuple[str, str, str]]) -> dict[str, Exception]:
+        """
+        Run jobs (infile, outfile, convert_to) on all workers.
+        Returns exceptions of the failed jobs by infile.
+        """
+        errors = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            futures = {executor.submit(self.convert, *job): job[0] for job in jobs}
+            for future in concurrent.futures.as_completed(futures):
+                if exc := future.exception():
+                    errors[futures[future]] = exc
+        return errors
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_office_pool() -> OfficeServicePool:
+    """Office services shared by all converters and thumbnailers of the process, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficeServicePool()
+        return _pool
@@ -44,6 +44,13 @@ class FileFeatures:
     filename: str = ""
     file: PDFFile = None
     is_scanned: bool = None
+    # pdf rendered once from office formats, shared by thumbnails, page renders and text extraction
+    pdf_rendition: PDFFile = None
+
+    @property
+    def pdf(self) -> PDFFile:
+        # pdf rendition if available, otherwise the file itself
+        return self.pdf_rendition or self.file
 
 
 @dataclass
@@ -0,0 +1,248 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List
+
+import requests
+
+from ..config import LLM_BATCH_DIR, LLM_BATCH_POLL_INTERVAL, LLM_BATCH_TIMEOUT
+from ..logging import logger
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str  # unique in the job, results are returned by it
+    user_prompt: str
+    system_prompt: str = None
+    json_response: bool = True
+    temperature: float = 0.2
+    max_tokens: int = 1000
+
+
+class BatchProvider(ABC):
+    """
+    Batch tier of an LLM provider: requests are submitted at once as a job and answered within hours,
+    usually at half of the price and with separate quota.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def submit(self, batch_requests: List[BatchRequest]) -> str:
+        """Start a job, returns its id"""
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """One of "pending", "completed", "failed" """
+
+    @abstractmethod
+    def results(self, job_id: str) -> Dict[str, str]:
+        """Text of the response by custom_id of the request, failed requests are missing"""
+
+
+class FakeBatchProvider(BatchProvider):
+    """
+    Provider for tests, jobs are kept in memory and complete after polls_to_complete calls of status.
+    Responses are made by respond(request), which may raise to fail the request.
+    """
+
+    name = "fake"
+
+    def __init__(self, respond: Callable[[BatchRequest], str], polls_to_complete: int = 1):
+        self.respond = respond
+        self.polls_to_complete = polls_to_complete
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, batch_requests: List[BatchRequest]) -> str:
+        with self._lock:
+            job_id = f"fake-{len(self.jobs)}"
+            self.jobs[job_id] = {"requests": list(batch_requests), "polls": 0}
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        job = self.jobs[job_id]
+        job["polls"] += 1
+        return "completed" if job["polls"] >= self.polls_to_complete else "pending"
+
+    def results(self, job_id: str) -> Dict[str, str]:
+        results = {}
+        for request in self.jobs[job_id]["requests"]:
+            try:
+                results[request.custom_id] = self.respond(request)
+            except Exception as e:
+                logger.warning(f"Fake batch request {request.custom_id} failed: {e}")
+        return results
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """
+    Batch API of OpenAI and compatible providers: the requests are uploaded as a jsonl file
+    for /v1/chat/completions, the job is created from it and its output file is downloaded when completed.
+    """
+
+    name = "openai"
+    failed_statuses = {"failed", "expired", "cancelled", "cancelling"}
+
+    def __init__(
+        self, model: str, api_key: str = None, base_url: str = "https://api.openai.com/v1", completion_window="24h"
+    ):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.completion_window = completion_window
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key or os.environ.get('OPENAI_API_KEY', '')}"
+
+    def _line(self, request: BatchRequest) -> str:
+        messages = [{"role": "user", "content": request.user_prompt}]
+        if request.system_prompt:
+            messages.insert(0, {"role": "system", "content": request.system_prompt})
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+        }
+        if request.json_response:
+            body["response_format"] = {"type": "json_object"}
+        line = {"custom_id": request.custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+        return json.dumps(line, ensure_ascii=False)
+
+    def submit(self, batch_requests: List[BatchRequest]) -> str:
+        jsonl = "\n".join(self._line(r) for r in batch_requests).encode()
+        resp = self.session.post(
+            f"{self.base_url}/files",
+            files={"file": ("batch.jsonl", io.BytesIO(jsonl))},
+            data={"purpose": "batch"},
+            timeout=300,
+        )
+        resp.raise_for_status()
+        resp = self.session.post(
+            f"{self.base_url}/batches",
+            json={
+                "input_file_id": resp.json()["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": self.completion_window,
+            },
+            timeout=60,
+        )
+        resp.raise_for_status()
+        return resp.json()["id"]
+
+    def _job(self, job_id: str) -> dict:
+        resp = self.session.get(f"{self.base_url}/batches/{job_id}", timeout=60)
+        resp.raise_for_status()
+        return resp.json()
+
+    def status(self, job_id: str) -> str:
+        status = self._job(job_id)["status"]
+        if status == "completed":
+            return "completed"
+        return "failed" if status in self.failed_statuses else "pending"
+
+    def results(self, job_id: str) -> Dict[str, str]:
+        output_file = self._job(job_id).get("output_file_id")
+        if not output_file:
+            return {}
+        resp = self.session.get(f"{self.base_url}/files/{output_file}/content", timeout=300)
+        resp.raise_for_status()
+        results = {}
+        for line in resp.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            try:
+                results[item["custom_id"]] = item["response"]["body"]["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                logger.warning(f"Batch request {item.get('custom_id')} failed: {item.get('error')}")
+        return results
+
+
+class BatchJobStore:
+    """
+    Pending jobs persisted as json files in a directory, by a key of the requests.
+    Submitting the same requests again (e.g. after a restart) resumes the pending job instead of starting a new one.
+    """
+
+    def __init__(self, path: str = LLM_BATCH_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    @staticmethod
+    def key(provider: BatchProvider, batch_requests: List[BatchRequest]) -> str:
+        payload = json.dumps(
+            [provider.name, getattr(provider, "model", None), [asdict(r) for r in batch_requests]],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def load(self, key: str) -> dict | None:
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, state: dict):
+        tmp = self._file(key) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._file(key))
+
+    def remove(self, key: str):
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+
+def run_batch(
+    provider: BatchProvider,
+    batch_requests: List[BatchRequest],
+    store: BatchJobStore = None,
+    poll_interval: float = LLM_BATCH_POLL_INTERVAL,
+    timeout: float = LLM_BATCH_TIMEOUT,
+) -> Dict[str, str]:
+    """
+    Submit requests as a batch job (or resume the persisted one), wait for it and return the responses
+    by custom_id. Raises TimeoutError if the job is not completed within timeout, the job stays persisted
+    so a later run with the same requests picks it up.
+    """
+    if not batch_requests:
+        return {}
+    store = store or BatchJobStore()
+    key = store.key(provider, batch_requests)
+    state = store.load(key)
+    if state is None:
+        job_id = provider.submit(batch_requests)
+        state = {
+            "provider": provider.name,
+            "job_id": job_id,
+            "submitted": time.time(),
+            "n_requests": len(batch_requests),
+        }
+        store.save(key, state)
+        logger.info(f"Submitted batch job {job_id} with {len(batch_requests)} requests")
+    else:
+        logger.info(f"Resuming batch job {state['job_id']} submitted at {time.ctime(state['submitted'])}")
+
+    deadline = time.monotonic() + timeout
+    while (status := provider.status(state["job_id"])) == "pending":
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch job {state['job_id']} is not completed after {timeout} s")
+        time.sleep(poll_interval)
+    store.remove(key)
+    if status == "failed":
+        raise RuntimeError(f"Batch job {state['job_id']} failed")
+    results = provider.results(state["job_id"])
+    logger.info(f"Batch job {state['job_id']} completed, {len(results)}/{len(batch_requests)} requests answered")
+    return results
@@ -0,0 +1,161 @@
+import concurrent.futures
+import hashlib
+import io
+import json
+import time
+from typing import Type
+
+from PIL import Image
+from pydantic import BaseModel, ValidationError
+
+from ..config import CACHE_MAX_SIZE_MB, LLM_CACHE
+from ..logging import logger
+from ..utils.disk_cache import get_disk_cache
+from ..utils.tokens import get_tokenizer
+from ..utils.vision_tokens import vision_token_model
+from .health import get_health
+from .repair import count as count_repair
+from .repair import raw_from_error, repair_structured
+from .scheduler import get_scheduler, model_id, run_async
+
+
+class LLMClient:
+    """
+    Entry point for requests to an llmonkey model. Every request which is sent to the model
+    waits for a slot of the scheduler of the model, with its tokens estimated for the rate limits. If cache_path is set, responses are cached
+    on disk by model id, prompts (or hash of the image), response schema and generation parameters,
+    so repeated processing of the same content doesn't send the requests again.
+    Structured responses which don't parse are repaired locally (see llm.repair), if that fails too,
+    the model is asked again up to max_reasks times.
+    Pass cache_path=None to opt out, e.g. if different responses are wanted for the same prompt.
+    """
+
+    def __init__(
+        self, model, cache_path: str = LLM_CACHE, cache_max_size_mb: float = CACHE_MAX_SIZE_MB, max_reasks: int = 1
+    ):
+        self.model = model
+        self.max_reasks = max_reasks
+        self.model_id = model_id(model)
+        self.scheduler = get_scheduler(model)
+        self.health = get_health(self.model_id)
+        self.cache = get_disk_cache(cache_path, cache_max_size_mb) if cache_path else None
+
+    def _cache_key(self, **params) -> str:
+        image = params.pop("image", None)
+        if image is not None:
+            params["image_sha256"] = hashlib.sha256(image).hexdigest()
+        params["model"] = self.model_id
+        return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    def _estimate_tokens(self, *prompts: str, image: bytes = None, max_tokens: int = 0) -> int:
+        """Input and output tokens of a request as counted by rate limits of providers, output at most max_tokens"""
+        if not self.scheduler.tokens_per_minute:
+            return 0
+        tokenizer = get_tokenizer(self.model_id)
+        tokens = sum(tokenizer.count(prompt) for prompt in prompts if prompt) + max_tokens
+        if image is not None:
+            token_model = vision_token_model(self.model_id)
+            try:
+                with Image.open(io.BytesIO(image)) as img:
+                    size = img.size
+            except OSError:
+                # not decodable here, the largest image the provider accepts
+                size = (token_model.max_side, token_model.max_side)
+            tokens += token_model.estimate_tokens(*size)
+        return tokens
+
+    def _request(self, func, tokens: int, **kwargs):
+        """func(**kwargs) within the limits of the scheduler, latency and errors are recorded in health"""
+
+        def timed():
+            start = time.monotonic()
+            try:
+                result = func(**kwargs)
+            except Exception:
+                self.health.record(time.monotonic() - start, ok=False)
+                raise
+            self.health.record(time.monotonic() - start, ok=True)
+            return result
+
+        return self.scheduler.call(timed, tokens=tokens)
+
+    def _cached(self, key: str):
+        return self.cache.get(key) if self.cache else None
+
+    def _store(self, key: str, value: str):
+        if self.cache and value is not None:
+            self.cache.set(key, value)
+
+    def structured(
+        self, data_model: Type[BaseModel], user_prompt: str, system_prompt: str = None, temperature=0.2, max_tokens=1000
+    ) -> BaseModel | None:
+        """Response parsed to data_model, None if the model returned nothing usable"""
+        key = self._cache_key(
+            kind="structured",
+            schema=data_model.model_json_schema(),
+            user_prompt=user_prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        if (cached := self._cached(key)) is not None:
+            logger.debug(f"LLM cache hit for {data_model.__name__} of {self.model_id}")
+            return data_model.model_validate_json(cached)
+        tokens = self._estimate_tokens(user_prompt, system_prompt, max_tokens=max_tokens)
+        parsed = None
+        # a response which doesn't parse is repaired locally, asking the model again is the last resort
+        for attempt in range(1 + self.max_reasks):
+            try:
+                parsed, raw = self._request(
+                    self.model.generate_structured_response,
+                    tokens=tokens,
+                    data_model=data_model,
+                    user_prompt=user_prompt,
+                    system_prompt=system_prompt,
+                    # the same temperature would likely give the same broken response
+                    temperature=temperature if attempt == 0 else 0.0,
+                    max_tokens=max_tokens,
+                )
+            except (ValidationError, json.JSONDecodeError) as e:
+                logger.warning(f"Structured response of {self.model_id} failed to parse: {e}")
+                # the client reports a broken response by raising, the response is taken from the error
+                parsed, raw = None, raw_from_error(e)
+            outcome = "valid"
+            if parsed is None and raw is not None:
+                parsed = repair_structured(raw, data_model)
+                outcome = "repaired"
+            if parsed is not None:
+                count_repair("reasked" if attempt else outcome)
+                break
+        else:
+            count_repair("failed")
+        if parsed:
+            self._store(key, parsed.model_dump_json())
+        return parsed
+
+    def prompt(self, user_prompt: str, image: bytes = None, temperature=0.2, max_tokens=1000) -> str | None:
+        """Text of the response, None if the model returned nothing"""
+        key = self._cache_key(
+            kind="prompt", user_prompt=user_prompt, image=image, temperature=temperature, max_tokens=max_tokens
+        )
+        if (cached := self._cached(key)) is not None:
+            logger.debug(f"LLM cache hit for prompt of {self.model_id}")
+            return cached
+        resp = self._request(
+            self.model.generate_prompt_response,
+            tokens=self._estimate_tokens(user_prompt, image=image, max_tokens=max_tokens),
+            user_prompt=user_prompt,
+            image=image,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        text = resp.conversation[-1].content if resp else None
+        self._store(key, text)
+        return text
+
+    def submit(self, method: str, *args, **kwargs) -> concurrent.futures.Future:
+        """Run method ("structured" or "prompt") concurrently, returns a future"""
+        return run_async(getattr(self, method), *args, **kwargs)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache else {}
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class ModelHealth:
+    """
+    Latency and outcome of the last window requests to a model, as measured by LLMClient
+    (requests to the provider only: waiting for the scheduler and cache hits are not included).
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.last_error = None
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(latency)
+            else:
+                self.last_error = time.time()
+
+    def latency_percentile(self, q: float) -> float | None:
+        """q-th percentile of latency of successful requests, None until there are min_samples of them"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return float(np.percentile(self._latencies, q))
+
+    @property
+    def error_rate(self) -> float:
+        """Share of failed requests, 0 until there are min_samples outcomes"""
+        with self._lock:
+            if len(self._outcomes) < self.min_samples:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def unhealthy(self, max_error_rate: float, cooldown: float) -> bool:
+        """
+        Whether the error rate is above max_error_rate and the last error is less than cooldown seconds ago.
+        After the cooldown the model is tried again, a new error makes it unhealthy for another cooldown.
+        """
+        return (
+            self.error_rate > max_error_rate
+            and self.last_error is not None
+            and time.time() - self.last_error < cooldown
+        )
+
+    def stats(self) -> dict:
+        return {
+            "requests": len(self._outcomes),
+            "error_rate": self.error_rate,
+            "p50": self.latency_percentile(50),
+            "p95": self.latency_percentile(95),
+            "p99": self.latency_percentile(99),
+        }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_health(model_id: str) -> ModelHealth:
+    """Statistics of the model shared by all clients of the process"""
+    with _health_lock:
+        if model_id not in _health:
+            _health[model_id] = ModelHealth()
+        return _health[model_id]
+
+
+def health_stats() -> dict:
+    """Statistics of all models used in the process, by model id"""
+    with _health_lock:
+        return {model_id: health.stats() for model_id, health in _health.items()}
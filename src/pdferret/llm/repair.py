@@ -0,0 +1,172 @@
+import ast
+import json
+import re
+import threading
+import types
+import typing
+from collections import Counter
+from typing import Any, Type
+
+from pydantic import BaseModel, ValidationError
+
+_fence = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_trailing_comma = re.compile(r",\s*([}\]])")
+
+# how structured responses were obtained: valid, repaired (locally), reasked (the model again), failed
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def count(outcome: str):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def repair_stats() -> dict:
+    """Counts of outcomes of structured responses in the process and the rate of each"""
+    with _stats_lock:
+        total = sum(_stats.values())
+        stats = dict(_stats)
+    return {**stats, **{f"{k}_rate": v / total for k, v in stats.items()}} if total else stats
+
+
+def response_text(raw) -> str | None:
+    """Text of a raw response: a string, a response with conversation (llmonkey) or a json-like object"""
+    if raw is None or isinstance(raw, str):
+        return raw
+    if conversation := getattr(raw, "conversation", None):
+        return conversation[-1].content
+    if isinstance(raw, (dict, list)):
+        return json.dumps(raw)
+    return str(raw)
+
+
+def raw_from_error(exc: BaseException) -> str | None:
+    """
+    Response text carried by a parse error of the client (or its cause): the document of a JSONDecodeError,
+    or the input of a ValidationError, i.e. the whole json or the parsed object when fields are missing.
+    None if the error only has parts of the response.
+    """
+    while exc is not None:
+        if isinstance(exc, json.JSONDecodeError):
+            return exc.doc
+        if isinstance(exc, ValidationError):
+            inputs = [error.get("input") for error in exc.errors()]
+            for value in inputs:
+                if isinstance(value, str) and "{" in value:
+                    return value
+            for value in inputs:
+                if isinstance(value, dict):
+                    return json.dumps(value, ensure_ascii=False)
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def strip_fences(text: str) -> str:
+    """Content of the first markdown code block, or the text itself"""
+    match = _fence.search(text)
+    return match.group(1) if match else text
+
+
+def extract_json_object(text: str) -> str | None:
+    """First balanced {...} in text, braces inside strings are skipped"""
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, None, False
+        for pos in range(start, len(text)):
+            char = text[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == in_string:
+                    in_string = None
+            elif char in "\"'":
+                in_string = char
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start : pos + 1]
+        # unbalanced (e.g. truncated response), try the next object
+        start = text.find("{", start + 1)
+    return None
+
+
+def _loads(candidate: str) -> Any:
+    for attempt in (candidate, _trailing_comma.sub(r"\1", candidate)):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError:
+            pass
+    # single quotes, True/False/None as written by some models
+    try:
+        return ast.literal_eval(candidate)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _allowed_types(annotation) -> set:
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        return {typing.get_origin(arg) or arg for arg in typing.get_args(annotation)}
+    return {typing.get_origin(annotation) or annotation}
+
+
+def _coerce(value, annotation):
+    allowed = _allowed_types(annotation)
+    if value is None or type(value) in allowed:
+        return value
+    if list in allowed:
+        if isinstance(value, str):
+            return [item.strip() for item in re.split(r"[;,\n]| and ", value) if item.strip()]
+        if isinstance(value, dict):
+            return [str(v) for v in value.values()]
+        return [value]
+    if str in allowed:
+        if isinstance(value, list):
+            return ", ".join(str(item) for item in value)
+        if isinstance(value, dict):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value)
+    return value
+
+
+def _empty(annotation):
+    allowed = _allowed_types(annotation)
+    if list in allowed:
+        return []
+    return "" if str in allowed else None
+
+
+def coerce_to_schema(obj: dict, data_model: Type[BaseModel]) -> dict:
+    """
+    Values of obj adapted to the fields of data_model: keys are matched case-insensitively,
+    lists and strings are converted into each other, missing or null fields get their default (or empty) value.
+    """
+    by_key = {str(k).lower(): v for k, v in obj.items()}
+    coerced = {}
+    for name, field in data_model.model_fields.items():
+        value = _coerce(by_key.get(name.lower()), field.annotation)
+        if value is None:
+            value = field.get_default(call_default_factory=True) if not field.is_required() else None
+            if value is None:
+                value = _empty(field.annotation)
+        coerced[name] = value
+    return coerced
+
+
+def repair_structured(raw, data_model: Type[BaseModel]) -> BaseModel | None:
+    """Parse a raw response which failed to parse or validate into data_model, None if it can't be repaired"""
+    text = response_text(raw)
+    if not text:
+        return None
+    candidate = extract_json_object(strip_fences(text))
+    obj = _loads(candidate) if candidate else None
+    if not isinstance(obj, dict):
+        return None
+    try:
+        return data_model.model_validate(coerce_to_schema(obj, data_model))
+    except ValidationError:
+        return None
@@ -0,0 +1,144 @@
+import concurrent.futures
+import time
+from typing import List
+
+from ..config import CACHE_MAX_SIZE_MB, LLM_CACHE, LLM_MAX_CONCURRENCY
+from ..logging import logger
+from .client import LLMClient
+from .scheduler import on_request_sent, run_async
+
+# attempts of routed requests run here, apart from the shared LLM pool where the routed requests themselves may run
+_attempts = concurrent.futures.ThreadPoolExecutor(max_workers=8 * LLM_MAX_CONCURRENCY, thread_name_prefix="llm-route")
+
+
+class RoutedLLMClient:
+    """
+    LLMClient over an ordered list of models, the first one is preferred.
+    A request goes to the first model; if it hasn't answered within its hedge delay (hedge_percentile of its recent
+    latency, between min_hedge_delay and request_timeout, default_hedge_delay until enough requests are measured)
+    after it was sent, the request is also sent to the next model and the first response wins.
+    Time spent waiting for the rate limits of the model doesn't count, as it isn't measured in its latency either. On an error, an empty response or
+    after request_timeout the next model takes over. Models with error rate above max_error_rate
+    are tried after the healthy ones, until error_cooldown seconds after their last error.
+    """
+
+    def __init__(
+        self,
+        models: List,
+        cache_path: str = LLM_CACHE,
+        cache_max_size_mb: float = CACHE_MAX_SIZE_MB,
+        hedge_percentile: float = 95,
+        min_hedge_delay: float = 2.0,
+        default_hedge_delay: float = 30.0,
+        request_timeout: float = 120.0,
+        max_error_rate: float = 0.5,
+        error_cooldown: float = 60.0,
+    ):
+        self.clients = [LLMClient(model, cache_path, cache_max_size_mb) for model in models]
+        self.model = self.clients[0].model
+        self.model_id = self.clients[0].model_id
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.request_timeout = request_timeout
+        self.max_error_rate = max_error_rate
+        self.error_cooldown = error_cooldown
+
+    def _order(self) -> List[LLMClient]:
+        # stable sort, so the preference is kept among healthy models
+        return sorted(
+            self.clients, key=lambda client: client.health.unhealthy(self.max_error_rate, self.error_cooldown)
+        )
+
+    def hedge_delay(self, client: LLMClient) -> float:
+        latency = client.health.latency_percentile(self.hedge_percentile)
+        delay = self.default_hedge_delay if latency is None else latency
+        return min(max(delay, self.min_hedge_delay), self.request_timeout)
+
+    def _route(self, method: str, *args, **kwargs):
+        candidates = self._order()
+        pending = {}  # future -> attempt: client and when its request was sent (None while it waits for limits)
+        errors = []
+
+        def launch():
+            attempt = {"client": candidates.pop(0), "sent": None}
+
+            def run():
+                # deadlines start when the request is sent, not while it waits in the local scheduler queue
+                with on_request_sent(lambda: attempt.update(sent=time.monotonic())):
+                    return getattr(attempt["client"], method)(*args, **kwargs)
+
+            pending[_attempts.submit(run)] = attempt
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            sent = [attempt for attempt in pending.values() if attempt["sent"] is not None]
+            deadlines = [attempt["sent"] + self.request_timeout for attempt in sent]
+            latest = list(pending.values())[-1]
+            if candidates and latest["sent"] is not None:
+                # the next model is hedged when the latest request is slower than usual
+                deadlines.append(latest["sent"] + self.hedge_delay(latest["client"]))
+            elif candidates or len(sent) < len(pending):
+                # check again when the waiting requests may have been sent
+                deadlines.append(now + self.min_hedge_delay / 4)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                client = pending.pop(future)["client"]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Request to {client.model_id} failed: {e}")
+                    errors.append(e)
+                    result = None
+                if result is not None:
+                    return result
+            now = time.monotonic()
+            for future, attempt in list(pending.items()):
+                if attempt["sent"] is not None and now - attempt["sent"] >= self.request_timeout:
+                    # the request can't be cancelled, its response is ignored;
+                    # LLMClient records its outcome in the model health when it completes
+                    client = attempt["client"]
+                    logger.warning(f"Request to {client.model_id} timed out after {self.request_timeout} s")
+                    errors.append(TimeoutError(f"{client.model_id} timed out"))
+                    del pending[future]
+            if not candidates:
+                continue
+            if not pending:
+                # fail over, nothing is in flight anymore
+                launch()
+            elif not done and (latest := list(pending.values())[-1])["sent"] is not None:
+                if now - latest["sent"] >= self.hedge_delay(latest["client"]):
+                    logger.info(f"Hedging request to {latest['client'].model_id} with {candidates[0].model_id}")
+                    launch()
+        if errors:
+            raise errors[-1]
+        return None
+
+    def structured(self, *args, **kwargs):
+        """See LLMClient.structured"""
+        return self._route("structured", *args, **kwargs)
+
+    def prompt(self, *args, **kwargs):
+        """See LLMClient.prompt"""
+        return self._route("prompt", *args, **kwargs)
+
+    def submit(self, method: str, *args, **kwargs) -> concurrent.futures.Future:
+        """Run method ("structured" or "prompt") concurrently, returns a future"""
+        return run_async(getattr(self, method), *args, **kwargs)
+
+    def cache_stats(self) -> dict:
+        return self.clients[0].cache_stats()
+
+
+def primary_model(models):
+    """The preferred model of a model or a list of models"""
+    return models[0] if isinstance(models, (list, tuple)) else models
+
+
+def llm_client(models, cache_path: str = LLM_CACHE) -> LLMClient | RoutedLLMClient:
+    """Client of a model, or routed client of a list of models (fallback chain, first one preferred)"""
+    if isinstance(models, (list, tuple)):
+        return RoutedLLMClient(models, cache_path) if len(models) > 1 else LLMClient(models[0], cache_path)
+    return LLMClient(models, cache_path)
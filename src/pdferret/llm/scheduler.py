@@ -0,0 +1,275 @@
+import concurrent.futures
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from ..config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RATE_LIMIT_STATE,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+)
+from ..logging import logger
+
+# requests are executed here, the number of requests in flight is limited per model by the schedulers
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4 * LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+# backoff after a rate limit error: base * 2**attempt seconds, jittered by +-50%, at most max
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+
+# callbacks of the current thread called when a request leaves the scheduler, see on_request_sent
+_sent_callbacks = threading.local()
+
+
+@contextmanager
+def on_request_sent(callback):
+    """Call callback() whenever a request made in this thread inside the context passes the limits and is sent"""
+    previous = getattr(_sent_callbacks, "callback", None)
+    _sent_callbacks.callback = callback
+    try:
+        yield
+    finally:
+        _sent_callbacks.callback = previous
+
+
+def run_async(func, *args, **kwargs) -> concurrent.futures.Future:
+    """Run func in the shared LLM thread pool without taking a scheduler slot, e.g. if func takes it itself"""
+    return _executor.submit(func, *args, **kwargs)
+
+
+def model_id(model) -> str:
+    config = getattr(model, "config", None)
+    return getattr(config, "identifier", None) or type(model).__name__
+
+
+# rate limit wording, or status 429 reported in the message (e.g. "Error code: 429", "HTTP 429"),
+# a bare number must not match, "429" also occurs in request ids, ports or byte counts
+_rate_limit_message = re.compile(
+    r"rate[ _-]?limit|too many requests|\b(?:status|code|http|error)\b\W{0,3}(?:code\W{0,3})?429\b"
+)
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """HTTP 429 as raised by requests / httpx based clients, or an error message telling about rate limits"""
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status is not None:
+        return status == 429
+    return bool(_rate_limit_message.search(str(exc).lower()))
+
+
+def retry_after(exc: Exception) -> float | None:
+    """Seconds from the Retry-After header of the response of the error, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _reserve(tats: dict, limits: dict, now: float) -> tuple[float, dict]:
+    """
+    Generic cell rate algorithm over several limits at once.
+    limits maps the name of a limit to (interval, tolerance, cost): every unit of cost takes interval seconds
+    of the budget, and requests may run ahead of the budget by tolerance seconds (i.e. the burst).
+    tats maps the name of a limit to its theoretical arrival time.
+    Returns the start time of the request and the updated theoretical arrival times.
+    """
+    start = now
+    for name, (interval, tolerance, cost) in limits.items():
+        # a request larger than the burst waits for the full burst and leaves a debt
+        start = max(start, tats.get(name, 0.0) + min(cost * interval, tolerance) - tolerance)
+    updated = {
+        name: max(tats.get(name, 0.0), start) + cost * interval
+        for name, (interval, tolerance, cost) in limits.items()
+        if cost * interval
+    }
+    return start, updated
+
+
+class _LocalLimitState:
+    """State of the rate limits in memory, shared by the threads of the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tats = {}
+
+    def reserve(self, limits: dict, now: float) -> float:
+        with self._lock:
+            start, updated = _reserve(self._tats, limits, now)
+            self._tats.update(updated)
+            return start
+
+    def delay(self, name: str, until: float):
+        with self._lock:
+            self._tats[name] = max(self._tats.get(name, 0.0), until)
+
+
+class _SharedLimitState:
+    """
+    State of the rate limits in a sqlite file, shared by the processes on the host.
+    Every reservation with a cost is a write transaction, so concurrent processes don't overbook the budget.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # a connection must not be used across fork, so forked workers open their own
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS limits (name TEXT PRIMARY KEY, tat REAL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def reserve(self, limits: dict, now: float) -> float:
+        names = list(limits)
+        query = f"SELECT name, tat FROM limits WHERE name IN ({','.join('?' * len(names))})"
+        if not any(interval * cost for interval, _, cost in limits.values()):
+            # nothing to book (no rate limits configured, only the pause after rate limit errors), so no write lock
+            with self._lock:
+                return _reserve(dict(self._connection().execute(query, names).fetchall()), limits, now)[0]
+        with self._transaction() as conn:
+            rows = conn.execute(query, names)
+            start, updated = _reserve(dict(rows.fetchall()), limits, now)
+            conn.executemany("INSERT OR REPLACE INTO limits (name, tat) VALUES (?, ?)", updated.items())
+        return start
+
+    def delay(self, name: str, until: float):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO limits (name, tat) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET tat = MAX(tat, ?)",
+                (name, until, until),
+            )
+
+
+_limit_states = {}
+_limit_states_lock = threading.Lock()
+
+
+def get_limit_state(path: str = LLM_RATE_LIMIT_STATE):
+    """State of the rate limits in the sqlite file at path, or in memory of the process if path is empty"""
+    path = os.path.abspath(path) if path else ""
+    with _limit_states_lock:
+        if path not in _limit_states:
+            _limit_states[path] = _SharedLimitState(path) if path else _LocalLimitState()
+        return _limit_states[path]
+
+
+class LLMScheduler:
+    """
+    Limits requests to one model: at most max_concurrency requests in flight in the process,
+    at most requests_per_minute started per minute (evenly spaced) and at most tokens_per_minute
+    estimated tokens per minute (in bursts of up to a minute of the budget), 0 means no limit.
+    Rate limits are kept in state_path, so all processes using the file share them, see get_limit_state.
+    Requests rejected by the provider because of rate limits are retried with jittered exponential backoff,
+    during which other requests to the model wait too.
+    """
+
+    def __init__(
+        self,
+        name="default",
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        max_retries=LLM_MAX_RETRIES,
+        state_path=LLM_RATE_LIMIT_STATE,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._state = get_limit_state(state_path)
+
+    def _limits(self, tokens: int) -> dict:
+        # the pause is set by backoff after rate limit errors and costs nothing itself
+        limits = {f"{self.name}:pause": (0.0, 0.0, 0)}
+        if self.requests_per_minute:
+            interval = 60 / self.requests_per_minute
+            limits[f"{self.name}:requests"] = (interval, interval, 1)
+        if self.tokens_per_minute and tokens:
+            limits[f"{self.name}:tokens"] = (60 / self.tokens_per_minute, 60.0, tokens)
+        return limits
+
+    def _wait_for_rate(self, tokens: int = 0):
+        now = time.time()
+        start = self._state.reserve(self._limits(tokens), now)
+        time.sleep(max(0.0, start - now))
+
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        """
+        Wait until a request of estimated tokens (input and output) may be sent,
+        the request must be made inside the context
+        """
+        with self._semaphore:
+            self._wait_for_rate(tokens)
+            if callback := getattr(_sent_callbacks, "callback", None):
+                callback()
+            yield
+
+    def backoff(self, attempt: int, exc: Exception = None) -> float:
+        """Pause all requests to the model after a rate limit error, returns the delay in seconds"""
+        delay = retry_after(exc) if exc is not None else None
+        if delay is None:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.5)
+        self._state.delay(f"{self.name}:pause", time.time() + delay)
+        return delay
+
+    def call(self, func, *args, tokens: int = 0, **kwargs):
+        """func(*args, **kwargs) within the limits, retried on rate limit errors"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.slot(tokens):
+                    return func(*args, **kwargs)
+            except Exception as exc:
+                if attempt >= self.max_retries or not is_rate_limit_error(exc):
+                    raise
+                delay = self.backoff(attempt, exc)
+                logger.warning(
+                    f"Rate limit of {self.name} hit, retrying in {delay:.1f} s ({attempt + 1}/{self.max_retries})"
+                )
+
+    def submit(self, func, *args, tokens: int = 0, **kwargs) -> concurrent.futures.Future:
+        """Run func(*args, **kwargs) as soon as the limits allow, returns a future"""
+        return _executor.submit(self.call, func, *args, tokens=tokens, **kwargs)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model) -> LLMScheduler:
+    """Scheduler shared by all requests to the model (of the provider, if known) in the process"""
+    provider = getattr(getattr(model, "config", None), "provider", None)
+    key = f"{provider}/{model_id(model)}" if isinstance(provider, str) else model_id(model)
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = LLMScheduler(name=key)
+        return _schedulers[key]
@@ -0,0 +1,65 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, List
+
+_words = re.compile(r"\w\w+")
+
+
+@dataclass(frozen=True)
+class SizeRouting:
+    """
+    Thresholds of LLMPostprocessor by the size of the document content, set per file type in the recipes.
+    Documents with at most small_model_max_tokens input tokens (and at most small_model_max_chunks chunks, if set)
+    are sent to the small model. Documents with at most skip_summary_max_tokens tokens, or fewer than
+    skip_summary_min_words distinct words, get no summary request: the beginning of their content,
+    up to abstract_max_tokens, is their abstract.
+    A threshold of 0 is disabled. Prompts of documents routed to the small model are budgeted for its context window.
+    """
+
+    small_model_max_tokens: int = 0
+    small_model_max_chunks: int = 0
+    skip_summary_max_tokens: int = 0
+    skip_summary_min_words: int = 0
+    abstract_max_tokens: int = 300
+
+
+@dataclass(frozen=True)
+class SizeRoute:
+    small_model: bool = False
+    skip_summary: bool = False
+
+
+def count_tokens_upto(texts: List[str], count_tokens: Callable[[str], int], limit: int) -> int:
+    """Tokens of texts, counting stops as soon as limit is exceeded, so long documents are not tokenized fully"""
+    total = 0
+    for text in texts:
+        total += count_tokens(text)
+        if total > limit:
+            break
+    return total
+
+
+def has_min_words(texts: List[str], min_words: int) -> bool:
+    """Whether texts have at least min_words distinct words"""
+    seen = set()
+    for text in texts:
+        for match in _words.finditer(text):
+            seen.add(match.group().lower())
+            if len(seen) >= min_words:
+                return True
+    return False
+
+
+def route_by_size(texts: List[str], routing: SizeRouting, count_tokens: Callable[[str], int]) -> SizeRoute:
+    """Route of a document with content texts (its chunks) under the thresholds of routing"""
+    limit = max(routing.small_model_max_tokens, routing.skip_summary_max_tokens)
+    tokens = count_tokens_upto(texts, count_tokens, limit) if limit else 0
+    small_model = (
+        routing.small_model_max_tokens > 0
+        and tokens <= routing.small_model_max_tokens
+        and (not routing.small_model_max_chunks or len(texts) <= routing.small_model_max_chunks)
+    )
+    skip_summary = (routing.skip_summary_max_tokens > 0 and tokens <= routing.skip_summary_max_tokens) or (
+        routing.skip_summary_min_words > 0 and not has_min_words(texts, routing.skip_summary_min_words)
+    )
+    return SizeRoute(small_model=small_model, skip_summary=skip_summary)
@@ -3,27 +3,43 @@ from typing import List
 
 from llmonkey.llms import BaseLLMModel
 
+from .converters.libreoffice import remove_pdf_renditions
 from .datamodels import FileFeatures, MetaInfo, PDFDoc, PDFError, PDFFile
 from .pipeline import Pipeline
 from .recipes import get_recipes
 
 
 class PDFerret:
-    def __init__(self, text_model: BaseLLMModel | str, vision_model: BaseLLMModel | str, **kwargs):
+    def __init__(
+        self,
+        text_model: BaseLLMModel | str | list,
+        vision_model: BaseLLMModel | str | list,
+        small_text_model: BaseLLMModel | str | list = None,
+        **kwargs,
+    ):
         """
         Initialize the PdfFerret class with text and vision models.
 
         Args:
-            text_model (BaseLLMModel | str): LLMonkey model instance or name for text processing.
-            vision_model (BaseLLMModel | str): LLMonkey model instance or name for vision processing.
+            text_model (BaseLLMModel | str | list): LLMonkey model instance or name for text processing,
+                or a list of them as fallback chain, the first one preferred.
+            vision_model (BaseLLMModel | str | list): LLMonkey model instance or name for vision processing,
+                or a list of them as fallback chain, the first one preferred.
+            small_text_model (BaseLLMModel | str | list, optional): smaller and faster text model for short documents,
+                with thresholds set per file type in the recipes. If not set, text_model processes all documents.
         """
-        if isinstance(text_model, str):
-            text_model = BaseLLMModel.load(text_model)
-        if isinstance(vision_model, str):
-            vision_model = BaseLLMModel.load(vision_model)
-        self.recipes = get_recipes(text_model, vision_model)
+        text_model = self._load_models(text_model)
+        vision_model = self._load_models(vision_model)
+        small_text_model = self._load_models(small_text_model) if small_text_model else None
+        self.recipes = get_recipes(text_model, vision_model, small_text_model)
         self.pipelines = self._create_pipelines(self.recipes)
 
+    @staticmethod
+    def _load_models(model):
+        if isinstance(model, (list, tuple)):
+            return [BaseLLMModel.load(m) if isinstance(m, str) else m for m in model]
+        return BaseLLMModel.load(model) if isinstance(model, str) else model
+
     def _create_pipelines(self, recipes) -> dict[str, Pipeline]:
         pipelines = {}
         for file_type, steps_config in recipes.items():
@@ -78,7 +94,12 @@ class PDFerret:
         for file_type, current_files in file_groups.items():
             pipeline = self.pipelines.get(file_type)
             if pipeline:
-                pdfdocs, pdferrors = pipeline.extract_batch(current_files)
+                try:
+                    pdfdocs, pdferrors = pipeline.extract_batch(current_files)
+                finally:
+                    # renditions are set on the input documents, also on the failed ones
+                    remove_pdf_renditions(current_files.values())
+                remove_pdf_renditions(pdfdocs.values())
                 failed_all.update(pdferrors)
                 processed_all.update(pdfdocs)
             else:
@@ -0,0 +1,132 @@
+import logging
+from typing import Dict, List
+
+from pydantic import BaseModel, ValidationError
+
+from ..config import LLM_BATCH_POLL_INTERVAL, LLM_BATCH_TIMEOUT
+from ..datamodels import PDFDoc, PDFError
+from ..llm.batch import BatchJobStore, BatchProvider, BatchRequest, run_batch
+from ..llm.repair import count as count_repair
+from ..llm.repair import repair_structured
+from .llm_postprocessor import (
+    LLMCombinedResponse,
+    LLMMetaInfoResponse,
+    LLMPostprocessor,
+    LLMSummaryResponse,
+    LLMTableResponse,
+    system_prompt_combined,
+    system_prompt_metadata,
+    system_prompt_summary,
+    system_prompt_table,
+)
+
+
+class LLMBatchPostprocessor(LLMPostprocessor):
+    """
+    LLM enrichment of all documents of a batch as one job of the batch tier of the provider,
+    for backfills which don't need interactive latency. Prompts are the same as of LLMPostprocessor,
+    metadata and summary are requested in a single call per document.
+    The pending job is persisted in batch_store, so a restarted run with the same documents resumes it.
+    If the job doesn't complete within timeout, documents are returned without LLM enrichment.
+    """
+
+    parallel = False
+
+    def __init__(
+        self,
+        batch_provider: BatchProvider,
+        batch_store: BatchJobStore = None,
+        poll_interval=LLM_BATCH_POLL_INTERVAL,
+        timeout=LLM_BATCH_TIMEOUT,
+        **kwargs,
+    ):
+        # llm_model is still needed for its tokenizer and context window
+        super().__init__(llm_single_call=True, llm_cache=False, **kwargs)
+        self.batch_provider = batch_provider
+        self.batch_store = batch_store
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def process_single(self, pdfdoc: PDFDoc) -> PDFDoc:
+        # just dummy, actual processing is in _process_batch
+        return pdfdoc
+
+    def _doc_requests(self, idx: int, pdfdoc: PDFDoc) -> list[tuple[BatchRequest, type[BaseModel], List[int]]]:
+        """Requests of the document with the response model and the indices of the described chunks"""
+        lang = self._prompt_language(pdfdoc)
+        requests = []
+        if self.llm_table_description:
+            for chunk_indices in self._tables_to_describe(pdfdoc).values():
+                request = BatchRequest(
+                    custom_id=f"{idx}-table-{chunk_indices[0]}",
+                    user_prompt=pdfdoc.chunks[chunk_indices[0]].non_embeddable_content,
+                    system_prompt=system_prompt_table[lang],
+                )
+                requests.append((request, LLMTableResponse, chunk_indices))
+
+        metainfo, useful_info = self._build_prompts(pdfdoc, lang)
+        route = self._size_route(pdfdoc)
+        need_summary = self._needs_summary(pdfdoc, route)
+        self._content_as_abstract(pdfdoc, route)
+        if self.llm_metainfo and need_summary:
+            request = BatchRequest(f"{idx}-combined", useful_info, system_prompt_combined[lang], max_tokens=1500)
+            requests.append((request, LLMCombinedResponse, []))
+        elif self.llm_metainfo:
+            request = BatchRequest(f"{idx}-metadata", metainfo, system_prompt_metadata[lang], max_tokens=500)
+            requests.append((request, LLMMetaInfoResponse, []))
+        elif need_summary:
+            useful_info += f"\nTitle: {pdfdoc.metainfo.title}\n"
+            request = BatchRequest(f"{idx}-summary", useful_info, system_prompt_summary[lang], temperature=0.4)
+            requests.append((request, LLMSummaryResponse, []))
+        return requests
+
+    def _apply(self, pdfdoc: PDFDoc, resp: BaseModel, chunk_indices: List[int]):
+        if isinstance(resp, LLMTableResponse):
+            for idx in chunk_indices:
+                pdfdoc.chunks[idx].text = resp.description
+        elif isinstance(resp, LLMCombinedResponse):
+            self._apply_combined(pdfdoc, resp)
+        elif isinstance(resp, LLMMetaInfoResponse):
+            self._update_metadata(pdfdoc, resp)
+        elif isinstance(resp, LLMSummaryResponse):
+            pdfdoc.metainfo.abstract = resp.content_summary
+            pdfdoc.metainfo.search_description = resp.search_description
+
+    def _process_batch(self, X: Dict[str, PDFDoc]) -> tuple[Dict[str, PDFDoc], Dict[str, PDFError]]:
+        routes = {}
+        for idx, (key, pdfdoc) in enumerate(X.items()):
+            try:
+                for request, data_model, chunk_indices in self._doc_requests(idx, pdfdoc):
+                    routes[request.custom_id] = (request, key, data_model, chunk_indices)
+            except Exception as e:
+                logging.error(f"Failed to prepare LLM batch requests for {key}: {e}")
+
+        try:
+            results = run_batch(
+                self.batch_provider,
+                [route[0] for route in routes.values()],
+                self.batch_store,
+                poll_interval=self.poll_interval,
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            # like LLMPostprocessor, documents are still returned without LLM enrichment
+            logging.error(f"LLM batch job failed: {e}")
+            return X, {}
+
+        for custom_id, raw in results.items():
+            if custom_id not in routes:
+                continue
+            _, key, data_model, chunk_indices = routes[custom_id]
+            try:
+                resp = data_model.model_validate_json(raw)
+                count_repair("valid")
+            except ValidationError as e:
+                # there is no cheap way to ask again in a batch job
+                resp = repair_structured(raw, data_model)
+                count_repair("repaired" if resp is not None else "failed")
+                if resp is None:
+                    logging.error(f"Invalid LLM batch response {custom_id} for {key}: {e}")
+                    continue
+            self._apply(X[key], resp, chunk_indices)
+        return X, {}
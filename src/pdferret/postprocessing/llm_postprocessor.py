@@ -1,3 +1,4 @@
+import hashlib
 import logging
 from dataclasses import replace as dc_replace
 from typing import List
@@ -5,19 +6,24 @@ from typing import List
 from llmonkey.llms import BaseLLMModel
 from pydantic import BaseModel
 
-from pdferret.utils.tokens import count_tokens_rough
-
 from ..base import BaseProcessor
+from ..config import LLM_CACHE
 from ..datamodels import ChunkType, PDFDoc
+from ..llm.routing import llm_client, primary_model
+from ..llm.scheduler import model_id, run_async
+from ..llm.size_routing import SizeRoute, SizeRouting, route_by_size
+from ..utils.chunk_selection import select_chunks
+from ..utils.sheet_profile import format_sheet_profiles
+from ..utils.tokens import TokenBudget, get_tokenizer
 
 system_prompt_table = {
     "en": """You are a librarian, performing indexing of the library.
-You will be provided with a table encoded as HTML. Write a very short summary
+You will be provided with a table encoded as HTML or Markdown. Write a very short summary
 (3-4 sentences) for it. Only include semantic information useful to find this table.
 If no information is found, return empty string.
 Return output as raw json without any extra characters, according to schema {"description": description you extracted}""",
     "de": """Sie sind Bibliothekar und führen eine Indexierung der Bibliothek durch.
-Sie erhalten eine als HTML kodierte Tabelle. Schreiben Sie eine sehr kurze Zusammenfassung
+Sie erhalten eine als HTML oder Markdown kodierte Tabelle. Schreiben Sie eine sehr kurze Zusammenfassung
 (3-4 Sätze) dazu. Fügen Sie nur semantische Informationen ein, die zum Auffinden dieser Tabelle nützlich sind.
 Wenn keine Informationen gefunden werden, geben Sie eine leere Zeichenfolge zurück.
 Gibt die Ausgabe als reines JSON ohne zusätzliche Zeichen zurück, gemäß dem Schema {"description": Beschreibung, die Sie extrahiert haben}""",
@@ -70,7 +76,7 @@ Formatieren sie die Antwort in folgendem Schema als Roh-JSON ohne zusätzliche Z
 {
     "search_description": search_description,
     "content_summary": content_summary
-}"""
+}""",
 }
 
 # If extra metadata such as company names / people names, participants, location, prices, amounts, etc is present
@@ -144,6 +150,84 @@ Sollten Informationen nicht im Dokument gefunden werden, geben Sie leere Zeichen
 }
 
 
+# used with llm_single_call, metadata and summary are requested at once
+system_prompt_combined = {
+    "en": """You are a librarian, performing indexing of the library.
+Your task is to extract metadata and to write summaries of the document for which different information is provided.
+
+1. Metadata:
+- title: If filename is provided and gives good information about the document, format it as title.
+  Generate the title if it is not found in the text. Title should communicate the main topic directly,
+  be concise, informative and contain relevant keywords present in the document.
+  Examples of good titles: "Supply Chain Optimization Strategy Proposal" or "Q1 2024 Financial Performance Summary".
+- document_type: briefly describe the type of document, e.g. "Research Paper", "Technical Report", "Meeting notes", etc.
+- people: involved people (authors, participants, etc.) as a list of names, e.g. ["John Doe", "Jane Smith"].
+- mentioned_date: main date mentioned in the document or filename, such as date of the event or meeting date.
+  Use the date format YYYY-MM-DD. If month or day is not provided, please use the first day of the month / year.
+- detected_language: language of the document as code, e.g. "en", "de", "fr"
+
+2. search_description:
+    A very brief description of the document with all the information someone might search for.
+    The following should be included in two to three sentences (if applicable): main topic, involved persons, projects, locations, included spreadsheets, important dates, etc.
+    No results or conclusions should be included. The structure of the document should not be described.
+    Don't use fill words, short sentences are fine.
+
+3. content_summary:
+    A summary of the document's content that condenses the most important points into a maximum of 6–7 sentences.
+    This should include the most important information, conclusions, and results of the document.
+    The structure of the document should not be described.
+    The wording should stay close to the original text. Bullet points may be used.
+
+If any information is not found in the document, return empty strings.
+Format your response as raw json without any extra characters, according to the schema:
+
+{"title": title,
+"document_type": document type,
+"people": list of involved people,
+"mentioned_date": main date mentioned in the document or filename,
+"detected_language": language code,
+"search_description": search_description,
+"content_summary": content_summary}""",
+    "de": """Sie sind Bibliothekar und führen die Indizierung der Bibliothek durch.
+Ihre Aufgabe besteht darin, Metadaten aus dem Dokument zu extrahieren und Zusammenfassungen des Dokuments zu erstellen, für das verschiedene Informationen bereitgestellt werden.
+
+1. Metadaten:
+- title: Erstellen Sie einen kurzen, informativen Titel. Der Titel sollte zwischen 3 bis 7 Wörter lang sein.
+  Falls ein aussagekräftiger Dateinname verfügbar ist oder im Dokument ein Titel genannt wird, sollte sich die Wortwahl möglichst nah daran orientieren.
+  Es sollte jedoch in jedem Fall das Hauptthema des Dokuments genannt werden und nicht nur die Art des Dokuments (z. B. „Bericht über Projekt X“ statt "Bericht").
+- document_type: eine sehr kurze Beschreibung der Art des Dokuments, z. B. „Forschungsartikel“, „Technischer Bericht“, „Besprechungsnotizen“ usw.
+  Falls das Dokument eine Vorlage oder kommentierte Version ist, geben Sie dies auch an.
+- people: beteiligte Personen (Autoren, Teilnehmer etc.) als Liste von Namen, z. B. ["John Doe", "Jane Smith"].
+- mentioned_date: Hauptdatum, das im Dokument oder Dateinamen erwähnt wird, z. B. Datum der Veranstaltung oder Datum der Besprechung.
+  Als Datumsformat soll JJJJ-MM-TT verwendet werden. Wenn kein Monat oder Tag angegeben ist, geben Sie bitte den 01. an.
+- detected_language: Sprache des Dokuments als Code, z. B. „en“, „de“, „fr“
+
+2. search_description:
+    Eine sehr kurze Beschreibung des Dokuments mit allen Informationen, nach denen man möglicherweise suchen würde.
+    Folgendes soll in drei bis vier Sätzen enthalten sein (falls im Dokument enthalten): Hauptthema, beteiligte Personen, Projekte, Standorte, enthaltene Tabellenblätter, wichtige Zeitpunkte, Kennnummern etc.
+    Es sollen keine Ergebnisse oder Schlussfolgerungen enthalten sein. Es soll nicht die Struktur des Dokuments beschrieben werden.
+    Verwenden Sie keine Füllwörter, kurze Sätze sind in Ordnung. Wiederhole nicht den Titel des Dokuments.
+    Nenne keine Informationen, die nicht im Dokument enthalten sind.
+
+3. content_summary:
+    Eine Zusammenfassung des Inhalts des Dokuments, die in maximal 6-7 Sätzen die wichtigsten Punkte zusammenfasst.
+    Hierbei sollen die wichtigsten Informationen, Schlussfolgerungen und Ergebnisse des Dokuments enthalten sein.
+    Es soll keine Struktur des Dokuments beschrieben werden.
+    Die Wortwahl sollte nah am Originaltext sein. Es können Stichpunkte verwendet und Markdown-Formatierungen angewendet werden.
+
+Formatieren Sie Ihre Antwort gemäß des Schemas als Roh-JSON ohne zusätzliche Zeichen.
+Sollten Informationen nicht im Dokument gefunden werden, geben Sie leere Zeichenfolgen zurück.
+
+{"title": Titel,
+"document_type": Dokumenttyp,
+"people": Liste der beteiligten Personen,
+"mentioned_date": Hauptdatum, das im Dokument oder Dateinamen erwähnt wird,
+"detected_language": Sprachcode,
+"search_description": search_description,
+"content_summary": content_summary}""",
+}
+
+
 class LLMMetaInfoResponse(BaseModel):
     title: str
     people: List[str] | None = []
@@ -161,46 +245,67 @@ class LLMSummaryResponse(BaseModel):
     content_summary: str
 
 
+class LLMCombinedResponse(LLMMetaInfoResponse):
+    search_description: str = ""
+    content_summary: str = ""
+
+
 class LLMPostprocessor(BaseProcessor):
     parallel = "thread"
     operates_on = PDFDoc
 
     def __init__(
         self,
-        llm_model: BaseLLMModel = None,
+        llm_model: BaseLLMModel | List[BaseLLMModel] = None,
         llm_table_description=False,
+        table_description_max_tokens=16000,
         llm_summary=True,
         llm_metainfo=True,
         llm_overwrite_abstract=False,
         summary_max_chunks=5,
+        summary_chunk_selection=True,
+        llm_single_call=False,
+        small_llm_model: BaseLLMModel | List[BaseLLMModel] = None,
+        size_routing: SizeRouting = None,
+        llm_cache=True,
         n_proc=None,
         batch_size=None,
     ):
         super().__init__(n_proc=n_proc, batch_size=batch_size)
         self.llm_table_description = llm_table_description
+        # input tokens of all table descriptions of a document
+        self.table_description_max_tokens = table_description_max_tokens
         self.llm_summary = llm_summary
         self.llm_metainfo = llm_metainfo
-        self.llm_model = llm_model
+        # a list of models is a fallback chain, prompts are budgeted for the first one
+        self.llm_model = primary_model(llm_model)
+        self.llm = llm_client(llm_model, cache_path=LLM_CACHE if llm_cache else None) if llm_model else None
+        # short documents go to the small model or get no summary request, see SizeRouting,
+        # their prompts are budgeted for the small model
+        self.small_llm_model = primary_model(small_llm_model) if small_llm_model else None
+        self.small_llm = (
+            llm_client(small_llm_model, cache_path=LLM_CACHE if llm_cache else None) if small_llm_model else None
+        )
+        self.size_routing = size_routing or SizeRouting()
         self.summary_max_chunks = summary_max_chunks
+        # pick the most representative chunks of long documents instead of the first ones
+        self.summary_chunk_selection = summary_chunk_selection
+        # metadata and summary in one request instead of two sequential ones
+        self.llm_single_call = llm_single_call
         self.llm_overwrite_abstract = llm_overwrite_abstract
 
-    def process_single(self, pdfdoc: PDFDoc) -> PDFDoc:
-
+    def _prompt_language(self, pdfdoc: PDFDoc) -> str:
         lang = pdfdoc.metainfo.language or "en"
         if lang not in system_prompt_summary:
-            lang = "en"
             logging.warning(f"Language {lang} is not supported, using English instead")
+            lang = "en"
+        return lang
 
-        remaining_table_descriptions = 5
-        for chunk in pdfdoc.chunks:
-            if remaining_table_descriptions <= 0:
-                break
-            if self.llm_table_description and chunk.chunk_type == ChunkType.TABLE:
-                try:
-                    chunk.text = self._llm_table_descr(chunk.non_embeddable_content, lang)
-                    remaining_table_descriptions -= 1
-                except Exception as e:
-                    logging.error(f"Failed to generate LLM table description: {e}")
+    def process_single(self, pdfdoc: PDFDoc) -> PDFDoc:
+        lang = self._prompt_language(pdfdoc)
+
+        if self.llm_table_description:
+            self._describe_tables(pdfdoc, lang)
 
         try:
             pdfdoc = self._generate_llm_abstract_metadata(pdfdoc, lang)
@@ -208,50 +313,101 @@ class LLMPostprocessor(BaseProcessor):
             logging.error(f"Failed to generate LLM summary: {e}")
         return pdfdoc
 
-    def _generate_llm_abstract_metadata(self, pdfdoc: PDFDoc, lang="en"):
-        useful_info = f"Filename: {pdfdoc.metainfo.file_features.filename}\n"
-
-        # if pdfdoc.metainfo.extra_metainfo:
-        #     useful_info += "Extra metadata: "
-        #     for key, value in pdfdoc.metainfo.extra_metainfo.items():
-        #         useful_info += f"{key}: {value}\n"
-        metainfo = useful_info  # save for metadata extraction
-        # append first 2 chunks to metainfo
-        metainfo += "\nDocument content: "
-        idx = 0
+    def _build_prompts(self, pdfdoc: PDFDoc, lang="en", llm_model: BaseLLMModel = None) -> tuple[str, str]:
+        """
+        User prompts of the metadata request (first chunks) and of the summary request,
+        within the context window of llm_model (the primary model by default)
+        """
+        llm_model = llm_model or self.llm_model
+        tokenizer = get_tokenizer(model_id(llm_model))
+        # the system prompt and the title appended for the summary take part of the context window
+        system_tokens = max(
+            tokenizer.count(prompts[lang])
+            for prompts in (system_prompt_metadata, system_prompt_summary, system_prompt_combined)
+        )
+        max_tokens = llm_model.config.max_input_tokens - system_tokens - 100
+        filename = f"Filename: {pdfdoc.metainfo.file_features.filename}\n"
+        text_chunks = [chunk.text for chunk in pdfdoc.chunks if chunk.chunk_type == ChunkType.TEXT]
+
+        # metadata is extracted from the first 2 chunks
+        metainfo = (
+            TokenBudget(tokenizer, max_tokens)
+            .add("filename", filename)
+            .add("first_chunks", text_chunks[:2], share=1.0, header="\nDocument content: \n")
+            .build()
+        )
+
+        budget = TokenBudget(tokenizer, max_tokens).add("filename", filename)
+        # profiles describe whole sheets, while chunks only cover the first rows, so they are required
+        if sheet_profiles := pdfdoc.metainfo.extra_metainfo.get("sheet_profiles"):
+            budget.add("sheet_profiles", f"Spreadsheet column profiles:\n{format_sheet_profiles(sheet_profiles)}\n")
+        # up to summary_max_chunks text chunks, all (up to 10) visual pages if present,
+        # otherwise why would we have them, and some tables
+        summary_chunks = text_chunks[: self.summary_max_chunks]
+        if self.summary_chunk_selection and len(text_chunks) > self.summary_max_chunks:
+            selected = select_chunks(
+                text_chunks, self.summary_max_chunks, max_tokens=int(0.6 * max_tokens), count_tokens=tokenizer.count
+            )
+            summary_chunks = [text_chunks[idx] for idx in selected]
+        budget.add("text", summary_chunks, share=0.6, header="Content: ")
+        visual_pages = [chunk.text for chunk in pdfdoc.chunks if chunk.chunk_type == ChunkType.VISUAL_PAGE]
+        budget.add("visual_pages", visual_pages[:10], share=0.3, header="Visual content of pages:\n")
+        tables = [chunk.text for chunk in pdfdoc.chunks if chunk.chunk_type == ChunkType.TABLE]
+        budget.add("tables", tables[:5], share=0.1, header="Tables:\n")
+        useful_info = budget.build()
+        return metainfo, useful_info
+
+    def _size_route(self, pdfdoc: PDFDoc) -> SizeRoute:
+        texts = [chunk.text for chunk in pdfdoc.chunks if chunk.text]
+        return route_by_size(texts, self.size_routing, get_tokenizer(model_id(self.llm_model)).count)
+
+    def _wants_summary(self, pdfdoc: PDFDoc) -> bool:
+        return self.llm_summary and (not pdfdoc.metainfo.abstract or self.llm_overwrite_abstract)
+
+    def _needs_summary(self, pdfdoc: PDFDoc, route: SizeRoute = None) -> bool:
+        """Whether a summary is requested from the LLM, short or low-information documents don't get one"""
+        route = route or self._size_route(pdfdoc)
+        return self._wants_summary(pdfdoc) and not route.skip_summary
+
+    def _content_as_abstract(self, pdfdoc: PDFDoc, route: SizeRoute):
+        """Beginning of the content (up to abstract_max_tokens) as abstract of a document without summary request"""
+        if not (route.skip_summary and self._wants_summary(pdfdoc)):
+            return
+        max_tokens = self.size_routing.abstract_max_tokens
+        texts, length = [], 0
+        # low-information documents may be long, only their beginning is joined
         for chunk in pdfdoc.chunks:
-            if idx >= 2:
-                break
-            if chunk.chunk_type == ChunkType.TEXT:
-                metainfo += "\n" + chunk.text
-                idx += 1
-
-        if pdfdoc.chunks:
-            useful_info += "Content: "
-            idx = 0
-            remaining_text_chunks = self.summary_max_chunks
-            remaining_visual_pages = 10
-            for chunk in pdfdoc.chunks:
-                # take up to summary_max_chunks text chunks
-                if chunk.chunk_type == ChunkType.TEXT and remaining_text_chunks > 0:
-                    useful_info += chunk.text + "\n"
-                    remaining_text_chunks -= 1
-                # always take all (up to 10) visual pages if present
-                # otherwise why would we have them?
-                if chunk.chunk_type == ChunkType.VISUAL_PAGE and remaining_visual_pages > 0:
-                    useful_info += chunk.text + "\n"
-                    remaining_visual_pages -= 1
-        current_tokens = count_tokens_rough(useful_info)
-        if current_tokens > self.llm_model.config.max_input_tokens:
-            max_input_tokens = self.llm_model.config.max_input_tokens
-            logging.warning(
-                f"Input to LLM is too long ({len(useful_info)} tokens), truncating to {max_input_tokens} tokens"
+            if chunk.chunk_type == ChunkType.TEXT and chunk.text and length <= 10 * max_tokens:
+                texts.append(chunk.text)
+                length += len(chunk.text)
+        tokenizer = get_tokenizer(model_id(self.llm_model))
+        pdfdoc.metainfo.abstract = tokenizer.truncate("\n".join(texts), max_tokens)
+
+    def _generate_llm_abstract_metadata(self, pdfdoc: PDFDoc, lang="en"):
+        route = self._size_route(pdfdoc)
+        need_summary = self._needs_summary(pdfdoc, route)
+        self._content_as_abstract(pdfdoc, route)
+        if route.small_model and self.small_llm:
+            llm, llm_model = self.small_llm, self.small_llm_model
+        else:
+            llm, llm_model = self.llm, self.llm_model
+        metainfo, useful_info = self._build_prompts(pdfdoc, lang, llm_model)
+        if self.llm_single_call and self.llm_metainfo and need_summary:
+            # the summary input starts with the filename and the first chunks, so it covers the metadata input
+            combined_resp = llm.structured(
+                data_model=LLMCombinedResponse,
+                user_prompt=useful_info,
+                system_prompt=system_prompt_combined[lang],
+                temperature=0.2,
+                max_tokens=1500,
             )
-            end = int(0.95 * len(useful_info) * max_input_tokens / current_tokens)
-            useful_info = useful_info[:end]
+            if not combined_resp:
+                raise ValueError("No metadata and summary was returned by LLM")
+            self._apply_combined(pdfdoc, combined_resp)
+            return pdfdoc
 
         if self.llm_metainfo:
-            metadata_resp, raw_resp = self.llm_model.generate_structured_response(
+            metadata_resp = llm.structured(
                 data_model=LLMMetaInfoResponse,
                 user_prompt=metainfo,
                 system_prompt=system_prompt_metadata[lang],
@@ -260,16 +416,10 @@ class LLMPostprocessor(BaseProcessor):
             )
             if not metadata_resp:
                 raise ValueError("No metadata was returned by LLM")
-            # only update metadata which is not empty
-            for key, value in metadata_resp.model_dump().items():
-                if key == "people":
-                    # "people" is more adequate for non-scientific documents, but the rest of the code uses "authors"
-                    key = "authors"
-                if value:
-                    pdfdoc.metainfo.__dict__[key] = value
-        if self.llm_summary and (not pdfdoc.metainfo.abstract or self.llm_overwrite_abstract):
+            self._update_metadata(pdfdoc, metadata_resp)
+        if need_summary:
             useful_info += f"\nTitle: {pdfdoc.metainfo.title}\n"
-            summary_resp, raw_resp = self.llm_model.generate_structured_response(
+            summary_resp = llm.structured(
                 data_model=LLMSummaryResponse,
                 user_prompt=useful_info,
                 system_prompt=system_prompt_summary[lang],
@@ -282,9 +432,60 @@ class LLMPostprocessor(BaseProcessor):
             pdfdoc.metainfo.search_description = summary_resp.search_description
         return pdfdoc
 
+    def _apply_combined(self, pdfdoc: PDFDoc, combined_resp: LLMCombinedResponse):
+        self._update_metadata(pdfdoc, LLMMetaInfoResponse.model_validate(combined_resp.model_dump()))
+        pdfdoc.metainfo.abstract = combined_resp.content_summary
+        pdfdoc.metainfo.search_description = combined_resp.search_description
+
+    def _update_metadata(self, pdfdoc: PDFDoc, metadata_resp: LLMMetaInfoResponse):
+        # only update metadata which is not empty
+        for key, value in metadata_resp.model_dump().items():
+            if key == "people":
+                # "people" is more adequate for non-scientific documents, but the rest of the code uses "authors"
+                key = "authors"
+            if value:
+                pdfdoc.metainfo.__dict__[key] = value
+
+    def _tables_to_describe(self, pdfdoc: PDFDoc) -> dict[str, List[int]]:
+        """
+        Indices of table chunks by hash of their content, identical tables (e.g. repeated headers) are described once.
+        Tables are taken in document order as long as they fit into table_description_max_tokens.
+        """
+        groups = {}
+        for idx, chunk in enumerate(pdfdoc.chunks):
+            if chunk.chunk_type == ChunkType.TABLE and chunk.non_embeddable_content:
+                digest = hashlib.sha256(chunk.non_embeddable_content.encode()).hexdigest()
+                groups.setdefault(digest, []).append(idx)
+        tokenizer = get_tokenizer(model_id(self.llm_model))
+        remaining = self.table_description_max_tokens
+        selected = {}
+        for digest, indices in groups.items():
+            tokens = tokenizer.count(pdfdoc.chunks[indices[0]].non_embeddable_content)
+            # a large table is skipped, smaller ones after it may still fit
+            if tokens <= remaining:
+                selected[digest] = indices
+                remaining -= tokens
+        return selected
+
+    def _describe_tables(self, pdfdoc: PDFDoc, lang="en"):
+        tables = self._tables_to_describe(pdfdoc)
+        # all tables are requested at once, the scheduler of the model limits the requests in flight
+        futures = {
+            digest: run_async(self._llm_table_descr, pdfdoc.chunks[indices[0]].non_embeddable_content, lang)
+            for digest, indices in tables.items()
+        }
+        for digest, future in futures.items():
+            try:
+                description = future.result()
+            except Exception as e:
+                logging.error(f"Failed to generate LLM table description: {e}")
+                continue
+            for idx in tables[digest]:
+                pdfdoc.chunks[idx].text = description
+
     def _llm_table_descr(self, table_as_html, lang="en"):
 
-        descr_resp, raw_resp = self.llm_model.generate_structured_response(
+        descr_resp = self.llm.structured(
             system_prompt=system_prompt_table[lang],
             data_model=LLMTableResponse,
             user_prompt=table_as_html,
@@ -5,13 +5,17 @@ from llmonkey.llms import BaseLLMModel
 
 from .base import BaseProcessor
 from .converters.libreoffice import LibreOfficeConverter
+from .llm.size_routing import SizeRouting
 from .metainfo.office_metaextractor import OfficeMetaExtractor
 from .postprocessing.llm_postprocessor import LLMPostprocessor
+from .text_extrators.native_spreadsheet import NativeSpreadsheetExtractor
 from .text_extrators.pandoc_md import PandocMDExtractor
-from .text_extrators.tika import TikaExtractor, TikaSpreadsheetExtractor
+from .text_extrators.tika import TikaExtractor
 from .text_extrators.visual_extractor import VisualPDFExtractor
-from .text_extrators.raw_text import RawTextExtractor
+from .text_extrators.plain_text import PlainTextExtractor
 from .thumbnails.libreoffice import LibreOfficeThumbnailer
+from .thumbnails.pdf import PDF2ImageThumbnailer
+from .thumbnails.text import TextThumbnailer
 from .chunking import SimpleChunker
 
 
@@ -28,8 +32,19 @@ tika_url = os.getenv("PDFERRET_TIKA_SERVER_URL", "http://localhost:9998")
 tika_ocr_strategy = os.getenv("PDFERRET_TIKA_OCR_STRATEGY", "NO_OCR")
 visual_max_pages = int(os.getenv("PDFERRET_VISUAL_MAX_PAGES", 3))
 
+# short documents are summarized by the small text model, a few lines are their own summary
+document_routing = SizeRouting(small_model_max_tokens=2000, small_model_max_chunks=5, skip_summary_max_tokens=100)
+# pdfs and presentations have visual content of the pages, the summary of it is always requested
+visual_routing = SizeRouting(small_model_max_tokens=2000, small_model_max_chunks=5)
+# notes, snippets and logs: mostly short, often with few distinct words
+text_routing = SizeRouting(
+    small_model_max_tokens=4000, small_model_max_chunks=10, skip_summary_max_tokens=150, skip_summary_min_words=15
+)
 
-def get_recipes(text_model: BaseLLMModel, vision_model: BaseLLMModel):
+
+def get_recipes(text_model: BaseLLMModel, vision_model: BaseLLMModel, small_text_model: BaseLLMModel = None):
+    document_llm = {"llm_model": text_model, "small_llm_model": small_text_model, "size_routing": document_routing}
+    visual_llm = {"llm_model": text_model, "small_llm_model": small_text_model, "size_routing": visual_routing}
     recipes = {
         # docx and similar: 1) extract metadata from XML in the docx file,
         # 2) Get thumbnail using LibreOffice, 3) convert to markdown using pandoc, LLM postprocessing
@@ -37,49 +52,44 @@ def get_recipes(text_model: BaseLLMModel, vision_model: BaseLLMModel):
             PipelineStep(OfficeMetaExtractor),
             PipelineStep(LibreOfficeThumbnailer),
             PipelineStep(PandocMDExtractor),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+            PipelineStep(LLMPostprocessor, document_llm),
             PipelineStep(SimpleChunker),
         ],
         "odt": [
             PipelineStep(OfficeMetaExtractor),
             PipelineStep(LibreOfficeThumbnailer),
             PipelineStep(PandocMDExtractor),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
-            PipelineStep(SimpleChunker),
-        ],
-        "txt": [
-            PipelineStep(LibreOfficeThumbnailer),
-            PipelineStep(RawTextExtractor),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+            PipelineStep(LLMPostprocessor, document_llm),
             PipelineStep(SimpleChunker),
         ],
-        # doc: similar to docx but convert to docx before sending to pandoc
-        # also doc is non-xml so we need to convert to docx before we can extract metadata
+        # doc: LibreOffice lays the document out only once to make a pdf rendition, thumbnail is rendered from it,
+        # text and metadata of the non-xml doc are extracted by Tika directly from the original file
+        # (OfficeMetaExtractor is not used, it only reads docProps of OOXML files, so it found nothing in a doc)
         "doc": [
-            PipelineStep(LibreOfficeThumbnailer),
-            PipelineStep(LibreOfficeConverter),
-            PipelineStep(OfficeMetaExtractor),
-            PipelineStep(PandocMDExtractor),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+            PipelineStep(LibreOfficeConverter, {"as_pdf_rendition": True}),
+            PipelineStep(PDF2ImageThumbnailer),
+            PipelineStep(TikaExtractor, {"tika_url": tika_url, "save_raw_metadata": True}),
+            PipelineStep(LLMPostprocessor, document_llm),
             PipelineStep(SimpleChunker),
         ],
-        # pptx and similar: 0) Extract metainfo 1) convert to pdf, 2) extract text with Tika,
-        # 3) extract additional info using visual model, 4) postprocess with LLM
-        # visualpdfextractor also updates the thumbnail
+        # pptx and similar: 0) Extract metainfo 1) convert to pdf rendition once, 2) extract text with Tika
+        # from the rendition, 3) extract additional info using visual model from the same rendition,
+        # 4) postprocess with LLM
+        # visualpdfextractor also updates the thumbnail, so it matches the pages the vision model sees
         "ppt": [
             PipelineStep(OfficeMetaExtractor),
-            PipelineStep(LibreOfficeConverter, {"target_format": "pdf"}),
-            PipelineStep(TikaExtractor, {"tika_url": tika_url}),
+            PipelineStep(LibreOfficeConverter, {"as_pdf_rendition": True}),
+            PipelineStep(TikaExtractor, {"tika_url": tika_url, "use_pdf_rendition": True}),
             PipelineStep(VisualPDFExtractor, {"model": vision_model, "max_pages": visual_max_pages}),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+            PipelineStep(LLMPostprocessor, visual_llm),
             PipelineStep(SimpleChunker),
         ],
         "pptx": [
             PipelineStep(OfficeMetaExtractor),
-            PipelineStep(LibreOfficeConverter, {"target_format": "pdf"}),
-            PipelineStep(TikaExtractor, {"tika_url": tika_url}),
+            PipelineStep(LibreOfficeConverter, {"as_pdf_rendition": True}),
+            PipelineStep(TikaExtractor, {"tika_url": tika_url, "use_pdf_rendition": True}),
             PipelineStep(VisualPDFExtractor, {"model": vision_model, "max_pages": visual_max_pages}),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+            PipelineStep(LLMPostprocessor, visual_llm),
             PipelineStep(SimpleChunker),
         ],
         # pdf: 1) extract text with Tika + save metadata,
@@ -90,29 +100,53 @@ def get_recipes(text_model: BaseLLMModel, vision_model: BaseLLMModel):
                 {"tika_url": tika_url, "save_raw_metadata": True, "tika_ocr_strategy": tika_ocr_strategy},
             ),
             PipelineStep(VisualPDFExtractor, {"model": vision_model, "max_pages": visual_max_pages}),
-            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+            PipelineStep(LLMPostprocessor, visual_llm),
             PipelineStep(SimpleChunker),
         ],
         # xlsx and similar 1) extract metadata from XML in the xlsx file, 2) Get thumbnail using LibreOffice,
-        # 3) extract text with Tika spreadsheet extractor (will convert spreadsheet to markdown),
+        # 3) stream the sheets in-process and convert them to markdown tables,
         # 4) postprocess with LLM
         "xlsx": [
             PipelineStep(OfficeMetaExtractor),
             PipelineStep(LibreOfficeThumbnailer),
-            PipelineStep(TikaSpreadsheetExtractor, {"tika_url": tika_url}),
+            PipelineStep(NativeSpreadsheetExtractor),
             PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
         ],
         "xls": [
             PipelineStep(OfficeMetaExtractor),
             PipelineStep(LibreOfficeThumbnailer),
-            PipelineStep(TikaSpreadsheetExtractor, {"tika_url": tika_url}),
+            PipelineStep(NativeSpreadsheetExtractor),
             PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
         ],
         "ods": [
             PipelineStep(OfficeMetaExtractor),
             PipelineStep(LibreOfficeThumbnailer),
-            PipelineStep(TikaSpreadsheetExtractor, {"tika_url": tika_url}),
+            PipelineStep(NativeSpreadsheetExtractor),
             PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
         ],
     }
+    # text-like files are processed fully in-process: 1) read with detected encoding and chunk by structure,
+    # 2) render thumbnail from the extracted text, 3) postprocess with LLM, metadata and summary in one call
+    for ext in ("txt", "md", "markdown", "html", "htm", "json"):
+        recipes[ext] = [
+            PipelineStep(PlainTextExtractor),
+            PipelineStep(TextThumbnailer),
+            PipelineStep(
+                LLMPostprocessor,
+                {
+                    "llm_model": text_model,
+                    "llm_single_call": True,
+                    "small_llm_model": small_text_model,
+                    "size_routing": text_routing,
+                },
+            ),
+            PipelineStep(SimpleChunker),
+        ]
+    # csv is streamed as a single-sheet workbook
+    for ext in ("csv", "tsv"):
+        recipes[ext] = [
+            PipelineStep(NativeSpreadsheetExtractor),
+            PipelineStep(TextThumbnailer),
+            PipelineStep(LLMPostprocessor, {"llm_model": text_model}),
+        ]
     return recipes
@@ -0,0 +1,116 @@
+import datetime
+from collections import deque
+from typing import List
+
+from ..base import BaseProcessor
+from ..chunking import MAX_CHUNK_LEN
+from ..datamodels import ChunkType, PDFChunk, PDFDoc
+from ..utils.sheet_profile import SheetProfile
+from ..utils.tables import clean_cell, split_table
+from ..utils.workbook import open_workbook
+
+error_values = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA"}
+
+
+def format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time(0):
+            return value.date().isoformat()
+        return value.isoformat(sep=" ")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    # spreadsheet errors are not useful as text
+    if isinstance(value, str) and value in error_values:
+        return ""
+    return clean_cell(value)
+
+
+def is_empty_row(row) -> bool:
+    return not any(v is not None and v != "" for v in row)
+
+
+class NativeSpreadsheetExtractor(BaseProcessor):
+    """
+    Extracts xlsx, xls and ods workbooks in-process, without Tika and pandoc.
+    Rows of every sheet are streamed, only the first head_rows and the last tail_rows non-empty rows are kept,
+    so the memory is bounded per sheet. Every sheet is emitted as markdown table chunks
+    with the sheet name and the header row repeated in each chunk.
+    If profile_sheets is set, all rows are additionally profiled column-wise in the same pass
+    and the profiles are stored in extra_metainfo["sheet_profiles"], see utils.sheet_profile.
+    """
+
+    parallel = "thread"
+    operates_on = PDFDoc
+
+    def __init__(
+        self,
+        head_rows=500,
+        tail_rows=100,
+        max_chunk_len=MAX_CHUNK_LEN,
+        profile_sheets=True,
+        batch_size=None,
+        n_proc=None,
+    ):
+        super().__init__(batch_size=batch_size, n_proc=n_proc)
+        self.head_rows = head_rows
+        self.tail_rows = tail_rows
+        self.max_chunk_len = max_chunk_len
+        self.profile_sheets = profile_sheets
+
+    def process_single(self, doc: PDFDoc) -> PDFDoc:
+        with open_workbook(doc.metainfo.file_features.file) as wb:
+            sheet_names = wb.sheet_names()
+            doc.metainfo.extra_metainfo["sheet names"] = sheet_names
+            profiles = []
+            for sheet in sheet_names:
+                chunks, profile = self._extract_sheet(wb.iter_rows(sheet), sheet)
+                doc.chunks.extend(chunks)
+                if profile:
+                    profiles.append(profile)
+        if self.profile_sheets:
+            doc.metainfo.extra_metainfo["sheet_profiles"] = profiles
+        return doc
+
+    def _extract_sheet(self, rows, sheet: str) -> tuple[List[PDFChunk], dict]:
+        header = None
+        head = []
+        tail = deque(maxlen=self.tail_rows)
+        n_rows = 0
+        profile = None
+        for row in rows:
+            if is_empty_row(row):
+                continue
+            if header is None:
+                header = row
+                if self.profile_sheets:
+                    names = [format_value(cell) or f"Column {idx + 1}" for idx, cell in enumerate(header)]
+                    profile = SheetProfile(sheet, names)
+                continue
+            if profile:
+                profile.add_row(row)
+            n_rows += 1
+            if len(head) < self.head_rows:
+                head.append(row)
+            elif self.tail_rows:
+                tail.append(row)
+        if header is None:
+            return [], None
+
+        # only columns which have any value in the header or in the sampled rows are kept
+        sampled = [header, *head, *tail]
+        ncols = max(len(row) for row in sampled)
+        keep = [col for col in range(ncols) if any(col < len(row) and not is_empty_row([row[col]]) for row in sampled)]
+
+        def to_cells(row):
+            return [format_value(row[col]) if col < len(row) else "" for col in keep]
+
+        header_cells = [cell or f"Column {idx + 1}" for idx, cell in enumerate(to_cells(header))]
+        parts = split_table(header_cells, [to_cells(row) for row in head], self.max_chunk_len, title=f"Sheet: {sheet}")
+        if tail:
+            omitted = n_rows - len(head) - len(tail)
+            title = f"Sheet: {sheet} (last {len(tail)} of {n_rows} rows, {omitted} rows omitted)"
+            parts += split_table(header_cells, [to_cells(row) for row in tail], self.max_chunk_len, title=title)
+        chunks = [PDFChunk(text=part, section=sheet, chunk_type=ChunkType.TEXT, locked=True) for part in parts]
+        return chunks, profile.to_dict() if profile else None
@@ -3,10 +3,10 @@ import os
 import tempfile
 from typing import List
 
-import pypandoc
 
 from ..base import BaseProcessor
 from ..datamodels import ChunkType, PDFChunk, PDFDoc
+from ..utils.pandoc import pandoc_convert
 
 
 def filter_line(line):
@@ -39,9 +39,9 @@ class PandocMDExtractor(BaseProcessor):
 
     def process_single(self, doc: PDFDoc) -> PDFDoc:
         with tempfile.TemporaryDirectory() as media_dir:
-            markdown = pypandoc.convert_file(
-                doc.metainfo.file_features.file,
+            markdown = pandoc_convert(
                 "markdown",
+                file=doc.metainfo.file_features.file,
                 extra_args=["--columns=130", f"--extract-media={media_dir}"],
             )
 
@@ -0,0 +1,164 @@
+import json
+import os
+import re
+from itertools import chain
+from typing import Iterable, Iterator, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from ..base import BaseProcessor
+from ..chunking import MAX_CHUNK_LEN
+from ..datamodels import ChunkType, PDFChunk, PDFDoc
+from ..utils.tables import clean_cell, html_table_rows, split_table
+from ..utils.text_files import open_text, pack_paragraphs
+
+markdown_heading_regex = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+html_headings = ["h1", "h2", "h3", "h4", "h5", "h6"]
+html_blocks = [*html_headings, "p", "li", "pre", "blockquote", "dt", "dd", "figcaption", "caption", "table"]
+html_ignored = ["script", "style", "noscript", "template", "svg", "head"]
+
+
+def is_scalar(value) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Group lines into paragraphs separated by blank lines"""
+    paragraph = []
+    for line in lines:
+        line = line.rstrip()
+        if line.strip():
+            paragraph.append(line)
+        elif paragraph:
+            yield "\n".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield "\n".join(paragraph)
+
+
+def iter_markdown_sections(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (section heading, paragraph) pairs of a markdown document.
+    Headings inside fenced code blocks are ignored and code blocks are kept as one paragraph.
+    """
+    section = ""
+    paragraph = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip()
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+            paragraph.append(line)
+            continue
+        heading = None if in_fence else markdown_heading_regex.match(line)
+        if heading or (not line.strip() and not in_fence):
+            if paragraph:
+                yield section, "\n".join(paragraph)
+                paragraph = []
+            if heading:
+                section = heading.group(2)
+                paragraph = [line]
+            continue
+        paragraph.append(line)
+    if paragraph:
+        yield section, "\n".join(paragraph)
+
+
+class PlainTextExtractor(BaseProcessor):
+    """
+    Extracts text-like files in-process, without LibreOffice, Tika or pandoc: txt, md, html and json.
+    Files are read with the detected encoding and chunked along their structure: paragraphs (txt),
+    heading sections (md, html), tables (html) and records (json). Paragraphs are packed into locked chunks
+    of at most max_chunk_len, so the chunker doesn't mix sections.
+    csv is handled by NativeSpreadsheetExtractor as a single-sheet workbook.
+    """
+
+    parallel = "thread"
+    operates_on = PDFDoc
+
+    def __init__(self, max_chunk_len=MAX_CHUNK_LEN, batch_size=None, n_proc=None):
+        super().__init__(batch_size=batch_size, n_proc=n_proc)
+        self.max_chunk_len = max_chunk_len
+
+    def process_single(self, doc: PDFDoc) -> PDFDoc:
+        file = doc.metainfo.file_features.file
+        ext = os.path.splitext(file)[1][1:].lower()
+        if ext in ("md", "markdown"):
+            with open_text(file) as f:
+                doc.chunks.extend(self._sections_to_chunks(iter_markdown_sections(f)))
+        elif ext in ("html", "htm"):
+            with open_text(file) as f:
+                soup = BeautifulSoup(f.read(), "html.parser")
+            if not doc.metainfo.title and soup.title and soup.title.string:
+                doc.metainfo.title = soup.title.string.strip()
+            doc.chunks.extend(self._extract_html(soup))
+        elif ext == "json":
+            with open_text(file) as f:
+                doc.chunks.extend(self._extract_json(json.load(f)))
+        else:
+            with open_text(file) as f:
+                doc.chunks.extend(self._sections_to_chunks(("", p) for p in iter_paragraphs(f)))
+        return doc
+
+    def _sections_to_chunks(self, sections: Iterable[Tuple[str, str]]) -> List[PDFChunk]:
+        chunks = []
+        current_section, paragraphs = None, []
+        for section, paragraph in chain(sections, [(None, None)]):
+            if section != current_section and paragraphs:
+                for text in pack_paragraphs(paragraphs, self.max_chunk_len):
+                    chunks.append(PDFChunk(text=text, section=current_section, chunk_type=ChunkType.TEXT, locked=True))
+                paragraphs = []
+            current_section = section
+            if paragraph is not None:
+                paragraphs.append(paragraph)
+        return chunks
+
+    def _table_chunks(self, header: List[str], rows: List[List[str]], section: str, title="") -> List[PDFChunk]:
+        return [
+            PDFChunk(text=part, non_embeddable_content=part, section=section, chunk_type=ChunkType.TABLE, locked=True)
+            for part in split_table(header, rows, self.max_chunk_len, title=title)
+        ]
+
+    def _extract_html(self, soup: BeautifulSoup) -> List[PDFChunk]:
+        for elem in soup.find_all(html_ignored):
+            elem.decompose()
+        body = soup.body or soup
+        chunks = []
+        section, sections = "", []
+        for elem in body.find_all(html_blocks):
+            # nested blocks (e.g. p inside li or anything inside a table) are part of the outer block
+            if elem.find_parent(html_blocks) is not None:
+                continue
+            if elem.name == "table":
+                header, rows = html_table_rows(elem)
+                if header and len(header) >= 2 and rows:
+                    chunks.extend(self._sections_to_chunks(sections))
+                    sections = []
+                    chunks.extend(self._table_chunks(header, rows, section))
+                    continue
+            text = elem.get_text("\n" if elem.name == "pre" else " ", strip=elem.name != "pre")
+            if elem.name in html_headings:
+                section = clean_cell(text)
+            if elem.name == "li":
+                text = f"- {text}"
+            sections.append((section, text))
+        chunks.extend(self._sections_to_chunks(sections))
+        if not chunks:
+            # pages built from divs only
+            text = body.get_text("\n", strip=True)
+            chunks = self._sections_to_chunks(("", p) for p in text.split("\n"))
+        return chunks
+
+    def _extract_json(self, data) -> List[PDFChunk]:
+        # list of flat records is a table, everything else is pretty-printed and split between top-level items
+        if isinstance(data, list) and data and all(isinstance(r, dict) and r for r in data):
+            if all(is_scalar(v) for r in data for v in r.values()):
+                header = list(dict.fromkeys(key for record in data for key in record))
+                rows = [[clean_cell(r.get(key)) for key in header] for r in data]
+                return self._table_chunks([clean_cell(key) for key in header], rows, "")
+        if isinstance(data, dict):
+            items = (f"{json.dumps(k)}: {json.dumps(v, indent=2, ensure_ascii=False)}" for k, v in data.items())
+            return self._sections_to_chunks(("", item) for item in items)
+        if isinstance(data, list):
+            return self._sections_to_chunks(("", json.dumps(v, indent=2, ensure_ascii=False)) for v in data)
+        return self._sections_to_chunks([("", json.dumps(data, ensure_ascii=False))])
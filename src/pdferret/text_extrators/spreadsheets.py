@@ -6,13 +6,13 @@ from contextlib import closing
 from io import BytesIO
 from typing import List
 
-import pypandoc
 from tika import parser, unpack
 
 from pdferret.datamodels import PDFChunk, PDFDoc
 
 from ..base import BaseProcessor
 from ..datamodels import ChunkType, PDFChunk, PDFDoc
+from ..utils.pandoc import pandoc_convert
 
 os.environ["TIKA_CLIENT_ONLY"] = "1"
 
@@ -124,7 +124,7 @@ class TikaExtractor(BaseProcessor):
         if self.save_raw_metadata:
             doc.metainfo.extra_metainfo["pdf_metadata"] = parsed["metadata"]
 
-        markdown = pypandoc.convert_text(parsed["content"], to="markdown", format="html")
+        markdown = pandoc_convert("markdown", text=parsed["content"], format="html")
         for chunk in split_text_by_lines(markdown, self.lines_per_chunk):
             if not chunk:
                 continue
@@ -6,12 +6,20 @@ from contextlib import closing
 from io import BytesIO
 from typing import List
 
-import openpyxl
-import pypandoc
+from bs4 import BeautifulSoup
+from pypdf import PdfReader, PdfWriter
 from tika import parser, unpack
 
 from ..base import BaseProcessor
+from ..chunking import MAX_CHUNK_LEN
 from ..datamodels import ChunkType, PDFChunk, PDFDoc
+from ..logging import logger
+from ..utils.langdetect import detect_language
+from ..utils.metrics import spellcheck_score
+from ..utils.pandoc import pandoc_convert
+from ..utils.scan_detector import page_image_ratios
+from ..utils.tables import html_table_rows, split_table
+from ..utils.workbook import open_workbook
 
 os.environ["TIKA_CLIENT_ONLY"] = "1"
 
@@ -29,6 +37,15 @@ prop_tags_mapping = {
 
 doi_regex = r"\b10\.\d{4,9}/[-.;()/:\w]+"
 
+# SELECTIVE is not a Tika strategy: text layer is extracted without OCR,
+# and only the pages which look scanned or garbled are sent to Tika OCR afterwards
+ocr_strategies = ["AUTO", "OCR_ONLY", "NO_OCR", "OCR_AND_TEXT_EXTRACTION", "SELECTIVE"]
+
+# tables are cut out of XHTML before pandoc and replaced by this marker around the table index,
+# it is matched anywhere, as pandoc may put it in a list item or a quote (e.g. "- PDFERRETTABLE0END")
+table_placeholder = "PDFERRETTABLE"
+table_placeholder_regex = rf"{table_placeholder}(\d+)END"
+
 image_extensions = [
     ".jpg",
     ".jpeg",
@@ -81,6 +98,8 @@ class TikaExtractor(BaseProcessor):
 
     parallel = "thread"
     operates_on = PDFDoc
+    # emit tables as separate TABLE chunks instead of converting them to markdown together with the text
+    structured_tables = True
 
     def __init__(
         self,
@@ -88,45 +107,140 @@ class TikaExtractor(BaseProcessor):
         lines_per_chunk=15,
         tika_ocr_strategy="AUTO",
         save_raw_metadata=False,
+        ocr_min_page_chars=200,
+        ocr_min_page_quality=0.5,
+        max_table_chars=MAX_CHUNK_LEN,
+        use_pdf_rendition=False,
         batch_size=None,
         n_proc=None,
     ):
+        """
+        tika_ocr_strategy - one of 'AUTO', 'OCR_ONLY', 'NO_OCR', 'OCR_AND_TEXT_EXTRACTION' is passed to Tika as is,
+            'SELECTIVE' extracts the text layer first and then OCRs only the pages with poor text layer
+        ocr_min_page_chars, ocr_min_page_quality - in 'SELECTIVE' mode, pages containing images are OCRed
+            if they have no text layer, or if the spellcheck score of their text is below ocr_min_page_quality
+            and the text has at least ocr_min_page_chars characters or the page is covered by an image (a scan)
+        max_table_chars - tables longer than this are split by rows into several TABLE chunks
+        use_pdf_rendition - extract from file_features.pdf_rendition if the document has one
+        """
         super().__init__(batch_size=batch_size, n_proc=n_proc)
         self.tika_url = tika_url
-        if tika_ocr_strategy not in ["AUTO", "OCR_ONLY", "NO_OCR", "OCR_AND_TEXT_EXTRACTION"]:
-            raise ValueError(
-                "Invalid Tika OCR strategy, must be one of 'AUTO', 'OCR_ONLY', 'NO_OCR', 'OCR_AND_TEXT_EXTRACTION'"
-            )
+        if tika_ocr_strategy not in ocr_strategies:
+            raise ValueError(f"Invalid Tika OCR strategy, must be one of {', '.join(ocr_strategies)}")
         self.tika_ocr_strategy = tika_ocr_strategy
         self.lines_per_chunk = lines_per_chunk
         self.save_raw_metadata = save_raw_metadata
-
-    def process_single(self, doc: PDFDoc) -> PDFDoc:
-        headers = {"X-Tika-PDFocrStrategy": self.tika_ocr_strategy}
-        parsed = parser.from_file(
-            doc.metainfo.file_features.file,
+        self.ocr_min_page_chars = ocr_min_page_chars
+        self.ocr_min_page_quality = ocr_min_page_quality
+        self.max_table_chars = max_table_chars
+        self.use_pdf_rendition = use_pdf_rendition
+
+    @property
+    def _tika_ocr_strategy(self):
+        # strategy which is actually sent to Tika for the whole file
+        return "NO_OCR" if self.tika_ocr_strategy == "SELECTIVE" else self.tika_ocr_strategy
+
+    def _parse(self, file, ocr_strategy):
+        headers = {"X-Tika-PDFocrStrategy": ocr_strategy}
+        return parser.from_file(
+            file,
             xmlContent=True,
             raw_response=False,
             headers=headers,
             serverEndpoint=self.tika_url,
         )
 
+    def process_single(self, doc: PDFDoc) -> PDFDoc:
+        features = doc.metainfo.file_features
+        file = features.pdf if self.use_pdf_rendition else features.file
+        parsed = self._parse(file, self._tika_ocr_strategy)
+
         if self.save_raw_metadata:
             doc.metainfo.extra_metainfo["pdf_metadata"] = parsed["metadata"]
 
-        markdown = pypandoc.convert_text(parsed["content"], to="markdown", format="html")
-        for chunk in self.split_text_by_lines(markdown, self.lines_per_chunk):
-            if not chunk:
+        # XHTML is parsed only once, both OCR of single pages and table extraction work on the same tree
+        soup = BeautifulSoup(parsed["content"] or "", "html.parser")
+        if self.tika_ocr_strategy == "SELECTIVE" and file.lower().endswith(".pdf"):
+            lang = self._text_language(soup, doc.metainfo.language)
+            doc.metainfo.extra_metainfo["ocr_pages"] = self._ocr_poor_pages(soup, file, lang)
+        tables = self._extract_tables(soup) if self.structured_tables else []
+
+        markdown = pandoc_convert("markdown", text=str(soup), format="html")
+        # tables were replaced by placeholders, so re.split alternates between text and table index
+        parts = re.split(table_placeholder_regex, markdown)
+        for idx, part in enumerate(parts):
+            if idx % 2:
+                doc.chunks.extend(tables[int(part)])
                 continue
-            doc.chunks.append(PDFChunk(text=chunk, chunk_type=ChunkType.TEXT))
+            for chunk in self.split_text_by_lines(part, self.lines_per_chunk):
+                if not chunk:
+                    continue
+                doc.chunks.append(PDFChunk(text=chunk, chunk_type=ChunkType.TEXT))
         try:
-            attachments = self._get_attachments(doc.metainfo.file_features.file)
+            attachments = self._get_attachments(file)
             fig_chunks = self._extract_figures(attachments)
             doc.chunks.extend(fig_chunks)
         except Exception as e:
             print(f"Error extracting attachments: {e}")
         return doc
 
+    def _text_language(self, soup, default=None):
+        """Language of the text layer for spellchecking, language detection of the document runs only later"""
+        text = soup.get_text(" ", strip=True)[:10000]
+        if len(text) < self.ocr_min_page_chars:
+            # too little text to tell, e.g. a scan without text layer
+            return default or "en"
+        return detect_language(text)
+
+    def _ocr_poor_pages(self, soup, file, lang="en"):
+        """
+        Second pass of the selective OCR: OCR only the pages which contain images
+        and have too little or too poor text, and put them back in page order.
+        Returns list of OCRed page numbers (1-based).
+        """
+        pages = soup.find_all("div", class_="page")
+        reader = PdfReader(file)
+        img_ratios = page_image_ratios(reader)
+        ocr_pages = []
+        for idx, page in enumerate(pages[: len(reader.pages)]):
+            if img_ratios[idx] <= 0:
+                # nothing to recognize on the page
+                continue
+            if not self._page_needs_ocr(page.get_text(" ", strip=True), lang, img_ratios[idx]):
+                continue
+            ocr_content = self._ocr_page(reader, idx)
+            if ocr_content is None:
+                continue
+            page.clear()
+            for child in list(ocr_content.contents):
+                page.append(child)
+            ocr_pages.append(idx + 1)
+        if ocr_pages:
+            logger.info(f"{file}: OCRed {len(ocr_pages)} of {len(pages)} pages")
+        return ocr_pages
+
+    def _page_needs_ocr(self, text, lang, image_ratio=1.0):
+        if not text:
+            return True
+        if spellcheck_score(text, lang) >= self.ocr_min_page_quality:
+            return False
+        # short text next to a figure (captions, labels) scores poorly too, it is OCRed only on a scanned page
+        return len(text) >= self.ocr_min_page_chars or image_ratio >= 1.0
+
+    def _ocr_page(self, reader, idx):
+        writer = PdfWriter()
+        writer.add_page(reader.pages[idx])
+        buff = BytesIO()
+        writer.write(buff)
+        parsed = parser.from_buffer(
+            buff.getvalue(),
+            serverEndpoint=self.tika_url,
+            xmlContent=True,
+            headers={"X-Tika-PDFocrStrategy": "OCR_ONLY"},
+        )
+        soup = BeautifulSoup(parsed.get("content") or "", "html.parser")
+        return soup.find("div", class_="page") or soup.body
+
     @staticmethod
     def _filter_line(line):
         if line.startswith("![]("):
@@ -154,14 +268,39 @@ class TikaExtractor(BaseProcessor):
         return chunks
 
     def _extract_tables(self, soup):
-        tables = soup.find_all("table")
-        chunks = []
-        for table in tables:
-            table_html = str(table)
-            chunk = PDFChunk(non_embeddable_content=table_html, chunk_type=ChunkType.OTHER, locked=True)
-            chunk.requires_fill = True
-            chunks.append(chunk)
-        return chunks
+        """
+        Convert top-level tables to locked TABLE chunks with compact markdown content,
+        split by rows with repeated header if the table is too long.
+        Every converted table is replaced in the soup by a placeholder paragraph.
+        Returns list of chunk lists, indexed by placeholder number.
+        """
+        pages = {id(page): idx + 1 for idx, page in enumerate(soup.find_all("div", class_="page"))}
+        tables = []
+        for table in soup.find_all("table"):
+            if table.find_parent("table") is not None:
+                continue
+            header, rows = html_table_rows(table)
+            # single column or single row tables are usually used for layout, keep them as text
+            if not header or len(header) < 2 or not rows:
+                continue
+            page = table.find_parent("div", class_="page")
+            page = pages.get(id(page)) if page is not None else None
+            chunks = []
+            for part in split_table(header, rows, self.max_table_chars):
+                chunks.append(
+                    PDFChunk(
+                        page=page,
+                        text=part,
+                        non_embeddable_content=part,
+                        chunk_type=ChunkType.TABLE,
+                        locked=True,
+                    )
+                )
+            placeholder = soup.new_tag("p")
+            placeholder.string = f"{table_placeholder}{len(tables)}END"
+            table.replace_with(placeholder)
+            tables.append(chunks)
+        return tables
 
     def _extract_figures(self, attachments):
         chunks = []
@@ -198,7 +337,7 @@ class TikaExtractor(BaseProcessor):
             return authors.split(";")
 
     def _get_attachments(self, file):
-        headers = {"X-Tika-PDFextractInlineImages": "true", "X-Tika-PDFocrStrategy": self.tika_ocr_strategy}
+        headers = {"X-Tika-PDFextractInlineImages": "true", "X-Tika-PDFocrStrategy": self._tika_ocr_strategy}
         code, binary = unpack.parse1(
             "unpack",
             file,
@@ -215,6 +354,9 @@ class TikaExtractor(BaseProcessor):
 
 
 class TikaSpreadsheetExtractor(TikaExtractor):
+    # the whole spreadsheet is a table, it is converted to markdown text
+    structured_tables = False
+
     @staticmethod
     def _filter_line(line):
         if line.startswith("![]("):
@@ -238,5 +380,6 @@ class TikaSpreadsheetExtractor(TikaExtractor):
         return doc
 
     def _extract_sheets(self, file: str):
-        wb = openpyxl.load_workbook(file)
-        return wb.sheetnames
+        # streaming reader, the cell model of the workbook is never loaded
+        with open_workbook(file) as wb:
+            return wb.sheet_names()
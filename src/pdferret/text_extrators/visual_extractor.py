@@ -1,24 +1,20 @@
+import functools
 import io
 from typing import List
 
 from llmonkey.llms import BaseLLMModel
-from pdf2image import convert_from_path
+from PIL import Image
 
 from ..base import BaseProcessor
+from ..config import CACHE_MAX_SIZE_MB, LLM_CACHE, VISION_MAX_TOKENS_PER_PAGE, VISION_PAGE_CACHE
 from ..datamodels import ChunkType, PDFChunk, PDFDoc
-
-
-def convert_pdf_to_jpg(file: str, max_pages: int = 3) -> List[bytes]:
-    pages_as_pil = convert_from_path(file, first_page=0, last_page=max_pages, dpi=100)
-    images = []
-    for pil_page in pages_as_pil:
-        buff = io.BytesIO()
-        pil_page.save(buff, "JPEG")
-        raw_bytes = buff.getvalue()
-        images.append(raw_bytes)
-        buff.close()
-    return images
-
+from ..llm.routing import llm_client, primary_model
+from ..llm.scheduler import model_id
+from ..utils.disk_cache import get_disk_cache
+from ..utils.image_hash import content_hash, page_representatives
+from ..utils.page_selection import page_signals, select_pages
+from ..utils.pdf_render import render_pages
+from ..utils.vision_tokens import prepare_for_vision, vision_token_model
 
 # this didn't really work, probably would require a separate call to the model to make it reliable
 #    Add word "handwritten" or "hand-drawn" if the document is handwritten or hand-drawn.""",
@@ -30,31 +26,124 @@ prompt = {
 
 
 class VisualPDFExtractor(BaseProcessor):
+    """
+    Describes pages of the pdf (or pdf rendition) with the vision model.
+    If page_selection is set, pages are scored by image coverage, vector drawings and text layer density
+    (see utils.page_selection) and only up to max_pages pages scoring at least min_page_score are sent,
+    otherwise the first max_pages pages are sent.
+    Duplicate pages within the document share one description: pages with the same text layer and image,
+    and pages without text layer (scans) whose perceptual hashes are within max_hash_distance
+    (0 for exact duplicates only), see utils.image_hash.page_representatives. If page_cache (sqlite file) is set,
+    descriptions are reused across documents for pages with exactly the same image and text layer.
+    Page images are prepared for the tiling and token accounting of the vision model (see utils.vision_tokens):
+    blank margins are trimmed and the resolution is chosen to stay within max_tokens_per_page,
+    estimated tokens per image are stored in extra_metainfo["vision_tokens"].
+    Responses are cached in PDFERRET_LLM_CACHE unless llm_cache is False, see llm.client.LLMClient.
+    If model is a list of models, requests fail over and are hedged along it, see llm.routing.RoutedLLMClient.
+    """
+
     parallel = "thread"
     operates_on = PDFDoc
 
     def __init__(
-        self, model: BaseLLMModel, max_pages: int = 3, update_thumbnail: bool = True, batch_size=None, n_proc=None
+        self,
+        model: BaseLLMModel | List[BaseLLMModel],
+        max_pages: int = 3,
+        update_thumbnail: bool = True,
+        page_selection: bool = True,
+        min_page_score: float = 0.15,
+        dedupe_pages: bool = True,
+        max_hash_distance: int = 4,
+        page_cache: str = VISION_PAGE_CACHE,
+        max_tokens_per_page: int = VISION_MAX_TOKENS_PER_PAGE,
+        render_dpi: int = 150,
+        trim_margins: bool = True,
+        llm_cache: bool = True,
+        batch_size=None,
+        n_proc=None,
     ):
         super().__init__(batch_size=batch_size, n_proc=n_proc)
-        self.model = model
+        # a list of models is a fallback chain, images are prepared for the first one
+        self.model = primary_model(model)
+        self.llm = llm_client(model, cache_path=LLM_CACHE if llm_cache else None)
         self.max_pages = max_pages
         self.update_thumbnail = update_thumbnail
+        self.page_selection = page_selection
+        self.min_page_score = min_page_score
+        self.dedupe_pages = dedupe_pages
+        self.max_hash_distance = max_hash_distance
+        self.page_cache = get_disk_cache(page_cache, CACHE_MAX_SIZE_MB) if page_cache else None
+        self.max_tokens_per_page = max_tokens_per_page
+        self.render_dpi = render_dpi
+        self.trim_margins = trim_margins
 
     def process_single(self, doc: PDFDoc) -> PDFDoc:
-        imgs = convert_pdf_to_jpg(doc.metainfo.file_features.file, self.max_pages)
+        file = doc.metainfo.file_features.pdf
+        signals = page_signals(file)
+        if self.page_selection:
+            pages = select_pages(signals, self.max_pages, self.min_page_score)
+        else:
+            pages = [s.page for s in signals[: self.max_pages]]
+        doc.metainfo.extra_metainfo["visual_pages"] = [page + 1 for page in pages]
         if self.update_thumbnail:
-            doc.metainfo.thumbnail = imgs[0]
+            doc.metainfo.thumbnail = render_pages(file, pages=[0], dpi=100)[0]
+
+        # pages are rendered with enough resolution for small text, then trimmed and scaled to the token budget
+        token_model = vision_token_model(model_id(self.model))
+        imgs = render_pages(
+            file,
+            pages=pages,
+            dpi=self.render_dpi,
+            max_size=2 * token_model.max_side,
+            prepare=functools.partial(
+                prepare_for_vision,
+                token_model=token_model,
+                max_tokens=self.max_tokens_per_page,
+                trim=self.trim_margins,
+            ),
+        )
+        sizes = [Image.open(io.BytesIO(img)).size for img in imgs]
+        doc.metainfo.extra_metainfo["vision_tokens"] = [token_model.estimate_tokens(*size) for size in sizes]
         lang = doc.metainfo.language or "en"
         if lang not in prompt:
             lang = "en"
 
-        for img in imgs:
-            resp = self.model.generate_prompt_response(user_prompt=prompt[lang], image=img, temperature=0.2, max_tokens=1000)
-            if not resp:
+        # duplicate pages (repeated slides, blank pages, rescans) share one description,
+        # pages of the same template with different text are told apart by the text layer
+        text_hashes = [signals[page].text_hash if signals[page].text_chars else None for page in pages]
+        exact = [content_hash(img, text_hash or "") for img, text_hash in zip(imgs, text_hashes)]
+        if self.dedupe_pages:
+            representatives = page_representatives(imgs, text_hashes, self.max_hash_distance)
+        else:
+            representatives = range(len(imgs))
+        descriptions = {}
+        cache_keys = {rep: f"{model_id(self.model)}:{lang}:{exact[rep]}" for rep in set(representatives)}
+        if self.page_cache:
+            for rep, key in cache_keys.items():
+                if (cached := self.page_cache.get(key)) is not None:
+                    descriptions[rep] = cached
+
+        # pages are described concurrently, limited by the scheduler shared by all requests to the model
+        futures = {
+            rep: self.llm.submit("prompt", user_prompt=prompt[lang], image=imgs[rep], temperature=0.2, max_tokens=1000)
+            for rep in cache_keys
+            if rep not in descriptions
+        }
+        for rep, future in futures.items():
+            if (text := future.result()) is None:
+                continue
+            descriptions[rep] = text
+            if self.page_cache:
+                self.page_cache.set(cache_keys[rep], descriptions[rep])
+
+        for page, img, rep in zip(pages, imgs, representatives):
+            if rep not in descriptions:
                 continue
             chunk = PDFChunk(
-                text=resp.conversation[-1].content, non_embeddable_content=img, chunk_type=ChunkType.VISUAL_PAGE
+                page=page + 1,
+                text=descriptions[rep],
+                non_embeddable_content=img,
+                chunk_type=ChunkType.VISUAL_PAGE,
             )
             doc.chunks.append(chunk)
         return doc
@@ -3,8 +3,8 @@ import tempfile
 from typing import Dict
 
 from ..base import BaseProcessor
+from ..converters.libreoffice import convert_libreoffice
 from ..datamodels import PDFDoc, PDFError
-from ..utils.shell_run import run_command
 
 
 def make_thumbnail_libreoffice(files: list[str], output_dir: str):
@@ -14,9 +14,7 @@ def make_thumbnail_libreoffice(files: list[str], output_dir: str):
     :param files: List of file paths to be converted.
     :param output_dir: Directory where the thumbnails will be saved.
     """
-    command = ["libreoffice", "--convert-to", "png", "--outdir", output_dir, *files]
-    stdout, stderr, return_code = run_command(command)
-    return stdout, stderr
+    return convert_libreoffice(files, output_dir, "png")
 
 
 class LibreOfficeThumbnailer(BaseProcessor):
@@ -28,19 +26,27 @@ class LibreOfficeThumbnailer(BaseProcessor):
         return doc
 
     def _process_batch(self, X: Dict[str, PDFDoc]) -> tuple[Dict[str, PDFDoc], Dict[str, PDFError]]:
-        # process all files in a serial batch
-        # libreoffice is slow to start but fast to convert, so we don't need to parallelize
+        # process all files in one batch, convert_libreoffice spreads them over parallel LibreOffice workers
+        # libreoffice is slow to start but fast to convert, so it is either kept running as a service
+        # or started once per worker for the whole batch
         with tempfile.TemporaryDirectory() as output_dir:
-            stdout, stderr = make_thumbnail_libreoffice(
+            stdout, stderr, failed = make_thumbnail_libreoffice(
                 [doc.metainfo.file_features.file for doc in X.values()], output_dir
             )
-            for doc in X.values():
+            errors = {}
+            results = {}
+            for key, doc in X.items():
+                if reason := failed.get(doc.metainfo.file_features.file):
+                    errors[key] = PDFError(reason, file=key, traceback=stderr)
+                    continue
                 base_name = os.path.basename(doc.metainfo.file_features.file)
                 name, _ = os.path.splitext(base_name)
                 thumbnail_path = os.path.join(output_dir, f"{name}.png")
                 try:
                     with open(thumbnail_path, "rb") as f:
                         doc.metainfo.thumbnail = f.read()
-                except FileNotFoundError:
-                    pass
-        return X, {}
+                except FileNotFoundError as e:
+                    errors[key] = PDFError(repr(e), file=key, traceback=stderr)
+                    continue
+                results[key] = doc
+        return results, errors
@@ -1,20 +1,14 @@
-import io
-from typing import Dict, List
-
-from pdf2image import convert_from_path
+import traceback
+from typing import Dict
 
 from ..base import BaseProcessor
 from ..datamodels import PDFDoc, PDFError
+from ..logging import logger
+from ..utils.pdf_render import render_pages
 
 
-def convert_pdf_to_jpg(file: str) -> List[bytes]:
-    pages_as_pil = convert_from_path(file, first_page=0, last_page=1, dpi=100)
-    pil_page = pages_as_pil[0]
-    buff = io.BytesIO()
-    pil_page.save(buff, "JPEG")
-    raw_bytes = buff.getvalue()
-    buff.close()
-    return raw_bytes
+def convert_pdf_to_jpg(file: str) -> bytes:
+    return render_pages(file, pages=[0], dpi=100)[0]
 
 
 class PDF2ImageThumbnailer(BaseProcessor):
@@ -26,9 +20,14 @@ class PDF2ImageThumbnailer(BaseProcessor):
         return doc
 
     def _process_batch(self, X: Dict[str, PDFDoc]) -> tuple[Dict[str, PDFDoc], Dict[str, PDFError]]:
-        for doc in X.values():
-            meta = doc.metainfo
-            thumbnail = convert_pdf_to_jpg(meta.file_features.file)
-            doc.metainfo.thumbnail = thumbnail
-
-        return X, {}
+        results, errors = {}, {}
+        for key, doc in X.items():
+            try:
+                doc.metainfo.thumbnail = convert_pdf_to_jpg(doc.metainfo.file_features.pdf)
+            except Exception as e:
+                # e.g. corrupt or missing rendition, only this document fails
+                logger.error(f"Failed to render thumbnail of {key}: {repr(e)}")
+                errors[key] = PDFError(repr(e), traceback=traceback.format_exception(e), file=key)
+                continue
+            results[key] = doc
+        return results, errors
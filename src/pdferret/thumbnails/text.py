@@ -0,0 +1,58 @@
+import io
+import textwrap
+
+from PIL import Image, ImageDraw, ImageFont
+
+from ..base import BaseProcessor
+from ..datamodels import PDFDoc
+
+
+def render_text_thumbnail(text: str, width=600, height=800, font_size=14, margin=30) -> bytes:
+    """Render the beginning of the text on a white page, as JPEG"""
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed size bitmap font
+        font = ImageFont.load_default()
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    char_width = max(1, draw.textlength("x", font=font))
+    line_height = int(font_size * 1.4)
+    max_chars = int((width - 2 * margin) / char_width)
+    max_lines = (height - 2 * margin) // line_height
+
+    lines = []
+    for paragraph in text.splitlines():
+        lines.extend(textwrap.wrap(paragraph, max_chars, replace_whitespace=False) or [""])
+        if len(lines) >= max_lines:
+            break
+    for idx, line in enumerate(lines[:max_lines]):
+        draw.text((margin, margin + idx * line_height), line, fill="black", font=font)
+
+    buff = io.BytesIO()
+    image.save(buff, "JPEG")
+    return buff.getvalue()
+
+
+class TextThumbnailer(BaseProcessor):
+    """
+    Thumbnail of text-like documents, rendered in-process from the already extracted chunks
+    (no LibreOffice), so it has to run after the text extractor.
+    """
+
+    parallel = "thread"
+    operates_on = PDFDoc
+
+    def __init__(self, max_chars=3000, batch_size=None, n_proc=None):
+        super().__init__(batch_size=batch_size, n_proc=n_proc)
+        self.max_chars = max_chars
+
+    def process_single(self, doc: PDFDoc) -> PDFDoc:
+        text = ""
+        for chunk in doc.chunks:
+            if len(text) >= self.max_chars:
+                break
+            if chunk.text:
+                text += chunk.text + "\n\n"
+        doc.metainfo.thumbnail = render_text_thumbnail(text[: self.max_chars])
+        return doc
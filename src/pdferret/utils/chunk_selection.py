@@ -0,0 +1,74 @@
+import re
+from collections import Counter
+from typing import Callable, List
+
+import numpy as np
+
+_words = re.compile(r"\w\w+")
+
+
+def tfidf_matrix(texts: List[str], max_terms: int = 5000) -> np.ndarray:
+    """
+    L2-normalized TF-IDF vectors of texts (rows) over at most max_terms terms with the highest document frequency.
+    Terms occurring in a single text carry no similarity, they are left out.
+    """
+    docs = [_words.findall(text.lower()) for text in texts]
+    df = Counter(term for doc in docs for term in set(doc))
+    terms = [term for term, count in df.most_common(max_terms) if count > 1]
+    if not terms:
+        return np.zeros((len(texts), 0), dtype=np.float32)
+    vocab = {term: idx for idx, term in enumerate(terms)}
+    # term counts of all texts at once, as flat indices row * n_terms + term
+    flat = [row * len(terms) + vocab[term] for row, doc in enumerate(docs) for term in doc if term in vocab]
+    tf = np.bincount(np.array(flat, dtype=np.intp), minlength=len(texts) * len(terms))
+    tf = tf.reshape(len(texts), len(terms)).astype(np.float32)
+    # sublinear tf, so a term repeated in a list or table doesn't dominate
+    tf = np.log1p(tf)
+    idf = np.log((1 + len(texts)) / (1 + np.array([df[term] for term in terms], dtype=np.float32))) + 1
+    vectors = tf * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def select_chunks(
+    texts: List[str],
+    max_chunks: int,
+    max_tokens: int = None,
+    count_tokens: Callable[[str], int] = None,
+    keep_first: int = 1,
+    diversity: float = 0.3,
+) -> List[int]:
+    """
+    Indices (in document order) of the most representative texts for a summary: up to max_chunks texts
+    and, if given, at most max_tokens tokens as counted by count_tokens.
+    Texts are scored by cosine similarity of their TF-IDF vector to the centroid of the document,
+    and selected greedily with maximal marginal relevance, so near-duplicates of already selected texts are avoided.
+    The first keep_first texts (title page, abstract) are always selected if they fit.
+    """
+    if len(texts) <= max_chunks and max_tokens is None:
+        return list(range(len(texts)))
+    tokens = [count_tokens(text) for text in texts] if count_tokens and max_tokens is not None else None
+    vectors = tfidf_matrix(texts)
+    centroid = vectors.mean(axis=0)
+    relevance = vectors @ (centroid / (np.linalg.norm(centroid) or 1))
+    # very short texts (headings, page numbers, lines of a table of contents) have inflated similarity
+    lengths = np.array([len(text) for text in texts], dtype=np.float32)
+    relevance *= np.minimum(1.0, lengths / 300)
+
+    selected, used_tokens = [], 0
+    redundancy = np.zeros(len(texts), dtype=np.float32)
+    candidates = list(range(min(keep_first, len(texts))))
+    remaining = np.ones(len(texts), dtype=bool)
+    while len(selected) < max_chunks and remaining.any():
+        if candidates:
+            idx = candidates.pop(0)
+        else:
+            scores = (1 - diversity) * relevance - diversity * redundancy
+            idx = int(np.argmax(np.where(remaining, scores, -np.inf)))
+        remaining[idx] = False
+        if tokens is not None and used_tokens + tokens[idx] > max_tokens:
+            continue
+        selected.append(idx)
+        used_tokens += tokens[idx] if tokens is not None else 0
+        redundancy = np.maximum(redundancy, vectors @ vectors[idx])
+    return sorted(selected)
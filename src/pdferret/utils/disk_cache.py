@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Persistent key-value cache in a sqlite file, which can be shared by threads and processes.
+    When the total size of the values exceeds max_size_mb, least recently used entries are evicted.
+    Hits and misses of this instance are counted.
+    """
+
+    def __init__(self, path: str, max_size_mb: float = 1024):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_size = int(max_size_mb * 2**20)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def get(self, key: str):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, value: str | bytes):
+        # size in bytes, as stored in the file
+        size = len(value.encode()) if isinstance(value, str) else len(value)
+        with self._lock, self._conn:
+            # a replaced entry only adds the difference of sizes
+            old = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._size += size - (old[0] if old else 0)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # other processes write too, so the size is recounted before evicting
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        rows = self._conn.execute("SELECT key, size FROM cache ORDER BY accessed")
+        evicted = []
+        # evict down to 90% of the limit, so eviction doesn't run on every insert
+        while self._size > 0.9 * self.max_size and (row := rows.fetchone()):
+            evicted.append((row[0],))
+            self._size -= row[1]
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size_mb": self._size / 2**20,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_disk_cache(path: str, max_size_mb: float = 1024) -> DiskCache:
+    """Cache instance shared by all users of the file in the process"""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = DiskCache(path, max_size_mb)
+        return _caches[path]
@@ -0,0 +1,66 @@
+import hashlib
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def dhash(image: bytes | Image.Image, hash_size: int = 8, min_diff: int = 2) -> int:
+    """
+    Difference hash of the image: the image is reduced to (hash_size + 1) x hash_size grayscale pixels
+    and every bit tells if a pixel is brighter than its right neighbour by more than min_diff gray levels.
+    Visually similar images have hashes with small hamming distance, independently of resolution and encoding.
+    min_diff keeps the bits of blank areas stable, which scan noise would flip otherwise.
+    """
+    if isinstance(image, bytes):
+        image = Image.open(io.BytesIO(image))
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1] + min_diff).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def content_hash(image: bytes, text: str = "") -> str:
+    """Exact hash of encoded image and the text layer of the page"""
+    digest = hashlib.sha256(image)
+    digest.update(b"\0" + text.encode())
+    return digest.hexdigest()
+
+
+def group_near_duplicates(hashes: list[int], max_distance: int, exact_keys: list[str] = None) -> list[int]:
+    """
+    For every hash the index of the first hash within max_distance, i.e. its representative.
+    If exact_keys are given, only items with the same key (e.g. the text layer of the page) are grouped,
+    items with key None are grouped with each other by the hash alone.
+    """
+    representatives = []
+    for idx, value in enumerate(hashes):
+        rep = next(
+            (
+                r
+                for r in dict.fromkeys(representatives)
+                if hamming(value, hashes[r]) <= max_distance
+                and (exact_keys is None or exact_keys[r] == exact_keys[idx])
+            ),
+            idx,
+        )
+        representatives.append(rep)
+    return representatives
+
+
+def page_representatives(images: list[bytes], text_hashes: list[str | None], max_distance: int) -> list[int]:
+    """
+    For every page image the index of the page whose description it shares.
+    Pages with a text layer (hash of its text) are grouped only with exact duplicates, same image and text.
+    Pages without text layer (text hash None, e.g. scans) are grouped by perceptual hash within max_distance,
+    as scan noise makes the images of the same page differ. max_distance 0 groups exact duplicates only.
+    """
+    exact = [content_hash(image, text_hash or "") for image, text_hash in zip(images, text_hashes)]
+    if not max_distance:
+        return [exact.index(key) for key in exact]
+    keys = [key if text_hash is not None else None for key, text_hash in zip(exact, text_hashes)]
+    return group_near_duplicates([dhash(image) for image in images], max_distance, keys)
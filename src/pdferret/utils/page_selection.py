@@ -0,0 +1,79 @@
+import hashlib
+import math
+from dataclasses import dataclass
+from typing import List
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from .pdf_render import pdfium_lock
+
+
+@dataclass
+class PageSignals:
+    page: int  # 0-based
+    image_coverage: float  # part of the page area covered by images, 0..1
+    text_chars: int  # characters in the text layer
+    path_objects: int  # vector drawing objects, many of them suggest a chart or diagram
+    text_hash: str = ""  # sha256 of the text layer, tells apart pages which look alike
+
+    def score(self, full_page_chars=2000, chart_paths=100) -> float:
+        """
+        How much a vision model can add to the text layer of the page, 0..1.
+        Visual content (images or vector drawings) raises the score, dense text layer lowers it,
+        because its content is already extracted as text.
+        """
+        chart = min(1.0, self.path_objects / chart_paths)
+        visual = max(math.sqrt(self.image_coverage), chart)
+        text_density = min(1.0, self.text_chars / full_page_chars)
+        return visual * (1 - 0.5 * text_density)
+
+
+def _page_signals(page: "pdfium.PdfPage", idx: int) -> PageSignals:
+    width, height = page.get_size()
+    image_area = 0.0
+    paths = 0
+    for obj in page.get_objects(max_depth=2):
+        if obj.type == pdfium_c.FPDF_PAGEOBJ_IMAGE:
+            left, bottom, right, top = obj.get_bounds()
+            # clip to the page, images are often larger than the page they are cropped by
+            image_area += max(0, min(right, width) - max(left, 0)) * max(0, min(top, height) - max(bottom, 0))
+        elif obj.type == pdfium_c.FPDF_PAGEOBJ_PATH:
+            paths += 1
+    textpage = page.get_textpage()
+    try:
+        text_chars = textpage.count_chars()
+        text_hash = hashlib.sha256(textpage.get_text_range().encode()).hexdigest()
+    finally:
+        textpage.close()
+    coverage = min(1.0, image_area / (width * height)) if width and height else 0.0
+    return PageSignals(
+        page=idx, image_coverage=coverage, text_chars=text_chars, path_objects=paths, text_hash=text_hash
+    )
+
+
+def page_signals(file: str, max_pages: int = 50) -> List[PageSignals]:
+    """Cheap signals of the first max_pages pages of a pdf, read from the pdf objects without rendering"""
+    signals = []
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(file)
+        try:
+            for idx in range(min(len(pdf), max_pages)):
+                page = pdf[idx]
+                try:
+                    signals.append(_page_signals(page, idx))
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+    return signals
+
+
+def select_pages(signals: List[PageSignals], max_pages: int, min_score: float = 0.15) -> List[int]:
+    """
+    Up to max_pages pages with the highest score, in page order. The budget is adaptive:
+    only pages scoring at least min_score are selected, so text-only documents get no pages at all.
+    """
+    candidates = [s for s in signals if s.score() >= min_score]
+    best = sorted(candidates, key=lambda s: s.score(), reverse=True)[:max_pages]
+    return sorted(s.page for s in best)
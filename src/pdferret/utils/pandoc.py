@@ -0,0 +1,26 @@
+import pypandoc
+
+from ..config import SUBPROCESS_MEMORY_LIMIT, SUBPROCESS_TIMEOUT
+from .shell_run import run_command
+
+
+def pandoc_convert(
+    to: str, file: str = None, text: str = None, format: str = None, extra_args=(), timeout=SUBPROCESS_TIMEOUT
+) -> str:
+    """
+    Convert file or text with pandoc, like pypandoc.convert_file/convert_text, but pandoc is run
+    by run_command with a wall-clock timeout and SUBPROCESS_MEMORY_LIMIT, so a pathological document
+    fails with subprocess.TimeoutExpired or RuntimeError instead of blocking the worker.
+    """
+    command = [pypandoc.get_pandoc_path(), f"--to={to}"]
+    if format:
+        command.append(f"--from={format}")
+    command.extend(extra_args)
+    if file is not None:
+        command.append(file)
+    stdout, stderr, return_code = run_command(
+        command, timeout=timeout, memory_limit=SUBPROCESS_MEMORY_LIMIT * 2**20 or None, input=text
+    )
+    if return_code != 0:
+        raise RuntimeError(f"Pandoc failed with exit code {return_code}: {stderr}")
+    return stdout
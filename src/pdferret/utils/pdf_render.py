@@ -0,0 +1,119 @@
+import concurrent.futures
+import io
+import multiprocessing
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Sequence
+
+import pypdfium2 as pdfium
+from PIL import Image
+
+from ..config import RENDER_WORKERS
+
+# pdfium is not thread-safe: pages are rendered in worker processes, each with its own pdfium,
+# pdfium calls in this process (reading page signals) hold pdfium_lock
+pdfium_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _render_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, forking a process with running threads may deadlock the child
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _reset_pool(pool: concurrent.futures.ProcessPoolExecutor):
+    # a worker crashed (e.g. pdfium on a malformed pdf), the next renders start a new pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _encode(image, fmt: str, quality: int, prepare: Callable = None) -> bytes:
+    if prepare:
+        image = prepare(image)
+    buff = io.BytesIO()
+    image.save(buff, fmt, quality=quality)
+    return buff.getvalue()
+
+
+def _render_page(pdf: "pdfium.PdfDocument", idx: int, dpi: int, max_size: int, grayscale: bool):
+    page = pdf[idx]
+    try:
+        width, height = page.get_size()
+        # render directly at the target size instead of scaling the rendered bitmap
+        scale = dpi / 72
+        if max_size:
+            scale = min(scale, max_size / max(width, height))
+        bitmap = page.render(scale=scale, grayscale=grayscale)
+        return bitmap.to_pil()
+    finally:
+        page.close()
+
+
+def _render_group(file: str, pages: List[int], dpi, max_size, grayscale, fmt, quality, prepare) -> List[bytes]:
+    # runs in a worker process, the pdf is opened once for its group of pages
+    pdf = pdfium.PdfDocument(file)
+    try:
+        return [_encode(_render_page(pdf, idx, dpi, max_size, grayscale), fmt, quality, prepare) for idx in pages]
+    finally:
+        pdf.close()
+
+
+def _page_count(file: str) -> int:
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(file)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def render_pages(
+    file: str,
+    pages: Sequence[int] = None,
+    max_pages: int = None,
+    dpi: int = 100,
+    max_size: int = None,
+    grayscale: bool = False,
+    fmt: str = "JPEG",
+    quality: int = 85,
+    prepare: Callable[[Image.Image], Image.Image] = None,
+) -> List[bytes]:
+    """
+    Render pages of a pdf with pdfium and encode them as images, pages are rendered in parallel in worker processes.
+
+    :param file: Path to the pdf.
+    :param pages: 0-based indices of the pages to render, all pages (up to max_pages) if None.
+    :param max_pages: Render at most first max_pages pages if pages is None.
+    :param dpi: Resolution of the rendering.
+    :param max_size: Limit of the longer side in pixels, the page is rendered at lower dpi if needed.
+    :param grayscale: Render in grayscale instead of RGB.
+    :param prepare: Function applied to every rendered image before encoding, e.g. cropping. It runs in the worker
+        processes, so it must be picklable (a module level function or a functools.partial of one).
+    :return: Encoded images in the order of pages.
+    """
+    pool = _render_pool()
+    try:
+        if pages is None:
+            n_pages = _page_count(file)
+            pages = range(n_pages if max_pages is None else min(max_pages, n_pages))
+        pages = list(pages)
+        # contiguous groups of pages, one per worker, so each worker parses the pdf once
+        n_groups = min(RENDER_WORKERS, len(pages))
+        groups = [pages[i * len(pages) // n_groups : (i + 1) * len(pages) // n_groups] for i in range(n_groups)]
+        futures = [
+            pool.submit(_render_group, file, group, dpi, max_size, grayscale, fmt, quality, prepare) for group in groups
+        ]
+        return [image for future in futures for image in future.result()]
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
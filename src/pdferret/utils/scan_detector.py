@@ -28,6 +28,21 @@ def extract_img_sizes(reader):
     return np.array(sizes)
 
 
+def page_image_ratios(reader):
+    # size of the largest image on every page relative to the page size,
+    # 0 for pages without images; scanned pages are typically >= 1
+    ratios = []
+    for page in reader.pages:
+        obj = page.get_object()
+        ratio = 0.0
+        if "/Resources" in obj:
+            for val_obj in gen_dict_extract("/XObject", obj["/Resources"]):
+                h, w = val_obj["/Height"], val_obj["/Width"]
+                ratio = max(ratio, min(h / page.mediabox.height, w / page.mediabox.width))
+        ratios.append(float(ratio))
+    return np.array(ratios)
+
+
 def mad(x):
     return np.median(np.abs(x - np.median(x, axis=0)))
 
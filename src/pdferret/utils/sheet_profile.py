@@ -0,0 +1,183 @@
+import datetime
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+# number of smallest hashes kept for the distinct count estimation (KMV sketch)
+KMV_SIZE = 1024
+HASH_MAX = float(2**63)
+
+
+value_kinds = ("bool", "number", "date", "text")
+
+
+def _value_kind(value) -> int:
+    # index in value_kinds; bool is a subclass of int, so it has to be checked first
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, (datetime.date, datetime.time)):
+        return 2
+    return 3
+
+
+def _to_datetime(value) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.combine(value, datetime.time())
+
+
+def _hash_values(values: np.ndarray) -> np.ndarray:
+    return np.fromiter((hash(v) & 0x7FFFFFFFFFFFFFFF for v in values), dtype=np.uint64, count=len(values))
+
+
+class ColumnProfile:
+    """
+    Accumulates statistics of a single column block by block.
+    Memory is bounded: min/max are scalars, distinct count is estimated
+    from KMV_SIZE smallest hashes, top values are tracked for at most max_tracked values.
+    """
+
+    def __init__(self, name: str, max_tracked=1000):
+        self.name = name
+        self.max_tracked = max_tracked
+        self.count = 0
+        self.nulls = 0
+        self.type_counts = Counter()
+        self.num_min = self.num_max = None
+        self.date_min = self.date_max = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.top = Counter()
+
+    def update(self, values: np.ndarray):
+        self.count += len(values)
+        is_null = np.fromiter((v is None or v == "" for v in values), dtype=bool, count=len(values))
+        self.nulls += int(is_null.sum())
+        values = values[~is_null]
+        if not len(values):
+            return
+
+        kinds = np.fromiter((_value_kind(v) for v in values), dtype=np.int8, count=len(values))
+        for kind, n in zip(*np.unique(kinds, return_counts=True)):
+            self.type_counts[value_kinds[kind]] += int(n)
+
+        numbers = values[kinds == 1].astype(float)
+        numbers = numbers[np.isfinite(numbers)]
+        if len(numbers):
+            self.num_min = min(numbers.min(), self.num_min) if self.num_min is not None else numbers.min()
+            self.num_max = max(numbers.max(), self.num_max) if self.num_max is not None else numbers.max()
+        dates = [_to_datetime(v) for v in values[kinds == 2] if isinstance(v, datetime.date)]
+        if dates:
+            self.date_min = min([*dates, self.date_min]) if self.date_min else min(dates)
+            self.date_max = max([*dates, self.date_max]) if self.date_max else max(dates)
+
+        as_str = values.astype(str)
+        uniques, counts = np.unique(as_str, return_counts=True)
+        self.hashes = np.unique(np.concatenate([self.hashes, _hash_values(uniques)]))[:KMV_SIZE]
+        self.top.update(dict(zip(uniques.tolist(), counts.tolist())))
+        if len(self.top) > self.max_tracked:
+            self.top = Counter(dict(self.top.most_common(self.max_tracked)))
+
+    @property
+    def distinct(self) -> int:
+        if len(self.hashes) < KMV_SIZE:
+            return len(self.hashes)
+        return int((KMV_SIZE - 1) * HASH_MAX / float(self.hashes[-1]))
+
+    @property
+    def inferred_type(self) -> str:
+        if not self.type_counts:
+            return "empty"
+        return self.type_counts.most_common(1)[0][0]
+
+    def to_dict(self, n_top=3) -> dict:
+        profile = {
+            "name": self.name,
+            "type": self.inferred_type,
+            "null_ratio": round(self.nulls / self.count, 3) if self.count else 1.0,
+            "distinct": self.distinct,
+        }
+        if self.inferred_type == "number" and self.num_min is not None:
+            profile["min"], profile["max"] = float(self.num_min), float(self.num_max)
+        elif self.inferred_type == "date" and self.date_min is not None:
+            profile["min"], profile["max"] = self.date_min.isoformat(), self.date_max.isoformat()
+        # top values are only informative for categorical values which repeat
+        if self.inferred_type in ("text", "bool"):
+            top = [(v, c) for v, c in self.top.most_common(n_top) if c > 1]
+            if top:
+                profile["top"] = top
+        return profile
+
+
+class SheetProfile:
+    """
+    Column profile of a whole sheet. Rows are buffered in blocks of block_rows
+    and every block is converted to numpy column arrays before updating the column profiles.
+    """
+
+    def __init__(self, sheet: str, header: List[str], block_rows=10000):
+        self.sheet = sheet
+        self.columns = [ColumnProfile(name) for name in header]
+        self.block_rows = block_rows
+        self.n_rows = 0
+        self._block = []
+
+    def add_row(self, row):
+        self._block.append(row)
+        if len(self._block) >= self.block_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._block:
+            return
+        ncols = len(self.columns)
+        block = np.empty((len(self._block), ncols), dtype=object)
+        for idx, row in enumerate(self._block):
+            row = row[:ncols]
+            block[idx, : len(row)] = row
+        for col, profile in enumerate(self.columns):
+            profile.update(block[:, col])
+        self.n_rows += len(self._block)
+        self._block = []
+
+    def to_dict(self) -> dict:
+        self._flush()
+        return {
+            "sheet": self.sheet,
+            "rows": self.n_rows,
+            "columns": [col.to_dict() for col in self.columns if col.inferred_type != "empty"],
+        }
+
+
+def _short(value, max_len=40):
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    value = str(value)
+    return value if len(value) <= max_len else value[: max_len - 3] + "..."
+
+
+def format_sheet_profiles(profiles: List[dict], max_columns=30, max_sheets=10) -> str:
+    """
+    Compact text description of sheet profiles for LLM prompts, of the first max_sheets sheets,
+    so a workbook with many sheets doesn't take the whole prompt
+    """
+    lines = []
+    for profile in profiles[:max_sheets]:
+        columns = profile["columns"]
+        lines.append(f"Sheet '{profile['sheet']}' ({profile['rows']} rows, {len(columns)} columns):")
+        for col in columns[:max_columns]:
+            descr = f"- {_short(col['name'])}: {col['type']}, {round(100 * col['null_ratio'])}% empty"
+            descr += f", ~{col['distinct']} distinct"
+            if "min" in col:
+                descr += f", min {_short(col['min'])}, max {_short(col['max'])}"
+            if "top" in col:
+                descr += ", top: " + ", ".join(f"{_short(v)} ({c})" for v, c in col["top"])
+            lines.append(descr)
+        if len(columns) > max_columns:
+            lines.append(f"- ... {len(columns) - max_columns} more columns")
+    if len(profiles) > max_sheets:
+        more = [_short(profile["sheet"]) for profile in profiles[max_sheets:]]
+        lines.append(f"... {len(more)} more sheets: {_short(', '.join(more), 500)}")
+    return "\n".join(lines)
@@ -1,15 +1,71 @@
+import os
+import resource
+import shutil
+import signal
 import subprocess
+import time
+from typing import Callable
 
+_prlimit = shutil.which("prlimit")
 
-def run_command(command):
+
+def run_command(
+    command,
+    timeout: float = None,
+    memory_limit: int = None,
+    input: str = None,
+    progress: Callable[[], int] = None,
+    poll_interval: float = 1.0,
+):
     """
-    Run a shell command and return the output, error and return code.
+    Run a command in its own process group and return the output, error and return code.
+    If the command runs longer than timeout, the whole process group (including children
+    started by the command, e.g. soffice.bin started by libreoffice) is killed and
+    subprocess.TimeoutExpired is raised.
 
-    :param command: Command to be executed as a string.
+    :param command: Command to be executed as a list of arguments.
+    :param timeout: Wall-clock limit in seconds, None for no limit.
+    :param memory_limit: Address space limit in bytes for the command (and its children), None for no limit.
+    :param input: Text passed to stdin of the command.
+    :param progress: Function returning a measure of progress of the command (e.g. number of output files),
+        polled every poll_interval seconds. If given, timeout limits the time without progress
+        instead of the total running time.
     :return: A tuple containing (stdout, stderr, return_code).
     """
-    try:
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return result.stdout, result.stderr, result.returncode
-    except subprocess.CalledProcessError as e:
-        return e.stdout, e.stderr, e.returncode
+    # no python code runs between fork and exec (preexec_fn may deadlock the child when threads are running),
+    # the limit is set by prlimit before it executes the command, or on the started process without prlimit
+    args = [_prlimit, f"--as={memory_limit}", "--", *command] if memory_limit and _prlimit else command
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    )
+    if memory_limit and not _prlimit:
+        try:
+            resource.prlimit(process.pid, resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except ProcessLookupError:
+            pass
+    deadline = None if timeout is None else time.monotonic() + timeout
+    last_progress = progress() if progress else None
+    while True:
+        wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if progress and wait is not None:
+            wait = min(wait, poll_interval)
+        try:
+            stdout, stderr = process.communicate(input=input, timeout=wait)
+            return stdout, stderr, process.returncode
+        except subprocess.TimeoutExpired as e:
+            if progress and (current := progress()) > last_progress:
+                last_progress = current
+                deadline = time.monotonic() + timeout
+            if time.monotonic() < deadline:
+                continue
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            stdout, stderr = process.communicate()
+            raise subprocess.TimeoutExpired(command, timeout, output=stdout, stderr=stderr) from e
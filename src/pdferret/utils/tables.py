@@ -0,0 +1,84 @@
+import re
+from typing import List, Sequence
+
+
+def clean_cell(value) -> str:
+    # single-line cell text which doesn't break markdown table
+    if value is None:
+        return ""
+    text = re.sub(r"\s+", " ", str(value)).strip()
+    return text.replace("|", "\\|")
+
+
+def rows_to_markdown(header: Sequence[str], rows: Sequence[Sequence[str]]) -> str:
+    """
+    Convert table to compact markdown (pipe) table.
+
+    :param header: Header cells, already cleaned.
+    :param rows: List of rows, already cleaned. Rows are padded or cut to the header length.
+    :return: Markdown table as a string.
+    """
+    ncols = len(header)
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * ncols]
+    for row in rows:
+        row = list(row[:ncols]) + [""] * (ncols - len(row))
+        lines.append("| " + " | ".join(row) + " |")
+    return "\n".join(lines)
+
+
+def split_table(header: Sequence[str], rows: Sequence[Sequence[str]], max_chars: int, title: str = "") -> List[str]:
+    """
+    Split table by rows into markdown tables not longer than max_chars (if possible),
+    repeating the title and the header in every part.
+    A single row longer than max_chars is never split.
+    """
+    prefix = f"{title}\n" if title else ""
+    head = prefix + rows_to_markdown(header, [])
+    parts = []
+    current, current_len = [], len(head)
+    for row in rows:
+        row_len = sum(len(c) for c in row) + 3 * len(header) + 2
+        if current and current_len + row_len > max_chars:
+            parts.append(prefix + rows_to_markdown(header, current))
+            current, current_len = [], len(head)
+        current.append(row)
+        current_len += row_len
+    if current or not parts:
+        parts.append(prefix + rows_to_markdown(header, current))
+    return parts
+
+
+def _colspan(cell) -> int:
+    try:
+        return max(1, min(int(cell.get("colspan", 1)), 100))
+    except (TypeError, ValueError):
+        return 1
+
+
+def html_table_rows(table) -> tuple[List[str], List[List[str]]]:
+    """
+    Cleaned header and data rows of a BeautifulSoup table element. The header is the first row with th cells,
+    or the first non-empty row. Nested tables are flattened into the text of their cell.
+    Cells spanning several columns are followed by empty cells, and the header is padded to the widest row,
+    so no cell is cut off by rows_to_markdown.
+    """
+    rows = []
+    header = None
+    for tr in table.find_all("tr"):
+        if tr.find_parent("table") is not table:
+            continue
+        cells = []
+        for cell in tr.find_all(["td", "th"], recursive=False):
+            cells.append(clean_cell(cell.get_text(" ", strip=True)))
+            cells.extend([""] * (_colspan(cell) - 1))
+        if not any(cells):
+            continue
+        if header is None and tr.find("th", recursive=False) is not None:
+            header = cells
+            continue
+        rows.append(cells)
+    if header is None and rows:
+        header = rows.pop(0)
+    if header is not None:
+        header = header + [""] * (max((len(row) for row in rows), default=0) - len(header))
+    return header, rows
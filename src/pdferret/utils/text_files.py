@@ -0,0 +1,67 @@
+import io
+from typing import Iterable, List
+
+from charset_normalizer import from_bytes
+
+# encoding is detected from the beginning of the file only, the rest is streamed
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+
+def detect_encoding(file: str, sample_size=ENCODING_SAMPLE_SIZE) -> str:
+    with open(file, "rb") as f:
+        sample = f.read(sample_size)
+    if sample.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    try:
+        # the sample may end in the middle of a multibyte character
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3 and len(sample) == sample_size:
+            return "utf-8"
+    best = from_bytes(sample).best()
+    return best.encoding if best else "utf-8"
+
+
+def open_text(file: str, newline: str = None) -> io.TextIOWrapper:
+    """
+    Open text file for streaming with the detected encoding, undecodable bytes are replaced.
+    newline is passed to open, the csv module requires newline="".
+    """
+    return open(file, "r", encoding=detect_encoding(file), errors="replace", newline=newline)
+
+
+def split_long_text(text: str, max_len: int) -> List[str]:
+    # split at the last whitespace before max_len, or hard if there is none
+    parts = []
+    while len(text) > max_len:
+        cut = text.rfind(" ", 0, max_len)
+        cut = cut if cut > 0 else max_len
+        parts.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+def pack_paragraphs(paragraphs: Iterable[str], max_len: int) -> List[str]:
+    """
+    Join consecutive paragraphs into chunks not longer than max_len, paragraphs are never
+    split unless a single paragraph is longer than max_len.
+    """
+    chunks = []
+    current = ""
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_len:
+            chunks.append(current)
+            current = ""
+        if len(paragraph) > max_len:
+            *full, paragraph = split_long_text(paragraph, max_len)
+            chunks.extend(full)
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
@@ -1,4 +1,11 @@
+import math
 import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List
+
+from ..logging import logger
 
 
 def count_tokens_rough(text):
@@ -7,3 +14,208 @@ def count_tokens_rough(text):
     # Filter out any empty strings resulting from the split
     tokens = [token for token in tokens if token]
     return len(tokens)
+
+
+def _clean_cut(text: str, lookback: int = 200) -> str:
+    """Cut a truncated text after the last line break or whitespace, so no word is cut in half"""
+    tail = text[-lookback:]
+    for sep in ("\n", " "):
+        pos = tail.rfind(sep)
+        if pos > 0:
+            return text[: len(text) - len(tail) + pos].rstrip()
+    return text
+
+
+class Tokenizer(ABC):
+    """Counts tokens of a model family and truncates texts to a number of tokens"""
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Number of tokens of text"""
+
+    @abstractmethod
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Beginning of text with at most max_tokens tokens"""
+
+
+class RoughTokenizer(Tokenizer):
+    """
+    Estimate without a vocabulary: words and punctuation marks are tokens, long words and numbers
+    take another token per 6 characters, as they are split by BPE vocabularies.
+    """
+
+    name = "rough"
+    _pieces = re.compile(r"\w+|[^\w\s]")
+
+    @staticmethod
+    def _cost(piece: str) -> int:
+        return 1 + len(piece) // 6
+
+    def count(self, text: str) -> int:
+        return sum(self._cost(m.group()) for m in self._pieces.finditer(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = 0
+        for m in self._pieces.finditer(text):
+            tokens += self._cost(m.group())
+            if tokens > max_tokens:
+                return text[: m.start()].rstrip()
+        return text
+
+
+class TiktokenTokenizer(Tokenizer):
+    """
+    Tokenizer of tiktoken encoding. Tokenizers of other families which are not public (or too heavy to load)
+    are approximated by a similar encoding with scale, the ratio of their token count to the encoding's.
+    """
+
+    def __init__(self, encoding: str, scale: float = 1.0):
+        import tiktoken
+
+        self.encoding = tiktoken.get_encoding(encoding)
+        self.scale = scale
+        self.name = f"{encoding}x{scale}" if scale != 1.0 else encoding
+
+    def _encode(self, text: str) -> List[int]:
+        return self.encoding.encode(text, disallowed_special=())
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(self._encode(text)) * self.scale)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self._encode(text)
+        keep = int(max_tokens / self.scale)
+        if len(tokens) <= keep:
+            return text
+        return _clean_cut(self.encoding.decode(tokens[:keep]))
+
+
+# tokenizers by substrings of the model identifier, first match wins, then default_tokenizer.
+# Add entries (patterns, factory) to support other model families
+tokenizer_families: List[tuple[tuple[str, ...], Callable[[], Tokenizer]]] = [
+    (("gpt-4o", "gpt-4.1", "gpt-5", "o1-", "o3-", "o4-"), lambda: TiktokenTokenizer("o200k_base")),
+    (("gpt-4", "gpt-3.5"), lambda: TiktokenTokenizer("cl100k_base")),
+]
+
+
+def default_tokenizer() -> Tokenizer:
+    # Mistral, Llama, Claude, Gemini and others produce up to ~20% more tokens than cl100k, mostly for non-English text
+    return TiktokenTokenizer("cl100k_base", scale=1.2)
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str) -> Tokenizer:
+    """Tokenizer of the model family, loaded once. Falls back to RoughTokenizer if the vocabulary can't be loaded"""
+    name = (model_name or "").lower()
+    factory = next(
+        (factory for patterns, factory in tokenizer_families if any(p in name for p in patterns)), default_tokenizer
+    )
+    try:
+        return factory()
+    except Exception as e:
+        logger.warning(f"Failed to load tokenizer for {model_name}, estimating tokens roughly: {e}")
+        return RoughTokenizer()
+
+
+@dataclass
+class PromptPart:
+    name: str
+    texts: List[str]
+    share: float = None  # None for required parts
+    header: str = ""
+    separator: str = "\n"
+
+
+class TokenBudget:
+    """
+    Builds a prompt from parts which together stay within max_tokens.
+    Required parts (without share) are taken first, as far as they fit. The rest of the budget is divided
+    between the other parts by their shares, and what a part doesn't need goes to the parts which need more.
+    Every part is filled with its texts in order, the first text which doesn't fit is truncated at a word boundary.
+    The prompt keeps the order in which the parts were added.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, max_tokens: int, min_truncated_tokens: int = 20):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        # truncated texts shorter than this are dropped, they carry no information
+        self.min_truncated_tokens = min_truncated_tokens
+        self.parts = []
+        # tokens taken by every part in the last build
+        self.usage = {}
+
+    def add(self, name: str, texts: str | List[str], share: float = None, header: str = "", separator: str = "\n"):
+        """
+        Add a part of the prompt; share None means required, i.e. taken before any shared part.
+        Texts of a list are joined and followed by separator, a single text is taken as it is.
+        """
+        if isinstance(texts, str):
+            texts, separator = [texts], ""
+        texts = [t for t in texts if t]
+        if texts:
+            self.parts.append(PromptPart(name, texts, share, header, separator))
+        return self
+
+    def _allocate(self, demands: dict) -> dict:
+        budgets = {}
+        remaining = self.max_tokens
+        for part in self.parts:
+            if part.share is None:
+                budgets[part.name] = min(demands[part.name], remaining)
+                remaining -= budgets[part.name]
+        # water filling: parts needing less than their share are satisfied, the rest is divided again
+        active = [part for part in self.parts if part.share is not None]
+        while active:
+            total_share = sum(part.share for part in active) or 1.0
+            satisfied = [p for p in active if demands[p.name] <= remaining * p.share / total_share]
+            if not satisfied:
+                for part in active:
+                    budgets[part.name] = int(remaining * part.share / total_share)
+                break
+            for part in satisfied:
+                budgets[part.name] = demands[part.name]
+                remaining -= demands[part.name]
+                active.remove(part)
+        return budgets
+
+    def _overhead(self, part: PromptPart) -> tuple[int, int]:
+        header_tokens = self.tokenizer.count(part.header) if part.header else 0
+        sep_tokens = self.tokenizer.count(part.separator) if part.separator else 0
+        return header_tokens, sep_tokens
+
+    def _fill(self, part: PromptPart, budget: int) -> tuple[str, int]:
+        header_tokens, sep_tokens = self._overhead(part)
+        remaining = budget - header_tokens
+        taken = []
+        for text in part.texts:
+            tokens = self.tokenizer.count(text) + sep_tokens
+            if tokens <= remaining:
+                taken.append(text)
+                remaining -= tokens
+                continue
+            if remaining - sep_tokens >= self.min_truncated_tokens:
+                taken.append(self.tokenizer.truncate(text, remaining - sep_tokens))
+                remaining = 0
+            break
+        if not taken:
+            return "", 0
+        return part.header + part.separator.join(taken) + part.separator, budget - remaining
+
+    def _demand(self, part: PromptPart) -> int:
+        # counted per text like in _fill, so a part which gets its demand is taken fully
+        header_tokens, sep_tokens = self._overhead(part)
+        return header_tokens + sum(self.tokenizer.count(text) + sep_tokens for text in part.texts)
+
+    def build(self) -> str:
+        demands = {part.name: self._demand(part) for part in self.parts}
+        budgets = self._allocate(demands)
+        self.usage = {}
+        prompt = ""
+        for part in self.parts:
+            text, self.usage[part.name] = self._fill(part, budgets[part.name])
+            prompt += text
+        if sum(demands.values()) > self.max_tokens:
+            logger.debug(f"Prompt truncated to {self.max_tokens} tokens: used {self.usage}, needed {demands}")
+        return prompt
@@ -0,0 +1,104 @@
+import math
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops
+
+
+@dataclass
+class VisionTokenModel:
+    """
+    How a family of vision models turns an image into input tokens.
+    Images are first scaled down to fit max_side (and min_side for tiled models, as providers do), then:
+    - tiled: base_tokens + tile_tokens per tile of tile_size x tile_size pixels
+    - otherwise: one token per pixels_per_token pixels
+    """
+
+    name: str
+    max_side: int
+    min_side: int = None
+    tile_size: int = None
+    tile_tokens: int = 0
+    base_tokens: int = 0
+    pixels_per_token: int = None
+
+    def provider_size(self, width: int, height: int) -> tuple[int, int]:
+        """Size the provider scales the image to before tokenizing"""
+        scale = min(1.0, self.max_side / max(width, height))
+        if self.min_side:
+            scale = min(scale, self.min_side / min(width, height))
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def estimate_tokens(self, width: int, height: int) -> int:
+        width, height = self.provider_size(width, height)
+        if self.tile_size:
+            tiles = math.ceil(width / self.tile_size) * math.ceil(height / self.tile_size)
+            return self.base_tokens + self.tile_tokens * tiles
+        return self.base_tokens + math.ceil(width * height / self.pixels_per_token)
+
+    def fit_size(self, width: int, height: int, max_tokens: int) -> tuple[int, int]:
+        """Largest size with the aspect ratio of width x height, not above it, within max_tokens"""
+        width, height = self.provider_size(width, height)
+        lo, hi = 0.0, 1.0
+        if self.estimate_tokens(width, height) <= max_tokens:
+            return width, height
+        # token count is monotonic in scale, binary search is exact enough for tiles and pixels alike
+        for _ in range(20):
+            mid = (lo + hi) / 2
+            if self.estimate_tokens(max(1, int(width * mid)), max(1, int(height * mid))) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid
+        return max(1, int(width * lo)), max(1, int(height * lo))
+
+
+# matched by substring of the model identifier, first match wins
+vision_token_models = [
+    VisionTokenModel("openai", max_side=2048, min_side=768, tile_size=512, tile_tokens=170, base_tokens=85),
+    VisionTokenModel("claude", max_side=1568, pixels_per_token=750),
+    VisionTokenModel("gemini", max_side=3072, tile_size=768, tile_tokens=258),
+    VisionTokenModel("pixtral", max_side=1024, pixels_per_token=16 * 16),
+    # models with ViT patches of 14px merged 2x2 (Llama/Qwen vision and similar), also the default
+    VisionTokenModel("default", max_side=1536, pixels_per_token=28 * 28),
+]
+model_name_patterns = {
+    "openai": ("gpt-",),
+    "claude": ("claude",),
+    "gemini": ("gemini",),
+    "pixtral": ("pixtral", "mistral"),
+}
+
+
+def vision_token_model(model_name: str) -> VisionTokenModel:
+    model_name = (model_name or "").lower()
+    for token_model in vision_token_models:
+        if any(pattern in model_name for pattern in model_name_patterns.get(token_model.name, ())):
+            return token_model
+    return vision_token_models[-1]
+
+
+def trim_margins(image: Image.Image, threshold=20, padding=10) -> Image.Image:
+    """Crop uniform (usually white) margins, the background color is taken from the top left pixel"""
+    gray = image.convert("L")
+    background = Image.new("L", gray.size, gray.getpixel((0, 0)))
+    diff = ImageChops.difference(gray, background).point(lambda p: 255 if p > threshold else 0)
+    bbox = diff.getbbox()
+    if not bbox:
+        return image
+    left, top, right, bottom = bbox
+    box = (
+        max(0, left - padding),
+        max(0, top - padding),
+        min(image.width, right + padding),
+        min(image.height, bottom + padding),
+    )
+    return image.crop(box)
+
+
+def prepare_for_vision(image: Image.Image, token_model: VisionTokenModel, max_tokens: int, trim=True) -> Image.Image:
+    """Trim margins and scale down the image to stay within max_tokens of the vision model"""
+    if trim:
+        image = trim_margins(image)
+    width, height = token_model.fit_size(image.width, image.height, max_tokens)
+    if (width, height) != image.size:
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    return image
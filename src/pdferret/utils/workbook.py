@@ -0,0 +1,264 @@
+import csv
+import datetime
+import os
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+import openpyxl
+import xlrd
+
+from .text_files import open_text
+
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+ODS_TABLE_NS = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}"
+ODS_OFFICE_NS = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}"
+ODS_TEXT_NS = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+number_regex = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+
+
+class WorkbookReader(ABC):
+    """
+    Read-only streaming access to a workbook: sheet names, dimensions and windows of rows.
+    Implementations never build the whole cell model in memory, at most one sheet is loaded at a time.
+    """
+
+    def __init__(self, file: str):
+        self.file = file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def sheet_names(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def dimensions(self, sheet: str) -> Tuple[Optional[int], Optional[int]]:
+        """Number of rows and columns of the sheet, None if unknown without reading the whole sheet"""
+        pass
+
+    @abstractmethod
+    def _iter_rows(self, sheet: str) -> Iterator[tuple]:
+        pass
+
+    def iter_rows(self, sheet: str, start: int = 0, stop: int = None) -> Iterator[tuple]:
+        """Stream rows of the sheet as tuples of cell values, optionally only rows start:stop (0-based)"""
+        return islice(self._iter_rows(sheet), start, stop)
+
+
+class XLSXReader(WorkbookReader):
+    def __init__(self, file: str):
+        super().__init__(file)
+        self._wb = None
+
+    def sheet_names(self) -> List[str]:
+        # read directly from workbook.xml in the zip, without loading openpyxl workbook
+        with zipfile.ZipFile(self.file) as zipf:
+            workbook_path = "xl/workbook.xml"
+            if "_rels/.rels" in zipf.namelist():
+                rels = ET.fromstring(zipf.read("_rels/.rels"))
+                for rel in rels.iter(f"{REL_NS}Relationship"):
+                    if rel.get("Type", "").endswith("/officeDocument"):
+                        workbook_path = posixpath.normpath(rel.get("Target").lstrip("/"))
+            workbook = ET.fromstring(zipf.read(workbook_path))
+        return [sheet.get("name") for sheet in workbook.iter(f"{XLSX_NS}sheet")]
+
+    @property
+    def workbook(self):
+        if self._wb is None:
+            self._wb = openpyxl.load_workbook(self.file, read_only=True, data_only=True)
+        return self._wb
+
+    def dimensions(self, sheet: str) -> Tuple[Optional[int], Optional[int]]:
+        # in read-only mode these come from the <dimension> element of the sheet
+        ws = self.workbook[sheet]
+        return ws.max_row, ws.max_column
+
+    def _iter_rows(self, sheet: str) -> Iterator[tuple]:
+        yield from self.workbook[sheet].iter_rows(values_only=True)
+
+    def close(self):
+        if self._wb is not None:
+            self._wb.close()
+            self._wb = None
+
+
+class XLSReader(WorkbookReader):
+    def __init__(self, file: str):
+        super().__init__(file)
+        # on_demand loads only the workbook globals, sheets are loaded one by one when requested
+        self._wb = xlrd.open_workbook(file, on_demand=True)
+
+    def sheet_names(self) -> List[str]:
+        return self._wb.sheet_names()
+
+    def dimensions(self, sheet: str) -> Tuple[Optional[int], Optional[int]]:
+        ws = self._wb.sheet_by_name(sheet)
+        return ws.nrows, ws.ncols
+
+    def _cell_value(self, cell):
+        if cell.ctype == xlrd.XL_CELL_EMPTY:
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                return xlrd.xldate_as_datetime(cell.value, self._wb.datemode)
+            except (ValueError, OverflowError):
+                return cell.value
+        if cell.ctype == xlrd.XL_CELL_ERROR:
+            return None
+        return cell.value
+
+    def _iter_rows(self, sheet: str) -> Iterator[tuple]:
+        ws = self._wb.sheet_by_name(sheet)
+        try:
+            for idx in range(ws.nrows):
+                yield tuple(self._cell_value(cell) for cell in ws.row(idx))
+        finally:
+            self._wb.unload_sheet(sheet)
+
+    def close(self):
+        self._wb.release_resources()
+
+
+class ODSReader(WorkbookReader):
+    """
+    Streams content.xml of the ODS file with iterparse, clearing processed rows.
+    Repeated empty rows (e.g. formatting down to the end of the sheet) are collapsed into a single row.
+    """
+
+    max_repeated_cells = 1000
+
+    def _iter_tables(self):
+        with zipfile.ZipFile(self.file) as zipf, zipf.open("content.xml") as content:
+            for event, elem in ET.iterparse(content, events=("start", "end")):
+                if elem.tag == f"{ODS_TABLE_NS}table" and event == "start":
+                    yield elem.get(f"{ODS_TABLE_NS}name"), event, elem
+                elif elem.tag in (f"{ODS_TABLE_NS}table-row", f"{ODS_TABLE_NS}table"):
+                    yield None, event, elem
+
+    def sheet_names(self) -> List[str]:
+        names = []
+        for name, event, elem in self._iter_tables():
+            if name is not None:
+                names.append(name)
+            elif event == "end":
+                elem.clear()
+        return names
+
+    def dimensions(self, sheet: str) -> Tuple[Optional[int], Optional[int]]:
+        nrows, ncols = 0, 0
+        for row in self._iter_rows(sheet):
+            nrows += 1
+            ncols = max(ncols, len(row))
+        return nrows, ncols
+
+    def _cell_value(self, cell):
+        value_type = cell.get(f"{ODS_OFFICE_NS}value-type")
+        if value_type in ("float", "percentage", "currency"):
+            return float(cell.get(f"{ODS_OFFICE_NS}value"))
+        if value_type == "date":
+            value = cell.get(f"{ODS_OFFICE_NS}date-value")
+            try:
+                return datetime.datetime.fromisoformat(value)
+            except ValueError:
+                return value
+        if value_type == "boolean":
+            return cell.get(f"{ODS_OFFICE_NS}boolean-value") == "true"
+        text = "\n".join("".join(p.itertext()) for p in cell.iter(f"{ODS_TEXT_NS}p"))
+        return text or None
+
+    def _parse_row(self, row_elem) -> tuple:
+        values = []
+        for cell in row_elem:
+            if cell.tag not in (f"{ODS_TABLE_NS}table-cell", f"{ODS_TABLE_NS}covered-table-cell"):
+                continue
+            repeat = min(int(cell.get(f"{ODS_TABLE_NS}number-columns-repeated", 1)), self.max_repeated_cells)
+            values.extend([self._cell_value(cell)] * repeat)
+        # drop trailing empty cells
+        while values and values[-1] is None:
+            values.pop()
+        return tuple(values)
+
+    def _iter_rows(self, sheet: str) -> Iterator[tuple]:
+        in_sheet = False
+        for name, event, elem in self._iter_tables():
+            if name is not None:
+                in_sheet = name == sheet
+                continue
+            if event != "end":
+                continue
+            if elem.tag == f"{ODS_TABLE_NS}table":
+                if in_sheet:
+                    return
+                elem.clear()
+                continue
+            if in_sheet:
+                row = self._parse_row(elem)
+                repeat = int(elem.get(f"{ODS_TABLE_NS}number-rows-repeated", 1))
+                for _ in range(repeat if row else 1):
+                    yield row
+            elem.clear()
+
+
+class CSVReader(WorkbookReader):
+    """
+    Streams a csv (or tsv) file as a workbook with a single sheet named after the file.
+    The dialect is sniffed from the beginning of the file, numbers are converted to int or float.
+    """
+
+    def sheet_names(self) -> List[str]:
+        return [os.path.splitext(os.path.basename(self.file))[0]]
+
+    def dimensions(self, sheet: str) -> Tuple[Optional[int], Optional[int]]:
+        return None, None
+
+    @staticmethod
+    def _cell_value(value: str):
+        if not value:
+            return None
+        # leading zeros (ids, zip codes) are kept as text
+        digits = value.lstrip("+-")
+        if not number_regex.match(value) or (len(digits) > 1 and digits[0] == "0" and digits[1] != "."):
+            return value
+        return float(value) if any(c in value for c in ".eE") else int(value)
+
+    def _iter_rows(self, sheet: str) -> Iterator[tuple]:
+        # quoted fields may contain line breaks, which csv only reads correctly without newline translation
+        with open_text(self.file, newline="") as f:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            except csv.Error:
+                dialect = csv.excel_tab if self.file.lower().endswith(".tsv") else csv.excel
+            for row in csv.reader(f, dialect):
+                yield tuple(self._cell_value(value.strip()) for value in row)
+
+
+readers = {
+    "xlsx": XLSXReader,
+    "xlsm": XLSXReader,
+    "xls": XLSReader,
+    "ods": ODSReader,
+    "csv": CSVReader,
+    "tsv": CSVReader,
+}
+
+
+def open_workbook(file: str) -> WorkbookReader:
+    ext = os.path.splitext(file)[1][1:].lower()
+    if ext not in readers:
+        raise ValueError(f"Unsupported workbook format: {ext}")
+    return readers[ext](file)
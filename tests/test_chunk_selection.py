@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils.chunk_selection import select_chunks, tfidf_matrix  # noqa: E402
+
+front_matter = [
+    "Annual Report 2023 of the Solar Energy Cooperative",
+    "Contents 1 Introduction 3 2 Solar parks 5 3 Finances 9 4 Outlook 12",
+    "Imprint: Published by the board. Printed on recycled paper. All rights reserved.",
+]
+content = [
+    "The cooperative operated 12 solar parks in 2023 with a total capacity of 48 megawatts. "
+    "The solar parks produced 52 gigawatt hours, enough for 15000 households. " * 2,
+    "Two new solar parks were connected to the grid in spring. The capacity of the solar parks "
+    "grew by 8 megawatts, the production of the new parks exceeded the forecast. " * 2,
+    "Revenue from the solar parks rose to 6.1 million euros, the cooperative paid a dividend "
+    "of 3 percent to its members. Financing of new parks is secured by member loans. " * 2,
+    "The solar parks produced 52 gigawatt hours, enough for 15000 households. "
+    "The cooperative operated 12 solar parks in 2023 with a total capacity of 48 megawatts. " * 2,
+]
+
+
+def test_tfidf_rows_are_normalized():
+    vectors = tfidf_matrix(front_matter + content)
+    norms = (vectors**2).sum(axis=1)
+    assert vectors.shape[0] == 7
+    assert all(abs(n - 1) < 1e-5 or n == 0 for n in norms)
+
+
+def test_selects_representative_chunks_in_order():
+    texts = front_matter + content
+    selected = select_chunks(texts, max_chunks=3)
+    # the title is kept, front matter is skipped, the near-duplicate of the first content chunk is avoided
+    assert selected[0] == 0
+    assert not {1, 2} & set(selected)
+    assert selected == sorted(selected) and len(selected) == 3
+    assert not {3, 6} <= set(selected)
+
+
+def test_token_budget_and_short_documents():
+    texts = front_matter + content
+    assert select_chunks(texts[:3], max_chunks=5) == [0, 1, 2]
+    selected = select_chunks(texts, max_chunks=5, max_tokens=60, count_tokens=lambda t: len(t.split()))
+    assert sum(len(texts[i].split()) for i in selected) <= 60
+
+
+def test_selection_is_fast():
+    texts = [f"Section {i}: " + " ".join(f"term{(i * 7 + j) % 500} word{j}" for j in range(150)) for i in range(500)]
+    start = time.perf_counter()
+    select_chunks(texts, max_chunks=5)
+    assert time.perf_counter() - start < 0.5
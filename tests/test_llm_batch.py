@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.llm.batch import (  # noqa: E402
+    BatchJobStore,
+    BatchRequest,
+    FakeBatchProvider,
+    OpenAIBatchProvider,
+    run_batch,
+)
+
+
+def respond(request: BatchRequest) -> str:
+    if request.user_prompt == "fail":
+        raise ValueError("request failed")
+    return json.dumps({"description": request.user_prompt.upper()})
+
+
+def test_run_batch_returns_responses_by_id(tmp_path):
+    provider = FakeBatchProvider(respond, polls_to_complete=3)
+    requests = [BatchRequest("0-table-1", "first"), BatchRequest("1-table-0", "fail"), BatchRequest("2", "second")]
+    results = run_batch(provider, requests, BatchJobStore(str(tmp_path)), poll_interval=0.01, timeout=5)
+    assert results == {"0-table-1": '{"description": "FIRST"}', "2": '{"description": "SECOND"}'}
+    # the completed job is not kept
+    assert os.listdir(tmp_path) == []
+
+
+def test_pending_job_is_resumed_after_timeout(tmp_path):
+    provider = FakeBatchProvider(respond, polls_to_complete=5)
+    store = BatchJobStore(str(tmp_path))
+    requests = [BatchRequest("0", "text")]
+    with pytest.raises(TimeoutError):
+        run_batch(provider, requests, store, poll_interval=0.01, timeout=0)
+    assert len(os.listdir(tmp_path)) == 1
+    # the same requests don't start a new job
+    results = run_batch(provider, requests, store, poll_interval=0.01, timeout=5)
+    assert results == {"0": '{"description": "TEXT"}'}
+    assert list(provider.jobs) == ["fake-0"]
+
+
+def test_openai_request_line():
+    provider = OpenAIBatchProvider("gpt-4o-mini", api_key="key")
+    line = json.loads(provider._line(BatchRequest("0-combined", "content", "system", max_tokens=1500)))
+    assert line["custom_id"] == "0-combined" and line["url"] == "/v1/chat/completions"
+    assert line["body"]["messages"][0] == {"role": "system", "content": "system"}
+    assert line["body"]["response_format"] == {"type": "json_object"}
+    assert line["body"]["max_tokens"] == 1500
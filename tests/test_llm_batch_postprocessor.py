@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.datamodels import ChunkType, FileFeatures, MetaInfo, PDFChunk, PDFDoc  # noqa: E402
+from pdferret.llm.batch import BatchRequest, FakeBatchProvider  # noqa: E402
+from pdferret.postprocessing.llm_batch_postprocessor import LLMBatchPostprocessor  # noqa: E402
+
+model = SimpleNamespace(config=SimpleNamespace(identifier="gpt-4o-mini", max_input_tokens=8000))
+
+
+def respond(request: BatchRequest) -> str:
+    if "broken.pdf" in request.user_prompt:
+        raise ValueError("request failed")
+    if "table" in request.custom_id:
+        return json.dumps({"description": "Revenue by quarter"})
+    if "invalid.pdf" in request.user_prompt:
+        return "Sorry, I can't summarize this document."
+    # repairable: fenced json with a trailing comment
+    response = {
+        "title": "Annual report",
+        "people": ["Ann Smith"],
+        "search_description": "Annual report of the company",
+        "content_summary": "Revenue grew.",
+    }
+    return f"```json\n{json.dumps(response)}\n```\nDone."
+
+
+def make_doc(filename: str) -> PDFDoc:
+    chunks = [
+        PDFChunk(text="The annual report describes revenue and hiring of the company in detail. " * 5),
+        PDFChunk(non_embeddable_content="<table><tr><td>Q1</td><td>10</td></tr></table>", chunk_type=ChunkType.TABLE),
+    ]
+    return PDFDoc(metainfo=MetaInfo(file_features=FileFeatures(filename=filename)), chunks=chunks)
+
+
+def test_batch_results_are_written_to_documents(tmp_path):
+    processor = LLMBatchPostprocessor(
+        batch_provider=FakeBatchProvider(respond),
+        llm_model=model,
+        llm_table_description=True,
+        poll_interval=0.01,
+        timeout=5,
+    )
+    docs = {name: make_doc(name) for name in ["report.pdf", "broken.pdf", "invalid.pdf"]}
+    results, errors = processor.process_batch(docs)
+    assert not errors and list(results) == ["report.pdf", "broken.pdf", "invalid.pdf"]
+    report = results["report.pdf"]
+    assert report.metainfo.title == "Annual report" and report.metainfo.authors == ["Ann Smith"]
+    assert report.metainfo.abstract == "Revenue grew."
+    assert report.metainfo.search_description == "Annual report of the company"
+    assert report.chunks[1].text == "Revenue by quarter"
+    # failed and unrepairable responses leave their documents without LLM enrichment
+    for name in ["broken.pdf", "invalid.pdf"]:
+        assert not results[name].metainfo.title and not results[name].metainfo.abstract
+        assert results[name].chunks[1].text == "Revenue by quarter"
+    assert processor.process_single(report) is report
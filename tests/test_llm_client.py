@@ -0,0 +1,51 @@
+import os
+import sys
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.llm.client import LLMClient  # noqa: E402
+
+
+class Answer(BaseModel):
+    text: str
+
+
+class FakeModel:
+    config = SimpleNamespace(identifier="fake-model", max_input_tokens=1000)
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_structured_response(self, data_model, user_prompt, system_prompt, temperature, max_tokens):
+        self.calls += 1
+        return data_model(text=user_prompt.upper()), "{}"
+
+    def generate_prompt_response(self, user_prompt, image, temperature, max_tokens):
+        self.calls += 1
+        return SimpleNamespace(conversation=[SimpleNamespace(content=f"{user_prompt} {len(image)}")])
+
+
+def test_structured_response_is_cached(tmp_path):
+    model = FakeModel()
+    client = LLMClient(model, cache_path=str(tmp_path / "llm.sqlite"))
+    assert client.structured(Answer, "hello", "system").text == "HELLO"
+    assert client.structured(Answer, "hello", "system").text == "HELLO"
+    assert model.calls == 1
+    # different parameters are a different request
+    client.structured(Answer, "hello", "system", temperature=0.5)
+    assert model.calls == 2
+    assert client.cache_stats()["hits"] == 1
+
+
+def test_prompt_with_image_and_opt_out(tmp_path):
+    model = FakeModel()
+    client = LLMClient(model, cache_path=str(tmp_path / "llm.sqlite"))
+    assert client.submit("prompt", "describe", image=b"abc").result() == "describe 3"
+    assert client.prompt("describe", image=b"abc") == "describe 3"
+    client.prompt("describe", image=b"abd")
+    assert model.calls == 2
+    uncached = LLMClient(model, cache_path=None)
+    uncached.prompt("describe", image=b"abc")
+    assert model.calls == 3
@@ -0,0 +1,41 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.datamodels import FileFeatures, MetaInfo, PDFChunk, PDFDoc  # noqa: E402
+from pdferret.llm.size_routing import SizeRouting  # noqa: E402
+from pdferret.postprocessing.llm_postprocessor import LLMCombinedResponse, LLMPostprocessor  # noqa: E402
+from pdferret.utils.tokens import get_tokenizer  # noqa: E402
+
+
+def fake_model(identifier, max_input_tokens):
+    return SimpleNamespace(config=SimpleNamespace(identifier=identifier, max_input_tokens=max_input_tokens))
+
+
+class RecordingClient:
+    def __init__(self):
+        self.prompts = []
+
+    def structured(self, data_model, user_prompt, **kwargs):
+        self.prompts.append(user_prompt)
+        return LLMCombinedResponse(title="Report", content_summary="Summary")
+
+
+def test_prompt_is_budgeted_for_small_model():
+    large, small = fake_model("gpt-4o", 100000), fake_model("gpt-4o-mini", 1500)
+    processor = LLMPostprocessor(
+        llm_model=large,
+        small_llm_model=small,
+        size_routing=SizeRouting(small_model_max_tokens=20000),
+        llm_single_call=True,
+        llm_cache=False,
+    )
+    processor.llm, processor.small_llm = RecordingClient(), RecordingClient()
+    chunks = [PDFChunk(text=f"Paragraph {idx} of the report about revenue and hiring. " * 40) for idx in range(5)]
+    doc = PDFDoc(metainfo=MetaInfo(file_features=FileFeatures(filename="report.pdf")), chunks=chunks)
+    processor.process_single(doc)
+    assert not processor.llm.prompts
+    (prompt,) = processor.small_llm.prompts
+    assert get_tokenizer("gpt-4o-mini").count(prompt) <= 1500
+    assert doc.metainfo.title == "Report"
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+from typing import List
+
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.llm.client import LLMClient  # noqa: E402
+from pdferret.llm.repair import extract_json_object, repair_stats, repair_structured  # noqa: E402
+
+
+class MetaInfo(BaseModel):
+    title: str
+    document_type: str = ""
+    people: List[str] = []
+
+
+def test_repair_fenced_and_trailing_text():
+    raw = 'Sure, here it is:\n```json\n{"title": "A {braced} title", "people": ["Ann", "Bob"],}\n```\nHope it helps!'
+    parsed = repair_structured(raw, MetaInfo)
+    assert parsed.title == "A {braced} title"
+    assert parsed.people == ["Ann", "Bob"]
+
+
+def test_repair_coerces_types_and_missing_fields():
+    raw = "{'Title': ['Annual', 'report'], 'people': 'Ann, Bob and Carl', 'document_type': None}"
+    parsed = repair_structured(raw, MetaInfo)
+    assert parsed.title == "Annual, report"
+    assert parsed.people == ["Ann", "Bob", "Carl"]
+    assert parsed.document_type == ""
+    assert repair_structured('{"document_type": "letter"}', MetaInfo).title == ""
+
+
+def test_unrepairable():
+    assert repair_structured("I can't help with that.", MetaInfo) is None
+    assert repair_structured('{"title": "truncated', MetaInfo) is None
+    assert extract_json_object('{"a": "}"} {"b": 1}') == '{"a": "}"}'
+
+
+class FakeModel:
+    config = SimpleNamespace(identifier="fake-model", max_input_tokens=1000)
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.temperatures = []
+
+    def generate_structured_response(self, data_model, user_prompt, system_prompt, temperature, max_tokens):
+        self.temperatures.append(temperature)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return None, SimpleNamespace(conversation=[SimpleNamespace(content=response)])
+
+
+def test_client_repairs_before_asking_again():
+    model = FakeModel(['```json\n{"title": "Report"}\n```'])
+    parsed = LLMClient(model, cache_path=None).structured(MetaInfo, "prompt")
+    assert parsed.title == "Report"
+    assert len(model.temperatures) == 1
+    assert repair_stats()["repaired"] >= 1
+
+
+def test_client_repairs_response_of_parse_error():
+    try:
+        MetaInfo.model_validate_json('{"Title": "Report", "people": "Ann and Bob"}')
+    except ValueError as e:
+        validation_error = e
+    model = FakeModel([validation_error, json.JSONDecodeError("Extra data", '{"title": "Memo"} Done.', 17)])
+    client = LLMClient(model, cache_path=None)
+    parsed = client.structured(MetaInfo, "prompt")
+    assert parsed.title == "Report" and parsed.people == ["Ann", "Bob"]
+    assert client.structured(MetaInfo, "other prompt").title == "Memo"
+    # both repaired without asking the model again
+    assert len(model.temperatures) == 2
+
+
+def test_client_asks_again_as_last_resort():
+    model = FakeModel([json.JSONDecodeError("Expecting value", "x", 0), '{"title": "Report"}'])
+    parsed = LLMClient(model, cache_path=None).structured(MetaInfo, "prompt", temperature=0.5)
+    assert parsed.title == "Report"
+    assert model.temperatures == [0.5, 0.0]
+
+    model = FakeModel(["no json here", "still none"])
+    assert LLMClient(model, cache_path=None).structured(MetaInfo, "prompt") is None
+    assert repair_stats()["failed"] >= 1
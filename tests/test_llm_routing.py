@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.llm.client import LLMClient  # noqa: E402
+from pdferret.llm.health import ModelHealth  # noqa: E402
+from pdferret.llm.routing import RoutedLLMClient, llm_client  # noqa: E402
+from pdferret.llm.scheduler import LLMScheduler  # noqa: E402
+
+
+class Answer(BaseModel):
+    text: str
+
+
+class FakeModel:
+    def __init__(self, identifier, delay=0.0, fail=False):
+        self.config = SimpleNamespace(identifier=identifier, max_input_tokens=1000)
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def generate_structured_response(self, data_model, user_prompt, system_prompt, temperature, max_tokens):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("provider unavailable")
+        return data_model(text=self.config.identifier), "{}"
+
+
+def test_fails_over_on_error():
+    primary, fallback = FakeModel("failing-primary", fail=True), FakeModel("fallback-after-error")
+    client = RoutedLLMClient([primary, fallback], cache_path=None)
+    assert client.structured(Answer, "hello").text == "fallback-after-error"
+    assert primary.calls == 1 and fallback.calls == 1
+    # a single failure is too few outcomes to demote the primary
+    assert client.clients[0].health.error_rate == 0.0
+
+
+def test_primary_gets_traffic_again_after_failure():
+    primary, fallback = FakeModel("recovering-primary", fail=True), FakeModel("fallback-while-recovering")
+    client = RoutedLLMClient([primary, fallback], cache_path=None)
+    assert client.structured(Answer, "first").text == "fallback-while-recovering"
+    primary.fail = False
+    for idx in range(5):
+        assert client.structured(Answer, f"request {idx}").text == "recovering-primary"
+    assert primary.calls == 6 and fallback.calls == 1
+
+
+def test_slow_primary_is_hedged():
+    primary, fallback = FakeModel("slow-primary", delay=1.0), FakeModel("fast-fallback", delay=0.01)
+    client = RoutedLLMClient([primary, fallback], cache_path=None, default_hedge_delay=0.1, min_hedge_delay=0.05)
+    start = time.monotonic()
+    assert client.structured(Answer, "hello").text == "fast-fallback"
+    assert time.monotonic() - start < 0.5
+
+
+def test_request_waiting_for_limits_is_not_hedged():
+    primary, fallback = FakeModel("queued-primary", delay=0.01), FakeModel("not-hedged-fallback")
+    client = RoutedLLMClient([primary, fallback], cache_path=None, default_hedge_delay=0.1, min_hedge_delay=0.05)
+    scheduler = LLMScheduler(name="queued-primary", max_concurrency=1, state_path=None)
+    client.clients[0].scheduler = scheduler
+    # another request holds the only slot of the primary longer than its hedge delay
+    busy = scheduler.submit(time.sleep, 0.5)
+    time.sleep(0.05)
+    assert client.structured(Answer, "hello").text == "queued-primary"
+    assert fallback.calls == 0
+    busy.result()
+
+
+def test_fast_primary_is_not_hedged_and_errors_propagate():
+    primary, fallback = FakeModel("fast-primary"), FakeModel("unused-fallback")
+    client = RoutedLLMClient([primary, fallback], cache_path=None, default_hedge_delay=1.0)
+    assert client.submit("structured", Answer, "hello").result().text == "fast-primary"
+    assert fallback.calls == 0
+
+    failing = RoutedLLMClient([FakeModel("fails-a", fail=True), FakeModel("fails-b", fail=True)], cache_path=None)
+    with pytest.raises(ConnectionError):
+        failing.structured(Answer, "hello")
+
+
+def test_unhealthy_model_goes_last_until_cooldown():
+    primary, fallback = FakeModel("unhealthy-primary"), FakeModel("healthy-fallback")
+    client = RoutedLLMClient([primary, fallback], cache_path=None, error_cooldown=0.2)
+    for _ in range(client.clients[0].health.min_samples):
+        client.clients[0].health.record(1.0, ok=False)
+    assert client.structured(Answer, "hello").text == "healthy-fallback"
+    assert primary.calls == 0
+    # after the cooldown the primary is tried again
+    time.sleep(0.25)
+    assert client.structured(Answer, "hello again").text == "unhealthy-primary"
+
+
+def test_health_percentiles_and_client_factory():
+    health = ModelHealth(min_samples=5)
+    assert health.latency_percentile(95) is None
+    for latency in range(1, 11):
+        health.record(float(latency), ok=True)
+    assert 9 <= health.latency_percentile(95) <= 10
+    assert isinstance(llm_client(FakeModel("single"), cache_path=None), LLMClient)
+    assert isinstance(llm_client([FakeModel("a"), FakeModel("b")], cache_path=None), RoutedLLMClient)
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.llm import scheduler as scheduler_module  # noqa: E402
+from pdferret.llm.scheduler import LLMScheduler, get_limit_state, is_rate_limit_error  # noqa: E402
+
+
+def test_scheduler_limits_concurrency_and_keeps_order():
+    scheduler = LLMScheduler(max_concurrency=2)
+    in_flight, max_in_flight = 0, 0
+    lock = threading.Lock()
+
+    def request(idx):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        return idx
+
+    futures = [scheduler.submit(request, idx) for idx in range(6)]
+    assert [f.result() for f in futures] == list(range(6))
+    assert max_in_flight == 2
+
+
+def test_scheduler_rate_limit():
+    scheduler = LLMScheduler(max_concurrency=10, requests_per_minute=600)
+    start = time.monotonic()
+    futures = [scheduler.submit(time.monotonic) for _ in range(4)]
+    started = sorted(f.result() for f in futures)
+    # requests are spaced by 0.1 s
+    assert started[-1] - start >= 0.3
+
+
+def test_scheduler_token_budget_allows_burst_then_spaces():
+    scheduler = LLMScheduler(name="tokens", tokens_per_minute=6000, state_path="")
+    start = time.monotonic()
+    # a minute of tokens goes at once, the next 100 tokens wait for the budget to refill for 1 s
+    with scheduler.slot(tokens=6000):
+        pass
+    assert time.monotonic() - start < 0.5
+    with scheduler.slot(tokens=100):
+        pass
+    assert time.monotonic() - start >= 0.9
+
+
+def test_rate_limit_is_shared_through_state_file(tmp_path):
+    state = str(tmp_path / "limits.sqlite")
+    first = LLMScheduler(name="shared", requests_per_minute=600, state_path=state)
+    # another process would have its own scheduler on the same file
+    second = LLMScheduler(name="shared", requests_per_minute=600, state_path=state)
+    start = time.monotonic()
+    for scheduler in (first, second, first, second):
+        with scheduler.slot():
+            pass
+    assert time.monotonic() - start >= 0.3
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_no_write_transactions_without_rate_limits(tmp_path, monkeypatch):
+    state = get_limit_state(str(tmp_path / "limits.sqlite"))
+    scheduler = LLMScheduler(name="unlimited", requests_per_minute=0, tokens_per_minute=0, state_path=state.path)
+
+    def no_transaction():
+        raise AssertionError("write transaction without a limit")
+
+    monkeypatch.setattr(state, "_transaction", no_transaction)
+    for _ in range(3):
+        with scheduler.slot(tokens=100):
+            pass
+    monkeypatch.undo()
+    # the pause after a rate limit error is still respected
+    scheduler.backoff(0, None)
+    start = time.time()
+    assert state.reserve(scheduler._limits(0), start) > start
+
+
+def test_rate_limit_errors_are_retried(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler_module, "BACKOFF_BASE", 0.01)
+    scheduler = LLMScheduler(name="retry", max_retries=3, state_path=str(tmp_path / "limits.sqlite"))
+    attempts = []
+
+    def request():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RateLimitError("Too many requests")
+        return "ok"
+
+    assert scheduler.submit(request).result() == "ok"
+    assert len(attempts) == 3
+
+    def failing():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.call(failing)
+    assert is_rate_limit_error(RateLimitError()) and not is_rate_limit_error(ValueError("bad request"))
+
+
+def test_rate_limit_error_messages():
+    assert is_rate_limit_error(RuntimeError("Error code: 429 - {'error': {'message': 'slow down'}}"))
+    assert is_rate_limit_error(RuntimeError("HTTP 429"))
+    assert is_rate_limit_error(RuntimeError("Rate limit reached for requests"))
+    assert is_rate_limit_error(RuntimeError("rate_limit_exceeded"))
+    assert not is_rate_limit_error(RuntimeError("request id 84291 failed"))
+    assert not is_rate_limit_error(RuntimeError("connection to localhost:4290 refused after reading 429 bytes"))
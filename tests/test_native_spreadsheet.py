@@ -0,0 +1,59 @@
+import os
+import sys
+
+import openpyxl
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.datamodels import FileFeatures, MetaInfo, PDFDoc  # noqa: E402
+from pdferret.text_extrators.native_spreadsheet import NativeSpreadsheetExtractor  # noqa: E402
+from pdferret.utils.sheet_profile import format_sheet_profiles  # noqa: E402
+
+
+@pytest.fixture
+def sample_xlsx_doc(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append([None, None, None])
+    ws.append(["name", None, "value"])
+    for i in range(100):
+        ws.append([f"row{i}", None, i])
+        ws.append([None, None, None])
+    path = str(tmp_path / "test.xlsx")
+    wb.save(path)
+    return PDFDoc(metainfo=MetaInfo(file_features=FileFeatures(file=path)))
+
+
+def test_extract_sheet(sample_xlsx_doc):
+    extractor = NativeSpreadsheetExtractor(head_rows=20, tail_rows=5, max_chunk_len=200)
+    doc = extractor.process_single(sample_xlsx_doc)
+    assert doc.metainfo.extra_metainfo["sheet names"] == ["Data"]
+    assert len(doc.chunks) > 1
+    for chunk in doc.chunks:
+        assert chunk.text.startswith("Sheet: Data")
+        # empty column is dropped, header is repeated
+        assert "| name | value |" in chunk.text
+    text = "\n".join(chunk.text for chunk in doc.chunks)
+    assert "| row19 | 19 |" in text
+    assert "| row20 | 20 |" not in text
+    assert "| row99 | 99 |" in text
+    assert "75 rows omitted" in text
+
+
+def test_profile_sheet(sample_xlsx_doc):
+    extractor = NativeSpreadsheetExtractor(head_rows=20, tail_rows=5)
+    doc = extractor.process_single(sample_xlsx_doc)
+    (profile,) = doc.metainfo.extra_metainfo["sheet_profiles"]
+    assert profile["sheet"] == "Data"
+    assert profile["rows"] == 100
+    name, value = profile["columns"]
+    assert name["type"] == "text" and name["distinct"] == 100
+    assert value["type"] == "number" and (value["min"], value["max"]) == (0, 99)
+
+
+def test_format_caps_sheets():
+    profiles = [{"sheet": f"Sheet{i}", "rows": 1, "columns": []} for i in range(12)]
+    text = format_sheet_profiles(profiles, max_sheets=10)
+    assert "Sheet 'Sheet9'" in text and "Sheet 'Sheet10'" not in text
+    assert text.endswith("... 2 more sheets: Sheet10, Sheet11")
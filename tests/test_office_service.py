@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.converters import office_service  # noqa: E402
+
+
+def test_interpreter_of_console_script(tmp_path):
+    script = tmp_path / "unoserver"
+    script.write_text("#!/usr/bin/env python3\nfrom unoserver.server import main\n")
+    assert office_service._interpreter(["unoserver"], str(script)) == ["/usr/bin/env", "python3"]
+    script.write_text("#!/bin/bash\nexec something\n")
+    assert office_service._interpreter(["unoserver"], str(script)) is None
+    assert office_service._interpreter(["python3", "-m", "unoserver.server"], "/usr/bin/python3") == [
+        "/usr/bin/python3"
+    ]
+
+
+def test_start_failure_disables_service(monkeypatch):
+    monkeypatch.setattr(office_service, "_probe_unoserver", lambda: True)
+    monkeypatch.setattr(office_service, "_start_failed", False)
+    assert office_service.office_service_available()
+    office_service.mark_office_service_failed()
+    assert not office_service.office_service_available()
@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils.disk_cache import DiskCache  # noqa: E402
+from pdferret.utils.image_hash import (  # noqa: E402
+    content_hash,
+    dhash,
+    group_near_duplicates,
+    hamming,
+    page_representatives,
+)
+
+
+def make_page(text: str, size=(600, 800), quality=90) -> bytes:
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], size[1] // 6), fill="navy")
+    draw.text((50, size[1] // 2), text, fill="black")
+    buff = io.BytesIO()
+    image.save(buff, "JPEG", quality=quality)
+    return buff.getvalue()
+
+
+def test_dhash_near_duplicates():
+    template = dhash(make_page("Section 1"))
+    # same slide rendered at different resolution and compression
+    assert hamming(template, dhash(make_page("Section 1", size=(300, 400), quality=40))) <= 4
+    different = Image.new("RGB", (600, 800), "white")
+    ImageDraw.Draw(different).ellipse((100, 100, 500, 700), fill="red")
+    buff = io.BytesIO()
+    different.save(buff, "JPEG")
+    assert hamming(template, dhash(buff.getvalue())) > 10
+    assert group_near_duplicates([0b0, 0b1111, 0b1, 0b111], max_distance=1) == [0, 1, 0, 1]
+
+
+def test_same_template_different_text():
+    first, second = make_page("Quarterly revenue"), make_page("Hiring plan")
+    # pages of one template may have close perceptual hashes, the text layer tells them apart
+    assert group_near_duplicates([0b0, 0b1, 0b0], max_distance=4, exact_keys=["a", "b", "a"]) == [0, 1, 0]
+    assert content_hash(first, "Quarterly revenue") != content_hash(second, "Hiring plan")
+    assert content_hash(first, "Quarterly revenue") != content_hash(first, "Hiring plan")
+    assert content_hash(first, "Quarterly revenue") == content_hash(make_page("Quarterly revenue"), "Quarterly revenue")
+
+
+def make_scan(filled_in: str, seed: int, quality=85, rotation=0.0) -> bytes:
+    # form page as it comes from a scanner: sensor noise, slight skew and JPEG compression
+    image = Image.new("L", (850, 1100), 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    draw.text((80, 60), "Application form", fill=0, font=font)
+    for y in range(200, 1000, 80):
+        draw.line((80, y, 770, y), fill=0, width=2)
+        draw.text((100, y - 35), filled_in, fill=0, font=font)
+    noise = np.random.default_rng(seed).normal(0, 25, (1100, 850))
+    image = Image.fromarray(np.clip(np.asarray(image) + noise, 0, 255).astype(np.uint8)).rotate(rotation, fillcolor=255)
+    buff = io.BytesIO()
+    image.save(buff, "JPEG", quality=quality)
+    return buff.getvalue()
+
+
+def test_rescanned_pages_without_text_layer():
+    first = make_scan("John Smith, Berlin", seed=0, quality=90)
+    rescan = make_scan("John Smith, Berlin", seed=1, quality=60, rotation=0.3)
+    other = make_scan("Maria Gonzalez-Weber, Hamburg Altona", seed=2)
+    assert first != rescan
+    assert page_representatives([first, rescan, other], [None, None, None], max_distance=4) == [0, 0, 2]
+    # with a text layer only exact duplicates are grouped
+    assert page_representatives([first, rescan, first], ["a", "a", "a"], max_distance=4) == [0, 1, 0]
+    assert page_representatives([first, rescan, first], [None, None, None], max_distance=0) == [0, 1, 0]
+
+
+def test_disk_cache_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_size_mb=1000 / 2**20)
+    for idx in range(5):
+        cache.set(f"key{idx}", "x" * 300)
+    assert cache.get("key0") is None
+    assert cache.get("key4") == "x" * 300
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    # persisted across instances
+    assert DiskCache(str(tmp_path / "cache.sqlite")).get("key4") == "x" * 300
+
+
+def test_disk_cache_counts_bytes_of_replaced_entries(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    cache.set("key", "ä" * 100)
+    assert cache.stats()["size_mb"] * 2**20 == 200
+    cache.set("key", "ä" * 100)
+    cache.set("key", b"x" * 50)
+    assert cache.stats()["size_mb"] * 2**20 == 50
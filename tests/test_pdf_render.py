@@ -0,0 +1,73 @@
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.datamodels import FileFeatures, MetaInfo, PDFDoc  # noqa: E402
+from pdferret.thumbnails.pdf import PDF2ImageThumbnailer  # noqa: E402
+from pdferret.utils import pdf_render  # noqa: E402
+from pdferret.utils.page_selection import PageSignals, page_signals, select_pages  # noqa: E402
+from pdferret.utils.pdf_render import render_pages  # noqa: E402
+
+test_pdf = os.path.join(os.path.dirname(__file__), "data/test.pdf")
+
+
+def test_render_pages():
+    images = render_pages(test_pdf, max_pages=3, dpi=100)
+    assert len(images) == 3
+    assert all(image.startswith(b"\xff\xd8") for image in images)
+    # letter page at 100 dpi
+    assert Image.open(io.BytesIO(images[0])).size == (850, 1100)
+
+
+def test_render_selected_pages_to_size():
+    images = render_pages(test_pdf, pages=[2, 0], max_size=512, grayscale=True)
+    assert images[1] == render_pages(test_pdf, pages=[0], max_size=512, grayscale=True)[0]
+    image = Image.open(io.BytesIO(images[0]))
+    assert max(image.size) == 512
+    assert image.mode == "L"
+
+
+def slow_prepare(image):
+    time.sleep(0.5)
+    return image
+
+
+def test_pages_render_concurrently(monkeypatch):
+    monkeypatch.setattr(pdf_render, "RENDER_WORKERS", 4)
+    monkeypatch.setattr(pdf_render, "_pool", None)
+    # start the worker processes before timing
+    render_pages(test_pdf, pages=[0, 1, 2, 3], max_size=64)
+    start = time.monotonic()
+    for _ in range(2):
+        images = render_pages(test_pdf, pages=[0, 1, 2, 3], max_size=64, prepare=slow_prepare)
+    # 8 renders of 0.5 s take about 1 s in 4 processes, 4 s one at a time
+    assert time.monotonic() - start < 2.5
+    assert images == render_pages(test_pdf, pages=[0, 1, 2, 3], max_size=64)
+    pdf_render._pool.shutdown()
+
+
+def test_page_selection():
+    signals = page_signals(test_pdf)
+    assert len(signals) == 15
+    # pages with a figure or a chart, not the text-only pages
+    assert select_pages(signals, max_pages=3) == [2, 8, 9]
+    assert select_pages(signals, max_pages=1) == [8]
+    text_only = PageSignals(page=0, image_coverage=0.0, text_chars=3000, path_objects=0)
+    scan = PageSignals(page=1, image_coverage=1.0, text_chars=0, path_objects=0)
+    assert select_pages([text_only, scan], max_pages=3) == [1]
+
+
+def test_thumbnailer_fails_per_document(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    docs = {
+        name: PDFDoc(metainfo=MetaInfo(file_features=FileFeatures(filename=name, file=file)), chunks=[])
+        for name, file in [("good.pdf", test_pdf), ("broken.pdf", str(broken))]
+    }
+    results, errors = PDF2ImageThumbnailer().process_batch(docs)
+    assert list(results) == ["good.pdf"] and results["good.pdf"].metainfo.thumbnail.startswith(b"\xff\xd8")
+    assert list(errors) == ["broken.pdf"]
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.datamodels import ChunkType, FileFeatures, MetaInfo, PDFDoc  # noqa: E402
+from pdferret.text_extrators.plain_text import PlainTextExtractor  # noqa: E402
+from pdferret.thumbnails.text import TextThumbnailer  # noqa: E402
+from pdferret.utils.text_files import detect_encoding  # noqa: E402
+from pdferret.utils.workbook import open_workbook  # noqa: E402
+
+
+def make_doc(path) -> PDFDoc:
+    return PDFDoc(metainfo=MetaInfo(file_features=FileFeatures(file=str(path))))
+
+
+def test_txt_encoding_and_paragraphs(tmp_path):
+    path = tmp_path / "test.txt"
+    path.write_bytes("Grüße aus Köln, schöne Straße.\nZweite Zeile\n\n\nNächster Absatz".encode("cp1252"))
+    assert detect_encoding(str(path)) != "utf-8"
+    doc = PlainTextExtractor(max_chunk_len=50).process_single(make_doc(path))
+    assert [chunk.text for chunk in doc.chunks] == [
+        "Grüße aus Köln, schöne Straße.\nZweite Zeile",
+        "Nächster Absatz",
+    ]
+    assert all(chunk.locked for chunk in doc.chunks)
+
+
+def test_markdown_sections(tmp_path):
+    path = tmp_path / "test.md"
+    path.write_text("intro\n\n# First\ntext one\n\n```\n# not a heading\n\ncode\n```\n## Second\ntext two\n")
+    doc = PlainTextExtractor().process_single(make_doc(path))
+    assert [chunk.section for chunk in doc.chunks] == ["", "First", "Second"]
+    assert "# not a heading\n\ncode" in doc.chunks[1].text
+    assert doc.chunks[2].text == "## Second\ntext two"
+
+
+def test_html_tables_and_headings(tmp_path):
+    path = tmp_path / "test.html"
+    path.write_text(
+        "<html><head><title>Page</title><style>p {}</style></head><body><h1>Head</h1><p>para</p>"
+        "<table><tr><th>a</th><th>b</th></tr><tr><td>1</td><td>2</td></tr></table>"
+        "<ul><li><p>item</p></li></ul><script>var x;</script></body></html>"
+    )
+    doc = PlainTextExtractor().process_single(make_doc(path))
+    assert doc.metainfo.title == "Page"
+    assert [chunk.chunk_type for chunk in doc.chunks] == [ChunkType.TEXT, ChunkType.TABLE, ChunkType.TEXT]
+    assert doc.chunks[0].text == "Head\n\npara"
+    assert doc.chunks[1].non_embeddable_content == "| a | b |\n|---|---|\n| 1 | 2 |"
+    assert doc.chunks[2].text == "- item"
+    assert all(chunk.section == "Head" for chunk in doc.chunks)
+
+
+def test_json_records_as_table(tmp_path):
+    path = tmp_path / "test.json"
+    path.write_text(json.dumps([{"name": "x", "value": 1}, {"name": "y", "extra": True}]))
+    doc = PlainTextExtractor().process_single(make_doc(path))
+    assert doc.chunks[0].chunk_type == ChunkType.TABLE
+    assert "| y |  | True |" in doc.chunks[0].text
+
+
+def test_csv_workbook(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("id;zip;amount\n1;01234;2.5\n2;;3\n")
+    with open_workbook(str(path)) as wb:
+        assert wb.sheet_names() == ["data"]
+        assert list(wb.iter_rows("data")) == [("id", "zip", "amount"), (1, "01234", 2.5), (2, None, 3)]
+
+
+def test_csv_quoted_line_breaks(tmp_path):
+    path = tmp_path / "notes.csv"
+    path.write_bytes(b'id,note\r\n1,"first line\r\nsecond line"\r\n2,plain\r\n')
+    with open_workbook(str(path)) as wb:
+        assert list(wb.iter_rows("notes")) == [("id", "note"), (1, "first line\r\nsecond line"), (2, "plain")]
+
+
+def test_text_thumbnail(tmp_path):
+    path = tmp_path / "test.txt"
+    path.write_text("some text\n" * 200)
+    doc = PlainTextExtractor().process_single(make_doc(path))
+    doc = TextThumbnailer().process_single(doc)
+    assert doc.metainfo.thumbnail.startswith(b"\xff\xd8")
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils import shell_run  # noqa: E402
+from pdferret.utils.shell_run import run_command  # noqa: E402
+
+
+def test_run_command_output():
+    stdout, stderr, return_code = run_command(["cat"], input="hello")
+    assert stdout == "hello"
+    assert return_code == 0
+
+
+def test_run_command_timeout_kills_process_group(tmp_path):
+    marker = tmp_path / "marker"
+    # the child keeps running after the shell, it must be killed together with it
+    command = ["sh", "-c", f"(sleep 2; touch {marker}) & sleep 30"]
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_command(command, timeout=0.5)
+    assert time.monotonic() - start < 5
+    time.sleep(2.5)
+    assert not marker.exists()
+
+
+@pytest.mark.parametrize("use_prlimit", [True, False])
+def test_run_command_memory_limit(monkeypatch, use_prlimit):
+    if use_prlimit and not shell_run._prlimit:
+        pytest.skip("prlimit is not installed")
+    if not use_prlimit:
+        monkeypatch.setattr(shell_run, "_prlimit", None)
+    # allocates after startup, so the limit set on the started process applies as well
+    command = [sys.executable, "-c", "import time; time.sleep(0.2); x = bytearray(512 * 2**20)"]
+    _, stderr, return_code = run_command(command, memory_limit=256 * 2**20)
+    assert return_code != 0
+    assert "MemoryError" in stderr
+
+
+def test_run_command_timeout_without_progress(tmp_path):
+    # one file every 0.3 s, longer in total than the timeout, but never stalling for it
+    command = ["sh", "-c", f"for i in 1 2 3 4 5; do sleep 0.3; touch {tmp_path}/$i; done"]
+    progress = lambda: len(list(tmp_path.iterdir()))  # noqa: E731
+    _, _, return_code = run_command(command, timeout=1.0, progress=progress, poll_interval=0.1)
+    assert return_code == 0
+    # stalls after the first file
+    command = ["sh", "-c", f"touch {tmp_path}/stalled; sleep 30"]
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_command(command, timeout=0.5, progress=progress, poll_interval=0.1)
+    assert time.monotonic() - start < 5
@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.llm.size_routing import SizeRoute, SizeRouting, count_tokens_upto, route_by_size  # noqa: E402
+
+
+def count_words(text):
+    return len(text.split())
+
+
+routing = SizeRouting(small_model_max_tokens=50, small_model_max_chunks=3, skip_summary_max_tokens=5)
+
+
+def test_short_documents():
+    assert route_by_size(["Call me back"], routing, count_words) == SizeRoute(small_model=True, skip_summary=True)
+    note = ["A meeting note about the budget of the project and its next steps."]
+    assert route_by_size(note, routing, count_words) == SizeRoute(small_model=True, skip_summary=False)
+
+
+def test_long_documents_and_many_chunks():
+    report = ["word " * 40, "word " * 40]
+    assert route_by_size(report, routing, count_words) == SizeRoute()
+    assert route_by_size(["a b c d e f"] * 4, routing, count_words) == SizeRoute()
+    # disabled thresholds route everything to the default model
+    assert route_by_size(["Call me back"], SizeRouting(), count_words) == SizeRoute()
+
+
+def test_low_information_documents():
+    low_info = SizeRouting(skip_summary_min_words=5)
+    log = ["ERROR timeout ERROR timeout ERROR timeout " * 100]
+    assert route_by_size(log, low_info, count_words).skip_summary
+    assert not route_by_size(["one two three four five six"], low_info, count_words).skip_summary
+
+
+def test_counting_stops_at_limit():
+    counted = []
+
+    def count(text):
+        counted.append(text)
+        return 10
+
+    assert count_tokens_upto(["a", "b", "c", "d"], count, limit=15) == 20
+    assert counted == ["a", "b"]
@@ -0,0 +1,46 @@
+import os
+import re
+import sys
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.text_extrators.tika import table_placeholder_regex  # noqa: E402
+from pdferret.utils.tables import clean_cell, html_table_rows, rows_to_markdown, split_table  # noqa: E402
+
+
+def test_clean_cell():
+    assert clean_cell(None) == ""
+    assert clean_cell(" a\n b ") == "a b"
+    assert clean_cell("a|b") == "a\\|b"
+
+
+def test_rows_to_markdown_pads_rows():
+    md = rows_to_markdown(["a", "b"], [["1"], ["2", "3", "4"]])
+    assert md.splitlines() == ["| a | b |", "|---|---|", "| 1 |  |", "| 2 | 3 |"]
+
+
+def test_split_table_repeats_header():
+    rows = [[f"row{i}", str(i)] for i in range(50)]
+    parts = split_table(["name", "value"], rows, max_chars=200, title="Sheet: test")
+    assert len(parts) > 1
+    assert all(part.startswith("Sheet: test\n| name | value |") for part in parts)
+    assert sum(len(part.splitlines()) - 3 for part in parts) == len(rows)
+
+
+def test_html_table_rows_keep_cells_under_colspan_header():
+    html = """<table>
+    <tr><th>Region</th><th colspan="2">Revenue</th></tr>
+    <tr><td></td><td>2023</td><td>2024</td></tr>
+    <tr><td>North</td><td>10</td><td>12</td><td>note</td></tr>
+    </table>"""
+    header, rows = html_table_rows(BeautifulSoup(html, "html.parser").table)
+    assert header == ["Region", "Revenue", "", ""]
+    assert rows_to_markdown(header, rows).splitlines()[-1] == "| North | 10 | 12 | note |"
+
+
+def test_table_placeholder_is_found_in_list_items():
+    markdown = "Intro\n\n-   PDFERRETTABLE0END\n-   item\n\n> PDFERRETTABLE1END\n"
+    parts = re.split(table_placeholder_regex, markdown)
+    assert parts[1::2] == ["0", "1"]
+    assert "PDFERRETTABLE" not in "".join(parts[::2])
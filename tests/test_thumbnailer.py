@@ -5,6 +5,7 @@ import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 from pdferret.datamodels import FileFeatures, MetaInfo, PDFDoc  # noqa: E402
+from pdferret.thumbnails import libreoffice  # noqa: E402
 from pdferret.thumbnails.libreoffice import LibreOfficeThumbnailer  # noqa: E402
 from pdferret.thumbnails.pdf import PDF2ImageThumbnailer  # noqa: E402
 from pdferret.thumbnails.thumbnailer import Thumbnailer  # noqa: E402
@@ -33,6 +34,23 @@ def test_libreoffice_thumbnailer(sample_pdfdoc_docx):
     assert b"\x89PNG" in processed_X["test"].metainfo.thumbnail
 
 
+def test_libreoffice_thumbnailer_reports_failures(monkeypatch, tmp_path):
+    def convert(files, output_dir):
+        with open(os.path.join(output_dir, "good.png"), "wb") as f:
+            f.write(b"\x89PNG")
+        return "", "conversion failed", {str(tmp_path / "broken.docx"): "LibreOffice timed out"}
+
+    monkeypatch.setattr(libreoffice, "make_thumbnail_libreoffice", convert)
+    X = {
+        name: PDFDoc(metainfo=MetaInfo(file_features=FileFeatures(file=str(tmp_path / name))))
+        for name in ["good.docx", "broken.docx", "missing.docx"]
+    }
+    processed_X, errors = LibreOfficeThumbnailer().process_batch(X)
+    assert list(processed_X) == ["good.docx"] and processed_X["good.docx"].metainfo.thumbnail == b"\x89PNG"
+    assert sorted(errors) == ["broken.docx", "missing.docx"]
+    assert errors["broken.docx"].exc == "LibreOffice timed out"
+
+
 def test_pdfium_thumbnailer(sample_pdfdoc_pdf):
     thumbnailer = PDF2ImageThumbnailer()
     X = {"test": sample_pdfdoc_pdf}
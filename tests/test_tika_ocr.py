@@ -0,0 +1,57 @@
+import os
+import sys
+from types import SimpleNamespace
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.text_extrators import tika  # noqa: E402
+from pdferret.text_extrators.tika import TikaExtractor  # noqa: E402
+
+german = "Die Verarbeitung der Dokumente erfolgt in mehreren Schritten, zuerst wird der Text extrahiert. " * 3
+garbled = "Tbe qnick brovvn f0x jumqs ovcr tlie lazv d0g and rnore garbIed tcxt frorn a bad scan. " * 3
+
+
+def fake_spellcheck(text, lang):
+    # well-formed German scores high only when checked as German, garbled text never does
+    return 1.0 if lang == "de" and "Verarbeitung" in text else 0.1
+
+
+def make_extractor(monkeypatch, image_ratios):
+    monkeypatch.setattr(tika, "spellcheck_score", fake_spellcheck)
+    monkeypatch.setattr(tika, "PdfReader", lambda file: SimpleNamespace(pages=[None] * len(image_ratios)))
+    monkeypatch.setattr(tika, "page_image_ratios", lambda reader: image_ratios)
+    extractor = TikaExtractor(tika_url="http://localhost:9998", tika_ocr_strategy="SELECTIVE")
+    ocr_calls = []
+
+    def ocr_page(reader, idx):
+        ocr_calls.append(idx)
+        return BeautifulSoup(f'<div class="page"><p>OCR text of page {idx + 1}</p></div>', "html.parser").div
+
+    monkeypatch.setattr(extractor, "_ocr_page", ocr_page)
+    return extractor, ocr_calls
+
+
+def make_soup(*pages):
+    return BeautifulSoup("".join(f'<div class="page"><p>{text}</p></div>' for text in pages), "html.parser")
+
+
+def test_pages_are_selected_by_text_quality(monkeypatch):
+    # no images, german text with images, garbled scan, figure with caption, image without text
+    extractor, ocr_calls = make_extractor(monkeypatch, [0.0, 0.5, 1.2, 0.4, 0.6])
+    soup = make_soup(garbled, german, garbled, "Figure 3: map", "")
+    lang = extractor._text_language(make_soup(german))
+    assert lang == "de"
+    assert extractor._ocr_poor_pages(soup, "file.pdf", lang) == [3, 5]
+    assert ocr_calls == [2, 4]
+    # checked as English, the German page would be OCRed
+    extractor, ocr_calls = make_extractor(monkeypatch, [0.0, 0.5])
+    assert extractor._ocr_poor_pages(make_soup(garbled, german), "file.pdf", "en") == [2]
+
+
+def test_ocr_text_is_merged_in_page_order(monkeypatch):
+    extractor, _ = make_extractor(monkeypatch, [0.0, 1.2, 0.0])
+    soup = make_soup("first page", garbled, "third page")
+    extractor._ocr_poor_pages(soup, "file.pdf", "en")
+    pages = [page.get_text(" ", strip=True) for page in soup.find_all("div", class_="page")]
+    assert pages == ["first page", "OCR text of page 2", "third page"]
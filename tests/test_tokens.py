@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils.tokens import RoughTokenizer, TokenBudget, Tokenizer, get_tokenizer  # noqa: E402
+
+
+def test_rough_tokenizer_truncates_at_word_boundary():
+    tokenizer = RoughTokenizer()
+    text = "The quick brown fox, jumps over the lazy dog. " * 10
+    assert tokenizer.count("The quick brown fox,") == 5
+    assert tokenizer.count("internationalization") == 4
+    truncated = tokenizer.truncate(text, 11)
+    assert tokenizer.count(truncated) <= 11
+    assert text.startswith(truncated) and truncated.endswith("lazy dog.")
+
+
+def test_get_tokenizer_is_cached_and_counts():
+    tokenizer = get_tokenizer("gpt-4o-mini")
+    assert tokenizer is get_tokenizer("gpt-4o-mini")
+    assert isinstance(tokenizer, Tokenizer)
+    # tiktoken if its vocabulary is available, rough estimate otherwise
+    assert 1 <= tokenizer.count("Hello world") <= 4
+
+
+def test_budget_redistributes_unused_share():
+    tokenizer = RoughTokenizer()
+    chunks = [f"chunk {i} " + "word " * 50 for i in range(10)]
+    budget = (
+        TokenBudget(tokenizer, 300)
+        .add("filename", "Filename: report.pdf\n")
+        .add("text", chunks, share=0.5, header="Content: ")
+        .add("visual_pages", ["a chart of sales"], share=0.5)
+        .add("tables", [], share=0.5)
+    )
+    prompt = budget.build()
+    assert tokenizer.count(prompt) <= 300
+    assert prompt.startswith("Filename: report.pdf\nContent: chunk 0")
+    assert "a chart of sales" in prompt
+    # visual pages need few tokens, the rest of their share goes to the text
+    assert budget.usage["text"] > 200
+    assert sum(budget.usage.values()) <= 300
+
+
+def test_budget_keeps_everything_if_it_fits():
+    tokenizer = RoughTokenizer()
+    budget = TokenBudget(tokenizer, 1000).add("filename", "Filename: a.txt\n").add("text", ["one", "two"], share=1.0)
+    assert budget.build() == "Filename: a.txt\none\ntwo\n"
@@ -0,0 +1,35 @@
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils.vision_tokens import prepare_for_vision, trim_margins, vision_token_model  # noqa: E402
+
+
+def test_token_estimates():
+    openai = vision_token_model("gpt-4o-mini")
+    assert openai.name == "openai"
+    # scaled to 768 x 1024 -> 2 x 2 tiles
+    assert openai.estimate_tokens(1536, 2048) == 85 + 4 * 170
+    claude = vision_token_model("claude-3-5-sonnet")
+    assert claude.estimate_tokens(1000, 750) == 1000
+    assert vision_token_model("some-vision-model").name == "default"
+
+
+def test_fit_size_within_budget():
+    for name in ["gpt-4o", "claude-3-haiku", "gemini-1.5-flash", "pixtral-12b", "llama-vision"]:
+        model = vision_token_model(name)
+        width, height = model.fit_size(2550, 3300, 1000)
+        assert model.estimate_tokens(width, height) <= 1000
+        assert abs(width / height - 2550 / 3300) < 0.01
+        # small images are never upscaled
+        assert model.fit_size(200, 100, 10000) == (200, 100)
+
+
+def test_prepare_trims_margins():
+    image = Image.new("RGB", (1000, 1400), "white")
+    ImageDraw.Draw(image).rectangle((300, 400, 700, 900), fill="black")
+    assert trim_margins(image).size == (421, 521)
+    prepared = prepare_for_vision(image, vision_token_model("claude"), max_tokens=100)
+    assert prepared.width * prepared.height <= 100 * 750
@@ -0,0 +1,67 @@
+import os
+import sys
+import zipfile
+
+import openpyxl
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from pdferret.utils.workbook import open_workbook  # noqa: E402
+
+ods_content = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">
+<office:body><office:spreadsheet>
+<table:table table:name="First">
+<table:table-row><table:table-cell><text:p>name</text:p></table:table-cell>
+<table:table-cell><text:p>value</text:p></table:table-cell></table:table-row>
+<table:table-row table:number-rows-repeated="2"><table:table-cell><text:p>a</text:p></table:table-cell>
+<table:table-cell office:value-type="float" office:value="1.5"><text:p>1.5</text:p></table:table-cell>
+</table:table-row>
+<table:table-row table:number-rows-repeated="1048000"><table:table-cell table:number-columns-repeated="1024"/>
+</table:table-row>
+</table:table>
+<table:table table:name="Second"><table:table-row><table:table-cell><text:p>x</text:p></table:table-cell>
+</table:table-row></table:table>
+</office:spreadsheet></office:body></office:document-content>"""
+
+
+@pytest.fixture
+def sample_xlsx_path(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "First"
+    ws.append(["name", "value"])
+    for i in range(10):
+        ws.append([f"row{i}", i])
+    wb.create_sheet("Second").append(["x"])
+    path = str(tmp_path / "test.xlsx")
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def sample_ods_path(tmp_path):
+    path = str(tmp_path / "test.ods")
+    with zipfile.ZipFile(path, "w") as zipf:
+        zipf.writestr("mimetype", "application/vnd.oasis.opendocument.spreadsheet")
+        zipf.writestr("content.xml", ods_content)
+    return path
+
+
+def test_xlsx_reader(sample_xlsx_path):
+    with open_workbook(sample_xlsx_path) as wb:
+        assert wb.sheet_names() == ["First", "Second"]
+        assert wb.dimensions("First") == (11, 2)
+        rows = list(wb.iter_rows("First", start=1, stop=3))
+        assert rows == [("row0", 0), ("row1", 1)]
+
+
+def test_ods_reader(sample_ods_path):
+    with open_workbook(sample_ods_path) as wb:
+        assert wb.sheet_names() == ["First", "Second"]
+        rows = list(wb.iter_rows("First"))
+        # repeated empty rows are collapsed
+        assert rows == [("name", "value"), ("a", 1.5), ("a", 1.5), ()]
+        assert list(wb.iter_rows("Second")) == [("x",)]